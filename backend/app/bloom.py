@@ -0,0 +1,122 @@
+"""
+Probabilistic membership filters for the deduplication store.
+A negative answer is definite, so callers can skip the SQLite lookup;
+a positive answer only means "maybe" and must be confirmed against the DB.
+"""
+import hashlib
+import logging
+import math
+import threading
+from typing import Dict, Iterable
+
+logger = logging.getLogger(__name__)
+
+LN2_SQUARED = math.log(2) ** 2
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter sized for a target capacity and false-positive rate"""
+
+    def __init__(self, num_bits: int, num_hashes: int):
+        self.num_bits = max(8, num_bits)
+        self.num_hashes = max(1, num_hashes)
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    @classmethod
+    def for_budget(cls, max_bytes: int, fp_rate: float) -> "BloomFilter":
+        """Build a filter using max_bytes of memory, tuned for fp_rate"""
+        num_bits = max_bytes * 8
+        capacity = capacity_for(num_bits, fp_rate)
+        num_hashes = round(num_bits / capacity * math.log(2))
+        return cls(num_bits, num_hashes)
+
+    def _positions(self, key: str):
+        """Kirsch-Mitzenmacher double hashing over one 128-bit digest"""
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+def capacity_for(num_bits: int, fp_rate: float) -> int:
+    """Number of items a filter of num_bits can hold at the given false-positive rate"""
+    return max(1, int(num_bits * LN2_SQUARED / -math.log(fp_rate)))
+
+
+class RotatingBloomFilter:
+    """
+    Time-partitioned set of Bloom filters.
+
+    Each partition covers `partition_hours` of first-seen time. Dropping the
+    partitions older than a cutoff mirrors row deletion in seen_events, so the
+    filter never accumulates stale members and its false-positive rate stays
+    bounded. Partitions straddling the cutoff are kept, which is safe because
+    a stale positive only costs a DB lookup.
+    """
+
+    def __init__(self, fp_rate: float, max_bytes: int, partition_hours: int, retention_hours: int):
+        self.fp_rate = fp_rate
+        self.partition_seconds = partition_hours * 3600
+        # One extra partition for the one currently being filled
+        max_partitions = math.ceil(retention_hours / partition_hours) + 1
+        self.partition_bytes = max(64, max_bytes // max_partitions)
+        self.partitions: Dict[int, BloomFilter] = {}
+        self._lock = threading.Lock()
+        self._warned_full = set()
+
+    def _bucket(self, epoch: float) -> int:
+        return int(epoch // self.partition_seconds)
+
+    def add(self, key: str, epoch: float) -> None:
+        """Add a key first seen at epoch (UTC seconds)"""
+        bucket = self._bucket(epoch)
+        with self._lock:
+            partition = self.partitions.get(bucket)
+            if partition is None:
+                partition = BloomFilter.for_budget(self.partition_bytes, self.fp_rate)
+                self.partitions[bucket] = partition
+        partition.add(key)
+        if partition.count > capacity_for(partition.num_bits, self.fp_rate) and bucket not in self._warned_full:
+            self._warned_full.add(bucket)
+            logger.warning("Dedup filter partition over capacity; false-positive rate will rise. Consider raising DEDUP_FILTER_MAX_BYTES.")
+
+    def add_many(self, keys: Iterable[str], epoch: float) -> None:
+        for key in keys:
+            self.add(key, epoch)
+
+    def might_contain(self, key: str) -> bool:
+        """False means definitely never added (within retained partitions)"""
+        with self._lock:
+            partitions = list(self.partitions.values())
+        return any(key in partition for partition in partitions)
+
+    def drop_before(self, cutoff_epoch: float) -> int:
+        """Drop partitions that end at or before cutoff_epoch; returns how many were dropped"""
+        with self._lock:
+            expired = [
+                bucket for bucket in self.partitions
+                if (bucket + 1) * self.partition_seconds <= cutoff_epoch
+            ]
+            for bucket in expired:
+                del self.partitions[bucket]
+                self._warned_full.discard(bucket)
+        return len(expired)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "partitions": len(self.partitions),
+                "items": sum(p.count for p in self.partitions.values()),
+                "bytes": sum(len(p.bits) for p in self.partitions.values()),
+                "fp_rate": self.fp_rate,
+            }
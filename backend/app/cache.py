@@ -1,79 +1,211 @@
 import logging
+import threading
+import time
+from collections import deque
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from datetime import datetime
+from typing import Callable, Deque, Hashable, Iterable, List, Dict, Optional, Tuple
 import json
 from app.settings import settings
+from app import metrics
+from app.ranking import BM25Scorer, blended_score, query_term_weights, top_k
+from app.search_index import InvertedIndex
+from app.segments import LogFollower, SegmentedLog, resolve_stream_log
+from app.stream_writer import add_write_listener
+from app.utils import compute_event_id, timestamp_to_epoch
 
 logger = logging.getLogger(__name__)
 
 class EventCache:
-    """In-memory cache for recent events to speed up query retrieval"""
-    
-    def __init__(self, max_events: int = 2000):
+    """
+    Incremental in-memory cache of recent stream events.
+
+    Follows the segmented stream log with a LogFollower, which remembers the
+    identity (device/inode) and parsed byte offset of every segment, so each
+    refresh only parses bytes appended since the last call. Segment rewrites,
+    truncation, or a switch to a different log (e.g. Pathway output appearing)
+    trigger a full, tail-bounded reload.
+
+    Cached events are also kept in an inverted index, updated as events are
+    appended and evicted, for keyword retrieval and BM25 ranking without
+    scanning, and keyed by event ID so /generate can look up the evidence a
+    query returned.
+    """
+
+    def __init__(self, max_events: int = 2000, retention_hours: Optional[int] = None):
         self.max_events = max_events
-        self.events: List[Dict] = []
+        self.retention_hours = retention_hours
+        # (ordinal, event_epoch, event) in append order, oldest at the left
+        self.events: Deque[Tuple[int, float, Dict]] = deque()
+        self._by_ordinal: Dict[int, Tuple[float, Dict]] = {}
+        # event ID -> ordinal of its newest cached copy
+        self._by_id: Dict[str, int] = {}
+        self._next_ordinal = 0
+        self.index = InvertedIndex(field_weights={
+            "title": settings.rank_title_weight,
+            "content": 1.0,
+            "company": 1.0,
+        })
         self.last_refresh: Optional[datetime] = None
-        self.refresh_interval = 3  # seconds
-        
-    def should_refresh(self) -> bool:
-        """Check if cache needs refresh"""
-        if self.last_refresh is None:
-            return True
-        elapsed = (datetime.utcnow() - self.last_refresh).total_seconds()
-        return elapsed >= self.refresh_interval
-    
+        self._log: Optional[SegmentedLog] = None
+        self._follower: Optional[LogFollower] = None
+        self._lock = threading.Lock()
+
+    def _append(self, event: Dict):
+        """Add a parsed event to the right end of the deque and the index"""
+        ordinal = self._next_ordinal
+        self._next_ordinal += 1
+        event_epoch = timestamp_to_epoch(event.get("timestamp"))
+        self.events.append((ordinal, event_epoch, event))
+        self._by_ordinal[ordinal] = (event_epoch, event)
+        self._by_id[compute_event_id(event)] = ordinal
+        self.index.add(ordinal, event)
+
+    def _pop_oldest(self):
+        ordinal, _, event = self.events.popleft()
+        del self._by_ordinal[ordinal]
+        event_id = compute_event_id(event)
+        # A newer copy of the same event may own the ID now
+        if self._by_id.get(event_id) == ordinal:
+            del self._by_id[event_id]
+        self.index.remove(ordinal)
+
+    def _evict(self):
+        """Drop events from the front that are over capacity or expired"""
+        while len(self.events) > self.max_events:
+            self._pop_oldest()
+        if self.retention_hours:
+            cutoff = time.time() - self.retention_hours * 3600
+            while self.events and self.events[0][1] < cutoff:
+                self._pop_oldest()
+
+    def _reload(self, log: SegmentedLog):
+        """Full reload: parse the newest max_events complete lines of the log"""
+        self.events.clear()
+        self._by_ordinal.clear()
+        self._by_id.clear()
+        self.index.clear()
+        self._log = log
+        self._follower = LogFollower(log, window_hours=self.retention_hours)
+        for raw_line in self._follower.seek_tail(self.max_events):
+            event = _parse_line(raw_line)
+            if event is not None:
+                self._append(event)
+        logger.info(f"Event cache reloaded from {log.base_path}: {len(self.events)} events")
+
     def refresh(self, file_path: Path, freshness_hours: Optional[int] = None):
-        """Refresh cache from file"""
-        try:
-            if not file_path.exists():
-                self.events = []
+        """Bring the cache up to date with the stream, reading only new bytes"""
+        log = resolve_stream_log(file_path)
+        with self._lock:
+            try:
+                if self._follower is None or self._log is not log:
+                    self._reload(log)
+                else:
+                    lines = self._follower.poll()
+                    if lines is None:
+                        self._reload(log)
+                    else:
+                        for raw_line in lines:
+                            event = _parse_line(raw_line)
+                            if event is not None:
+                                self._append(event)
+                self._evict()
                 self.last_refresh = datetime.utcnow()
-                return
-            
-            events = []
-            cutoff_time = None
-            if freshness_hours:
-                cutoff_time = datetime.utcnow() - timedelta(hours=freshness_hours)
-            
-            # Read last N events from file
-            with open(file_path, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-                
-            # Process from end (most recent first)
-            for line in reversed(lines[-self.max_events:]):
-                if not line.strip():
+            except Exception as e:
+                logger.error(f"Error refreshing event cache: {e}")
+                # Force a full reload on the next call
+                self._follower = None
+                self.last_refresh = datetime.utcnow()
+
+    def get_events(self, file_path: Path, freshness_hours: Optional[int] = None, limit: Optional[int] = None) -> List[Dict]:
+        """Get cached events newest-first, optionally within a freshness window"""
+        self.refresh(file_path)
+        cutoff = time.time() - freshness_hours * 3600 if freshness_hours else None
+        with self._lock:
+            snapshot = list(self.events)
+        events = []
+        for _, event_epoch, event in reversed(snapshot):
+            if cutoff is not None and event_epoch < cutoff:
+                continue
+            events.append(event)
+            if limit is not None and len(events) >= limit:
+                break
+        return events
+
+    def search(self, file_path: Path, keywords: Iterable[str], freshness_hours: Optional[int] = None) -> List[Dict]:
+        """Cached events matching any keyword, newest-first, via the inverted index"""
+        self.refresh(file_path)
+        cutoff = time.time() - freshness_hours * 3600 if freshness_hours else None
+        with self._lock:
+            ordinals = self.index.search(keywords)
+            hits = [self._by_ordinal[ordinal] for ordinal in sorted(ordinals, reverse=True)]
+        return [event for event_epoch, event in hits if cutoff is None or event_epoch >= cutoff]
+
+    def get_by_ids(self, file_path: Path, event_ids: Iterable[str]) -> List[Dict]:
+        """Cached events for the given IDs, in the order requested; unknown or evicted IDs are skipped"""
+        self.refresh(file_path)
+        events = []
+        seen = set()
+        with self._lock:
+            for event_id in event_ids:
+                ordinal = self._by_id.get(event_id)
+                if ordinal is None or ordinal in seen:
                     continue
-                try:
-                    event = json.loads(line)
-                    
-                    # Apply freshness filter if specified
-                    if cutoff_time and event.get("timestamp"):
-                        try:
-                            event_time = datetime.fromisoformat(event["timestamp"].replace("Z", "+00:00"))
-                            if event_time.replace(tzinfo=None) < cutoff_time:
-                                continue
-                        except:
-                            pass
-                    
-                    events.append(event)
-                except json.JSONDecodeError:
+                seen.add(ordinal)
+                events.append(self._by_ordinal[ordinal][1])
+        return events
+
+    def rank(
+        self,
+        file_path: Path,
+        keywords: Iterable[str],
+        k: int,
+        primary_keywords: Iterable[str] = (),
+        freshness_hours: Optional[int] = None,
+        key: Optional[Callable[[Dict], Hashable]] = None
+    ) -> List[Tuple[float, Dict]]:
+        """Top k matching events as (score, event), best first (BM25 + recency + trust)"""
+        keywords = list(keywords)
+        self.refresh(file_path)
+        cutoff = time.time() - freshness_hours * 3600 if freshness_hours else None
+        trust_cache: Dict[str, float] = {}
+        scored = []
+        with self._lock:
+            scorer = BM25Scorer(self.index, query_term_weights(keywords, primary_keywords))
+            for ordinal in self.index.search(keywords):
+                event_epoch, event = self._by_ordinal[ordinal]
+                if cutoff is not None and event_epoch < cutoff:
                     continue
-            
-            self.events = events
-            self.last_refresh = datetime.utcnow()
-            logger.info(f"Event cache refreshed: {len(self.events)} events loaded")
-            
-        except Exception as e:
-            logger.error(f"Error refreshing event cache: {e}")
-            self.events = []
-            self.last_refresh = datetime.utcnow()
-    
-    def get_events(self, file_path: Path, freshness_hours: Optional[int] = None) -> List[Dict]:
-        """Get cached events, refreshing if needed"""
-        if self.should_refresh():
-            self.refresh(file_path, freshness_hours)
-        return self.events
+                scored.append((blended_score(scorer.score(ordinal), event, trust_cache), ordinal, event))
+        return top_k(scored, k, key=key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "events": len(self.events),
+                "max_events": self.max_events,
+                "indexed_tokens": len(self.index.vocabulary),
+                "log": str(self._log.base_path) if self._log else None,
+                "last_refresh": self.last_refresh.isoformat() if self.last_refresh else None,
+            }
+
+
+def _parse_line(raw_line: bytes) -> Optional[Dict]:
+    """Decode a raw JSONL line into an event dict, or None if invalid"""
+    line = raw_line.decode("utf-8", errors="ignore").strip()
+    if not line:
+        return None
+    try:
+        event = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    return event if isinstance(event, dict) else None
 
 # Global cache instance
-event_cache = EventCache(max_events=settings.max_events_to_scan)
+event_cache = EventCache(
+    max_events=settings.max_events_to_scan,
+    retention_hours=max(settings.freshness_hours, 24)
+)
+metrics.register("event_cache", event_cache.stats)
+# Pull in each committed batch right away instead of on the next read
+add_write_listener(lambda base_path, written: event_cache.refresh(base_path))
@@ -5,6 +5,7 @@ Used for:
 1. Source ingestion (generating queries/keywords)
 2. Retrieval (synonym expansion)
 3. Demo generation (ensuring coverage)
+4. Pipeline tagging (company / event type keywords)
 """
 
 COMPANY_DICT = {
@@ -49,3 +50,36 @@ COMPANY_DICT = {
     "topics": ["HBM supply", "foundry progress", "yield", "memory chips"]
   }
 }
+
+# Pipeline company tagging: keyword -> company
+COMPANY_KEYWORDS = {
+    "nvidia": "NVIDIA",
+    "tsmc": "TSMC",
+    "intel": "Intel",
+    "apple": "Apple",
+    "amd": "AMD",
+    "asml": "ASML",
+    "samsung": "Samsung",
+    "google": "Google",
+    "meta": "Meta",
+    "microsoft": "Microsoft",
+    "arm": "ARM"
+}
+
+# Pipeline event type tagging: keyword stem -> event type
+EVENT_KEYWORDS = {
+    "launch": "product_launch",
+    "release": "product_launch",
+    "contract": "contract",
+    "deal": "contract",
+    "partnership": "contract",
+    "supply": "supply_chain",
+    "yield": "supply_chain",
+    "foundry": "supply_chain",
+    "fab": "supply_chain",
+    "acquisition": "m_and_a",
+    "merger": "m_and_a",
+    "earnings": "financial",
+    "revenue": "financial",
+    "profit": "financial"
+}
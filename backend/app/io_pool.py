@@ -0,0 +1,101 @@
+"""
+Async-facing I/O layer.
+Blocking work (stream file reads and appends, SQLite calls, source pulls)
+runs on a bounded thread pool so the event loop only awaits results and a
+slow read can't stall unrelated requests such as /health.
+"""
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from app.settings import settings
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class IOPool:
+    """Bounded thread pool for blocking calls, with queue-depth metrics"""
+
+    def __init__(self, max_workers: int, name: str = "io"):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-worker")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.peak_queue_depth = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    def _wrap(self, fn: Callable[[], Any], submitted: float) -> Callable[[], Any]:
+        """Track queue wait and run time around a call on a worker thread"""
+        def call():
+            started = time.monotonic()
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                self.total_wait_seconds += started - submitted
+            ok = False
+            try:
+                result = fn()
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+                    if not ok:
+                        self.failed += 1
+                    self.total_run_seconds += time.monotonic() - started
+        return call
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) on the pool and await its result"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self.queued += 1
+            self.peak_queue_depth = max(self.peak_queue_depth, self.queued)
+        call = self._wrap(functools.partial(fn, *args, **kwargs), time.monotonic())
+        try:
+            future = self._executor.submit(call)
+        except RuntimeError:
+            # Executor shut down: undo the accounting and surface the error
+            with self._lock:
+                self.queued -= 1
+            raise
+        return await asyncio.wrap_future(future, loop=loop)
+
+    def stats(self) -> dict:
+        with self._lock:
+            finished = max(self.completed, 1)
+            return {
+                "max_workers": self.max_workers,
+                "queue_depth": self.queued,
+                "active": self.active,
+                "peak_queue_depth": self.peak_queue_depth,
+                "completed": self.completed,
+                "failed": self.failed,
+                "avg_wait_ms": round(self.total_wait_seconds / finished * 1000, 3),
+                "avg_run_ms": round(self.total_run_seconds / finished * 1000, 3),
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+        logger.info(f"I/O pool '{self.name}' shut down")
+
+
+# Global I/O pool
+io_pool = IOPool(max_workers=settings.io_pool_workers)
+metrics.register("io_pool", io_pool.stats)
+
+
+async def run_io(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Await a blocking call executed on the shared I/O pool"""
+    return await io_pool.run(fn, *args, **kwargs)
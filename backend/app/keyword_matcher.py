@@ -0,0 +1,177 @@
+"""
+Precompiled keyword matcher for company aliases and pipeline tags.
+A single Aho-Corasick automaton, built from app.company_dict, finds every
+alias, company keyword and event keyword in one linear pass over a text.
+Shared by the query path, the source verifier and both pipelines.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Match kinds
+ALIAS = "alias"        # COMPANY_DICT alias or company name -> company (query expansion)
+COMPANY = "company"    # COMPANY_KEYWORDS -> company (pipeline tagging)
+EVENT = "event"        # EVENT_KEYWORDS stem -> event type (pipeline tagging)
+
+# How often get_matcher re-fingerprints the dictionaries
+FINGERPRINT_CHECK_SECONDS = 1.0
+
+
+class Match(NamedTuple):
+    start: int
+    end: int
+    kind: str
+    label: str
+    keyword: str
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum()
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over (keyword, kind, label, whole_word) entries.
+
+    A match must start at a word boundary. Whole-word entries must also end
+    at one, so "arm" does not match "pharmaceutical" and "intel" does not
+    match "intelligence"; the other entries are stems that may be followed
+    by more letters ("launch" matches "launches").
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, str, str, bool]]):
+        # Trie transitions, failure links, and per-state outputs
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, str, str, bool]]] = [[]]
+        self.size = 0
+        for keyword, kind, label, whole_word in entries:
+            keyword = keyword.lower().strip()
+            if keyword:
+                self._insert(keyword, (keyword, kind, label, whole_word))
+        self._link()
+
+    def _insert(self, keyword: str, payload: Tuple[str, str, str, bool]) -> None:
+        state = 0
+        for char in keyword:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        if payload not in self._out[state]:
+            self._out[state].append(payload)
+            self.size += 1
+
+    def _link(self) -> None:
+        """Breadth-first failure links; outputs are merged along them"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(char, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text: str) -> Iterator[Match]:
+        """All boundary-respecting matches in text, ordered by end position"""
+        if not text:
+            return
+        text = text.lower()
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for pos, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not out[state]:
+                continue
+            end = pos + 1
+            ends_word = end == len(text) or not _is_word_char(text[end])
+            for keyword, kind, label, whole_word in out[state]:
+                start = end - len(keyword)
+                if start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                if whole_word and not ends_word:
+                    continue
+                yield Match(start, end, kind, label, keyword)
+
+    def tag(self, text: str) -> Dict[str, List[str]]:
+        """Distinct labels per kind, ordered by first occurrence in text"""
+        found: Dict[str, List[str]] = {}
+        for match in sorted(self.iter_matches(text)):
+            labels = found.setdefault(match.kind, [])
+            if match.label not in labels:
+                labels.append(match.label)
+        return found
+
+    def first(self, text: str, kind: str) -> Optional[str]:
+        """Label of the earliest match of a kind in text"""
+        best = None
+        for match in self.iter_matches(text):
+            if match.kind == kind and (best is None or match.start < best.start):
+                best = match
+        return best.label if best else None
+
+
+def _dictionary_entries():
+    from app.company_dict import COMPANY_DICT, COMPANY_KEYWORDS, EVENT_KEYWORDS
+    for company, data in COMPANY_DICT.items():
+        yield company, ALIAS, company, True
+        for alias in data.get("aliases", []):
+            yield alias, ALIAS, company, True
+    for keyword, company in COMPANY_KEYWORDS.items():
+        yield keyword, COMPANY, company, True
+    for keyword, event_type in EVENT_KEYWORDS.items():
+        yield keyword, EVENT, event_type, False
+
+
+def dictionary_fingerprint() -> str:
+    """Hash of the dictionaries the matcher is compiled from"""
+    from app.company_dict import COMPANY_DICT, COMPANY_KEYWORDS, EVENT_KEYWORDS
+    blob = json.dumps([COMPANY_DICT, COMPANY_KEYWORDS, EVENT_KEYWORDS], sort_keys=True)
+    return hashlib.blake2b(blob.encode(), digest_size=16).hexdigest()
+
+
+_matcher: Optional[KeywordMatcher] = None
+_fingerprint: Optional[str] = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_matcher() -> KeywordMatcher:
+    """Shared matcher, recompiled only when the dictionaries change"""
+    global _matcher, _fingerprint, _checked_at
+    now = time.monotonic()
+    if _matcher is not None and now - _checked_at < FINGERPRINT_CHECK_SECONDS:
+        return _matcher
+    with _lock:
+        fingerprint = dictionary_fingerprint()
+        if _matcher is None or fingerprint != _fingerprint:
+            _matcher = KeywordMatcher(_dictionary_entries())
+            _fingerprint = fingerprint
+            logger.info(f"Keyword matcher compiled: {_matcher.size} keywords ({fingerprint[:8]})")
+        _checked_at = now
+        return _matcher
+
+
+def expand_query_keywords(query: str) -> Set[str]:
+    """Query words plus every alias of each company the query mentions"""
+    from app.company_dict import COMPANY_DICT
+    keywords = {kw.lower() for kw in query.split() if len(kw) > 2}
+    for company in get_matcher().tag(query).get(ALIAS, []):
+        keywords.add(company.lower())
+        keywords.update(alias.lower() for alias in COMPANY_DICT[company].get("aliases", []))
+    return keywords
@@ -7,8 +7,13 @@ from app.routes import router
 from app.models import QueryResponse
 from app.utils import now_ts
 from app.settings import settings
-from app.storage import init_db
+from app.storage import init_db, close_pool
 from app.scheduler import start_scheduler, stop_scheduler
+from app.io_pool import io_pool
+from app.stream_writer import stop_stream_writers
+from app.sources.base import stop_source_clients
+from app.services.gemini_client import gemini_client
+from app.prefetcher import prefetcher
 
 # Configure logging
 logging.basicConfig(
@@ -76,12 +81,21 @@ async def startup_event():
     logger.info("Database initialized")
     start_scheduler()
     logger.info("Real-time data scheduler started")
+    # Refresh the Gemini model list off the startup path (warm-started from disk)
+    gemini_client.start_discovery()
+    # Warm the caches for recommended queries whenever the stream changes
+    prefetcher.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down SiliconPulse API...")
+    await prefetcher.stop()
     stop_scheduler()
     logger.info("Scheduler stopped")
+    stop_source_clients()
+    stop_stream_writers()
+    io_pool.shutdown()
+    close_pool()
 
 # Include API routes with /api prefix
 app.include_router(router, prefix="/api", tags=["api"])
@@ -0,0 +1,43 @@
+"""
+Process-wide metrics registry.
+Components register a zero-argument callable returning a dict of their
+current stats; /api/metrics collects them all into one snapshot.
+"""
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_collectors: Dict[str, Callable[[], dict]] = {}
+_lock = threading.Lock()
+
+
+@dataclass
+class PullStats:
+    """Outcome of one source pull, filled in by the pull function"""
+    source: str
+    fetched: int = 0
+    new: int = 0
+    newest_event_ts: Optional[str] = None
+
+
+def register(name: str, collector: Callable[[], dict]) -> None:
+    """Register (or replace) the stats collector for a component"""
+    with _lock:
+        _collectors[name] = collector
+
+
+def collect() -> Dict[str, dict]:
+    """Snapshot of every registered component's stats"""
+    with _lock:
+        collectors = dict(_collectors)
+    snapshot = {}
+    for name, collector in collectors.items():
+        try:
+            snapshot[name] = collector()
+        except Exception as e:
+            logger.error(f"Metrics collector '{name}' failed: {e}")
+            snapshot[name] = {"error": str(e)}
+    return snapshot
@@ -48,11 +48,31 @@ class InjectRequest(BaseModel):
 
 class InjectResponse(BaseModel):
     """Response model for data injection"""
-    status: str = Field(..., description="Status of the injection operation")
+    status: str = Field(..., description="success, or duplicate if the item was already seen")
     injected_at: str = Field(..., description="Timestamp when the data was injected")
     stream_path_used: Optional[str] = Field(None, description="Path of the stream file used")
 
 
+class BatchInjectItemResult(BaseModel):
+    """Outcome for one item of a batch injection"""
+    index: int = Field(..., description="Position of the item in the submitted batch")
+    status: str = Field(..., description="accepted, duplicate or invalid")
+    event_id: Optional[str] = Field(None, description="Event fingerprint (absent for invalid items)")
+    error: Optional[str] = Field(None, description="Validation error for invalid items")
+
+
+class BatchInjectResponse(BaseModel):
+    """Response model for batch data injection"""
+    status: str = Field(..., description="Status of the batch operation")
+    received: int = Field(..., description="Number of items in the batch")
+    accepted: int = Field(..., description="Items appended to the stream")
+    duplicates: int = Field(..., description="Items skipped as already seen")
+    invalid: int = Field(..., description="Items that failed validation")
+    injected_at: str = Field(..., description="Default timestamp applied to items without one")
+    stream_path_used: Optional[str] = Field(None, description="Path of the stream file used")
+    items: list[BatchInjectItemResult] = Field(..., description="Per-item results in submission order")
+
+
 class SignalCompact(BaseModel):
     """Compact signal representation for list view"""
     timestamp: Optional[str] = Field(None, description="Timestamp of the event")
@@ -72,7 +92,8 @@ class RadarStatus(BaseModel):
 class GenerateRequest(BaseModel):
     """Request model for generating insights with Gemini"""
     query: str = Field(..., description="The user query")
-    context: str = Field(..., description="The formatted context string")
+    context: str = Field(default="", description="The formatted context string (legacy; ignored when event_ids is set)")
+    event_ids: Optional[list[str]] = Field(default=None, description="IDs of the /query evidence, best first; the server builds the context")
 
 
 class GenerateResponse(BaseModel):
@@ -0,0 +1,169 @@
+"""
+Background pre-generation of insight reports for the recommended queries.
+Every prefetch_interval_seconds the prefetcher checks the stream generation;
+when it has changed, it runs the top recommended queries through
+process_query and the same prompt building and report generation a click in
+the UI would, so the query cache and the insight cache already hold the
+answer when the user asks. Work is capped by a concurrency limit and an hourly budget of Gemini
+generations, and it is skipped entirely without a Gemini API key.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Optional
+
+from app.settings import settings
+from app.models import QueryRequest, GenerateRequest
+from app.routes import build_generate_prompt, process_query, recommended_queries
+from app.services.admission import AdmissionRejected, generation_admission
+from app.services.gemini_client import clean_report_json, gemini_client
+from app.segments import stream_generation
+from app.io_pool import run_io
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+BUDGET_WINDOW_SECONDS = 3600
+
+# Admission client for prefetches, so they share the per-client limit instead of crowding out users
+PREFETCH_CLIENT = "prefetcher"
+
+
+class Prefetcher:
+    """Periodic task on the app's event loop; start() on startup, stop() on shutdown"""
+
+    def __init__(self, interval_seconds: float, top_n: int, concurrency: int, max_generations_per_hour: int):
+        self.interval_seconds = interval_seconds
+        self.top_n = top_n
+        self.concurrency = max(1, concurrency)
+        self.max_generations_per_hour = max_generations_per_hour
+        self.last_generation = None
+        self._generations: Deque[float] = deque()
+        self._task: Optional[asyncio.Task] = None
+        # Stats
+        self.runs = 0
+        self.queries = 0
+        self.generated = 0
+        self.skipped_no_evidence = 0
+        self.skipped_budget = 0
+        self.shed = 0
+        self.failures = 0
+        self.last_run_at: Optional[str] = None
+        self.last_duration_ms: Optional[float] = None
+
+    def start(self) -> None:
+        if not settings.prefetch_enabled or self._task is not None:
+            return
+        self._task = asyncio.ensure_future(self._loop())
+        logger.info(f"Prefetcher started - top {self.top_n} recommended queries, checked every {self.interval_seconds}s")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Prefetch run failed: {e}", exc_info=True)
+            await asyncio.sleep(self.interval_seconds)
+
+    def _take_budget(self) -> bool:
+        """Reserve one Gemini generation from the hourly budget"""
+        cutoff = time.monotonic() - BUDGET_WINDOW_SECONDS
+        while self._generations and self._generations[0] < cutoff:
+            self._generations.popleft()
+        if len(self._generations) >= self.max_generations_per_hour:
+            return False
+        self._generations.append(time.monotonic())
+        return True
+
+    async def run_once(self, force: bool = False) -> int:
+        """Prefetch the recommended queries if the stream changed; returns reports generated"""
+        if not settings.gemini_api_key:
+            return 0
+        generation = await run_io(stream_generation, settings.resolved_data_path)
+        if generation == self.last_generation and not force:
+            return 0
+
+        start = time.monotonic()
+        queries = [rec["query"] for rec in (await recommended_queries())[:self.top_n]]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        generated_before = self.generated
+        results = await asyncio.gather(*(self._prefetch(query, semaphore) for query in queries), return_exceptions=True)
+        for query, result in zip(queries, results):
+            if isinstance(result, Exception):
+                self.failures += 1
+                logger.warning(f"Prefetch failed for '{query}': {result}")
+
+        self.last_generation = generation
+        self.runs += 1
+        self.last_run_at = datetime.utcnow().isoformat() + "Z"
+        self.last_duration_ms = round((time.monotonic() - start) * 1000, 1)
+        generated = self.generated - generated_before
+        logger.info(f"Prefetched {len(queries)} recommended queries ({generated} reports generated) in {self.last_duration_ms}ms")
+        return generated
+
+    async def _prefetch(self, query: str, semaphore: asyncio.Semaphore) -> None:
+        async with semaphore:
+            self.queries += 1
+            result = await process_query(QueryRequest(query=query))
+            event_ids = [item.event_id for item in result.evidence if item.event_id]
+            evidence_count, prompt, evidence_ids = await build_generate_prompt(GenerateRequest(query=query, event_ids=event_ids))
+            if evidence_count == 0:
+                # /generate answers these with the cheap fallback report
+                self.skipped_no_evidence += 1
+                return
+            # Counted per attempt, so the budget bounds Gemini calls even if some were cache hits
+            if not self._take_budget():
+                self.skipped_budget += 1
+                return
+            try:
+                report = await gemini_client.generate_report(prompt, evidence_ids, admission=generation_admission.slot(PREFETCH_CLIENT))
+            except AdmissionRejected:
+                # Users come first; the next stream change retries
+                self.shed += 1
+                return
+            # Only validated JSON is cached; anything else is an error text
+            if clean_report_json(report)[1]:
+                self.generated += 1
+            else:
+                self.failures += 1
+                logger.warning(f"Prefetch for '{query}' produced no valid report")
+
+    def stats(self) -> dict:
+        cutoff = time.monotonic() - BUDGET_WINDOW_SECONDS
+        used = sum(1 for ts in self._generations if ts >= cutoff)
+        return {
+            "enabled": settings.prefetch_enabled,
+            "running": self._task is not None and not self._task.done(),
+            "runs": self.runs,
+            "queries": self.queries,
+            "generated": self.generated,
+            "skipped_no_evidence": self.skipped_no_evidence,
+            "skipped_budget": self.skipped_budget,
+            "shed": self.shed,
+            "failures": self.failures,
+            "budget_remaining": max(0, self.max_generations_per_hour - used),
+            "last_run_at": self.last_run_at,
+            "last_duration_ms": self.last_duration_ms,
+        }
+
+
+# Global prefetcher instance
+prefetcher = Prefetcher(
+    interval_seconds=settings.prefetch_interval_seconds,
+    top_n=settings.prefetch_top_n,
+    concurrency=settings.prefetch_concurrency,
+    max_generations_per_hour=settings.prefetch_max_generations_per_hour
+)
+metrics.register("prefetch", prefetcher.stats)
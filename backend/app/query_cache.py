@@ -1,53 +1,99 @@
-from functools import lru_cache
-from datetime import datetime, timedelta
-from typing import Dict, Optional, Tuple
-import hashlib
 import json
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+from app.settings import settings
+from app import metrics
 
 class QueryCache:
-    """LRU cache for query results with TTL"""
-    
-    def __init__(self, ttl_seconds: int = 60, max_size: int = 100):
-        self.ttl_seconds = ttl_seconds
-        self.cache: Dict[str, Tuple[dict, datetime]] = {}
-        self.max_size = max_size
-    
-    def _make_key(self, query: str, k: int) -> str:
-        """Create cache key from query and k"""
-        normalized = query.lower().strip()
-        key_str = f"{normalized}:{k}"
-        return hashlib.md5(key_str.encode()).hexdigest()
-    
-    def get(self, query: str, k: int) -> Optional[dict]:
-        """Get cached result if valid"""
-        key = self._make_key(query, k)
-        
-        if key not in self.cache:
-            return None
-        
-        result, timestamp = self.cache[key]
-        
-        # Check if expired
-        if (datetime.utcnow() - timestamp).total_seconds() > self.ttl_seconds:
-            del self.cache[key]
-            return None
-        
-        return result
-    
-    def set(self, query: str, k: int, result: dict):
-        """Cache a query result"""
-        key = self._make_key(query, k)
-        
-        # Implement simple LRU: if cache is full, remove oldest
-        if len(self.cache) >= self.max_size:
-            oldest_key = min(self.cache.keys(), key=lambda k: self.cache[k][1])
-            del self.cache[oldest_key]
-        
-        self.cache[key] = (result, datetime.utcnow())
-    
+    """
+    LRU cache for query results, keyed on (normalized query, k, stream generation).
+
+    The stream generation changes on every append to the stream log, so a
+    result stays valid for as long as the data it was computed from is
+    unchanged and is never served after new events arrive. Bounded by both
+    entry count and an estimated byte size; both lookups and evictions are O(1).
+    """
+
+    def __init__(self, max_entries: int = 100, max_bytes: int = 8 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (result, estimated size), least recently used first
+        self.cache: "OrderedDict[Tuple, Tuple[dict, int]]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _make_key(self, query: str, k: int, generation: Hashable) -> Tuple:
+        """Create cache key from the normalized query, k and stream generation"""
+        normalized = " ".join(query.lower().split())
+        return (normalized, k, generation)
+
+    def get(self, query: str, k: int, generation: Hashable) -> Optional[dict]:
+        """Get the cached result for this stream generation, if any"""
+        key = self._make_key(query, k, generation)
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, query: str, k: int, generation: Hashable, result: dict):
+        """Cache a query result computed from the given stream generation"""
+        key = self._make_key(query, k, generation)
+        size = _estimate_size(result)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self.cache.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous[1]
+            self.cache[key] = (result, size)
+            self.total_bytes += size
+            # Evict least recently used entries until within both budgets;
+            # entries from older generations can never hit again and age out first
+            while len(self.cache) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self.cache.popitem(last=False)
+                self.total_bytes -= evicted_size
+
     def clear(self):
         """Clear all cached results"""
-        self.cache.clear()
+        with self._lock:
+            self.cache.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self.cache),
+                "bytes": self.total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+def _json_default(value):
+    """Serialize pydantic models (evidence items) for size estimation"""
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return str(value)
+
+def _estimate_size(result: dict) -> int:
+    """Approximate memory footprint of a result as its JSON size"""
+    try:
+        return len(json.dumps(result, default=_json_default))
+    except (TypeError, ValueError):
+        return 0
 
 # Global query cache instance
-query_cache = QueryCache(ttl_seconds=60, max_size=100)
+query_cache = QueryCache(
+    max_entries=settings.query_cache_max_entries,
+    max_bytes=settings.query_cache_max_bytes
+)
+metrics.register("query_cache", query_cache.stats)
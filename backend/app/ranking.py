@@ -0,0 +1,103 @@
+"""
+Relevance ranking for query evidence.
+Scores candidate events with BM25 over the event cache's inverted index
+(title terms weighted higher than content), blends in recency and source
+trust, and selects the top k with a heap.
+"""
+import heapq
+import math
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from app.search_index import InvertedIndex, tokenize
+from app.settings import settings
+from app.utils import compute_recency_boost, get_trust_info
+
+# Trust level -> ranking bonus in [0, 1]
+TRUST_SCORES = {"High": 1.0, "Medium": 0.5, "Low": 0.0}
+
+RECENCY_MAX_BOOST = 50
+
+
+def query_term_weights(keywords: Iterable[str], primary_keywords: Iterable[str] = ()) -> Dict[str, float]:
+    """
+    Query token -> weight. Tokens the user typed weigh 1.0; tokens that only
+    come from alias expansion weigh settings.rank_alias_weight.
+    """
+    primary = {token for keyword in primary_keywords for token in tokenize(keyword)}
+    weights: Dict[str, float] = {}
+    for keyword in keywords:
+        for token in tokenize(keyword):
+            weights[token] = 1.0 if token in primary else settings.rank_alias_weight
+    return weights
+
+
+class BM25Scorer:
+    """
+    BM25 against the live corpus statistics of an InvertedIndex.
+
+    Query tokens are prefix matches (as in InvertedIndex.match), so each is
+    expanded once to the vocabulary tokens it covers, with their IDF, and a
+    document is scored by walking its own (small) term counter.
+    """
+
+    def __init__(self, index: InvertedIndex, term_weights: Dict[str, float],
+                 k1: Optional[float] = None, b: Optional[float] = None):
+        self.index = index
+        self.k1 = settings.rank_bm25_k1 if k1 is None else k1
+        self.b = settings.rank_bm25_b if b is None else b
+        self.avg_length = index.avg_length or 1.0
+        num_docs = len(index)
+        self.term_idf: Dict[str, float] = {}
+        for query_token, weight in term_weights.items():
+            for token in index.prefix_tokens(query_token):
+                doc_freq = len(index.postings[token])
+                idf = math.log(1 + (num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+                self.term_idf[token] = max(self.term_idf.get(token, 0.0), weight * idf)
+
+    def score(self, ordinal: int) -> float:
+        counts = self.index.doc_tokens.get(ordinal)
+        if not counts or not self.term_idf:
+            return 0.0
+        norm = self.k1 * (1 - self.b + self.b * self.index.doc_lengths[ordinal] / self.avg_length)
+        total = 0.0
+        for token, freq in counts.items():
+            idf = self.term_idf.get(token)
+            if idf:
+                total += idf * freq * (self.k1 + 1) / (freq + norm)
+        return total
+
+
+def blended_score(relevance: float, event: dict, trust_cache: Optional[Dict[str, float]] = None) -> float:
+    """BM25 relevance plus weighted recency and source trust bonuses"""
+    recency = compute_recency_boost(event.get("timestamp"), max_boost=RECENCY_MAX_BOOST) / RECENCY_MAX_BOOST
+    source = event.get("source", "Unknown")
+    if trust_cache is not None and source in trust_cache:
+        trust = trust_cache[source]
+    else:
+        trust = TRUST_SCORES.get(get_trust_info(source)["trust_level"], 0.0)
+        if trust_cache is not None:
+            trust_cache[source] = trust
+    return relevance + settings.rank_recency_weight * recency + settings.rank_trust_weight * trust
+
+
+def top_k(scored: List[Tuple[float, int, dict]], k: int,
+          key: Optional[Callable[[dict], Hashable]] = None) -> List[Tuple[float, dict]]:
+    """
+    Best k (score, event) pairs from (score, ordinal, event) triples, highest
+    score first and newer events first on ties. With key, only the best event
+    per key is kept. Heapify is O(n) and each pop O(log n), so this avoids
+    sorting the whole candidate list.
+    """
+    heap = [(-score, -ordinal, event) for score, ordinal, event in scored]
+    heapq.heapify(heap)
+    results: List[Tuple[float, dict]] = []
+    seen = set()
+    while heap and len(results) < k:
+        neg_score, _, event = heapq.heappop(heap)
+        if key is not None:
+            event_key = key(event)
+            if event_key in seen:
+                continue
+            seen.add(event_key)
+        results.append((-neg_score, event))
+    return results
@@ -1,20 +1,24 @@
-from fastapi import APIRouter, HTTPException, Response
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from datetime import datetime
+import asyncio
 import json
 import os
 from pathlib import Path
+from typing import Optional
 
 import google.generativeai as genai
 from app.models import (
     QueryRequest, QueryResponse, InjectRequest, InjectResponse, 
+    BatchInjectItemResult, BatchInjectResponse,
     EvidenceItem, SignalCompact, RadarStatus, GenerateRequest, 
     GenerateResponse, ExportRequest, SourceVerifyResponse, SourceVerifyItem
 )
 from app.settings import settings
-from app.sources.perplexity_source import pull_perplexity_signals
-from app.sources.x_source import pull_x_signals
+from app.scheduler import SOURCE_JOBS, PULLED, SKIPPED
 from app.utils import (
-    safe_read_jsonl, 
+    safe_read_jsonl,
     compute_confidence,
     get_trust_info,
     now_ts, 
@@ -22,10 +26,19 @@ from app.utils import (
     compute_recency_boost, 
     normalize_text, 
     deduplicate_and_append,
+    deduplicate_events,
     format_error_response
 )
 from app.services.gemini_client import gemini_client
+from app.services.evidence_context import build_evidence_context, evidence_snippet
+from app.services.admission import AdmissionRejected, generation_admission
 from app.demo_generator import DemoGenerator
+from app.cache import event_cache
+from app.segments import resolve_stream_log, stream_generation
+from app.stream_writer import get_stream_writer
+from app.singleflight import request_flights
+from app.io_pool import run_io
+from app import metrics
 from app import storage
 
 router = APIRouter()
@@ -43,13 +56,12 @@ async def bootstrap_system():
         generator = DemoGenerator()
         new_events = generator.generate_batch(10)
         
-        # Append to stream with deduplication
+        # Append to stream with deduplication (blocking I/O on the I/O pool)
         data_path = settings.resolved_data_path
-        added_count = deduplicate_and_append(new_events, data_path)
+        added_count = await run_io(deduplicate_and_append, new_events, data_path)
         
-        # Force cache refresh
-        from app.cache import event_cache
-        event_cache.refresh(data_path)
+        # Pick up the appended events right away
+        await run_io(event_cache.refresh, data_path)
         
         return {
             "status": "success", 
@@ -64,19 +76,37 @@ async def bootstrap_system():
 
 # Signals endpoint
 @router.get("/signals")
-async def get_signals():
-    """Get latest signals for the ticker."""
+async def get_signals(since: Optional[str] = None, until: Optional[str] = None):
+    """
+    Get latest signals for the ticker.
+    Optional ISO `since`/`until` bounds read an explicit time range from the
+    stream via its timestamp index instead of the live cache window.
+    """
     try:
         data_path = settings.resolved_data_path
-        if not data_path.exists():
+        # Identical concurrent requests share one read per stream generation
+        generation = await run_io(stream_generation, data_path)
+        flight_key = ("signals", since, until, generation)
+        return await request_flights.do(flight_key, lambda: run_io(_compute_signals, data_path, since, until))
+    except Exception as e:
+        print(f"Signals Error: {e}")
+        return []
+
+def _compute_signals(data_path: Path, since: Optional[str], until: Optional[str]) -> list:
+    """Read and deduplicate the latest signals"""
+    try:
+        if not resolve_stream_log(data_path).has_data():
             return []
             
-        # Read fresh events
-        events = safe_read_jsonl(
-            data_path, 
-            limit=20, # Top 20
-            freshness_hours=settings.freshness_hours
-        )
+        if since or until:
+            events = safe_read_jsonl(data_path, limit=20, since=since, until=until)
+        else:
+            # Read fresh events
+            events = event_cache.get_events(
+                data_path, 
+                limit=20, # Top 20
+                freshness_hours=settings.freshness_hours
+            )
         
         # Deduplicate
         seen = set()
@@ -117,20 +147,21 @@ async def inject_signal(request: InjectRequest):
             "source": request.source
         }
         
-        # Compute ID
-        event_id = compute_event_id(data_entry)
+        # Check and mark as seen, the same way as /inject/batch
+        [(event_id, _, is_new)] = await run_io(deduplicate_events, [data_entry])
         
-        # Append as JSON line to the file
         data_path = settings.resolved_data_path
-        with open(data_path, "a", encoding="utf-8") as f:
-            json.dump(data_entry, f, ensure_ascii=False)
-            f.write("\n")
-            
-        # Mark as seen
-        storage.mark_seen(event_id, request.source, request.title)
+        if is_new:
+            # Append as JSON line via the stream's single writer (group commit).
+            # If it fails, un-mark the event so a retry isn't told "duplicate"
+            try:
+                await get_stream_writer(data_path).write_async([data_entry])
+            except BaseException:
+                await run_io(storage.unmark_seen, [event_id])
+                raise
         
         return InjectResponse(
-            status="success",
+            status="success" if is_new else "duplicate",
             injected_at=injected_at,
             stream_path_used=str(data_path)
         )
@@ -152,6 +183,138 @@ async def inject_signal(request: InjectRequest):
         )
 
 
+def _parse_inject_batch(body: bytes, content_type: str) -> list:
+    """
+    Parse a JSON array or NDJSON body into a list of InjectRequest objects,
+    or (error message) strings for items that failed to parse or validate.
+    """
+    raw_items = None
+    if "ndjson" not in content_type and "jsonl" not in content_type:
+        try:
+            parsed = json.loads(body)
+            raw_items = parsed if isinstance(parsed, list) else [parsed]
+        except ValueError:
+            raw_items = None
+    
+    if raw_items is None:
+        # NDJSON: one object per non-empty line
+        raw_items = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                raw_items.append(json.loads(line))
+            except ValueError as e:
+                raw_items.append(f"Invalid JSON: {e}")
+    
+    items = []
+    for raw in raw_items:
+        if isinstance(raw, str):
+            items.append(raw)
+            continue
+        try:
+            items.append(InjectRequest.model_validate(raw))
+        except ValidationError as e:
+            items.append("; ".join(f"{'.'.join(map(str, err['loc'])) or 'item'}: {err['msg']}" for err in e.errors()))
+    return items
+
+# Batch inject endpoint
+@router.post("/inject/batch", response_model=BatchInjectResponse)
+async def inject_batch(request: Request):
+    """
+    Inject many items in one request.
+    
+    - Body is a JSON array of InjectRequest objects, or NDJSON (one per line)
+    - The whole batch is deduplicated against the SQLite store in bulk
+    - New items are appended through the stream writer in one group commit
+    - Returns per-item status: accepted, duplicate or invalid
+    - Responds 429 with Retry-After while the ingest queue is above its high-water mark
+    """
+    data_path = settings.resolved_data_path
+    writer = get_stream_writer(data_path)
+    
+    # Backpressure: shed before reading the body when the writer is behind
+    if writer.queue_depth >= settings.ingest_queue_high_water:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Ingest queue is full ({writer.queue_depth} events pending), retry later",
+            headers={"Retry-After": str(settings.ingest_retry_after_seconds)}
+        )
+    
+    body = await request.body()
+    if not body.strip():
+        raise HTTPException(status_code=400, detail="Empty batch")
+    
+    items = await run_io(_parse_inject_batch, body, request.headers.get("content-type", ""))
+    if len(items) > settings.ingest_batch_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {len(items)} items; the limit is {settings.ingest_batch_max_items}"
+        )
+    
+    try:
+        injected_at = datetime.now().isoformat()
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            if isinstance(item, str):
+                results[index] = BatchInjectItemResult(index=index, status="invalid", error=item)
+            else:
+                valid.append((index, {
+                    "title": item.title,
+                    "content": item.content,
+                    "timestamp": item.timestamp or injected_at,
+                    "source": item.source
+                }))
+        
+        # One bulk lookup + one commit for the whole batch
+        deduped = await run_io(deduplicate_events, [entry for _, entry in valid])
+        
+        new_events = []
+        new_ids = []
+        for (index, _), (event_id, event, is_new) in zip(valid, deduped):
+            if is_new:
+                new_events.append(event)
+                new_ids.append(event_id)
+            results[index] = BatchInjectItemResult(
+                index=index,
+                status="accepted" if is_new else "duplicate",
+                event_id=event_id
+            )
+        
+        # One buffered append for everything new. If it fails, the events
+        # were never written: un-mark them so a retry isn't told "duplicate"
+        try:
+            await writer.write_async(new_events)
+        except BaseException:
+            await run_io(storage.unmark_seen, new_ids)
+            raise
+        
+        accepted = len(new_events)
+        invalid = sum(1 for item in items if isinstance(item, str))
+        return BatchInjectResponse(
+            status="success" if invalid == 0 else "partial",
+            received=len(items),
+            accepted=accepted,
+            duplicates=len(valid) - accepted,
+            invalid=invalid,
+            injected_at=injected_at,
+            stream_path_used=str(data_path),
+            items=results
+        )
+    
+    except PermissionError as e:
+        raise HTTPException(
+            status_code=403,
+            detail=f"Permission denied when writing to {settings.data_stream_path}: {str(e)}"
+        )
+    except OSError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"File system error: {str(e)}"
+        )
+
+
 # Query endpoint
 @router.post("/query", response_model=QueryResponse)
 async def process_query(request: QueryRequest):
@@ -159,149 +322,38 @@ async def process_query(request: QueryRequest):
     Process a query and retrieve top-k evidence from the data stream.
     
     OPTIMIZED FOR SPEED:
-    - Uses in-memory event cache (refreshes every 3s)
-    - LRU query result cache (60s TTL)
+    - Uses incremental in-memory event cache (parses only appended bytes)
+    - LRU query result cache (invalidated by stream generation)
     - Timing logs for performance monitoring
     - Limited snippet size (160 chars)
     """
     import time
     import uuid
-    from app.cache import event_cache
     from app.query_cache import query_cache
-    from app.company_dict import COMPANY_DICT
     
     request_id = str(uuid.uuid4())[:8]
     start_time = time.time()
     
     try:
-        # Check query cache first
-        cached_result = query_cache.get(request.query, request.k)
+        data_path = settings.resolved_data_path
+        
+        # Check query cache first. The generation is read before the event
+        # cache syncs, so a result is never filed under a newer generation
+        # than the data it was computed from.
+        generation = await run_io(stream_generation, data_path)
+        cached_result = query_cache.get(request.query, request.k, generation)
         if cached_result:
             logger.info(f"[{request_id}] Cache HIT - {request.query[:50]} - {(time.time() - start_time)*1000:.1f}ms")
             return QueryResponse(**cached_result)
         
-        logger.info(f"[{request_id}] Query START - {request.query[:50]}")
-        
-        data_path = settings.resolved_data_path
-        
-        # Check if file exists
-        if not data_path.exists():
-            result = {
-                "query": request.query,
-                "evidence": [],
-                "signal_strength": 0,
-                "last_updated": datetime.now().isoformat()
-            }
-            query_cache.set(request.query, request.k, result)
-            return QueryResponse(**result)
-        
-        # STAGE 1: Read events from cache (FAST)
-        # Read fresh events
-        events = safe_read_jsonl(
-            data_path, 
-            limit=settings.max_events_to_scan,
-            freshness_hours=settings.freshness_hours
+        # Identical concurrent misses await a single computation
+        flight_key = ("query", " ".join(request.query.lower().split()), request.k, generation)
+        result = await request_flights.do(
+            flight_key,
+            lambda: run_io(_compute_query, request, data_path, generation, request_id)
         )
-            
-        # STAGE 3: Match events (OPTIMIZED)
-        matched_events = []
-        
-        # Synonym Expansion
-        raw_keywords = [kw.lower() for kw in request.query.split() if len(kw) > 2]
-        query_keywords = set(raw_keywords)
-        
-        # Universal Synonym Expansion using COMPANY_DICT
-        for company, data in COMPANY_DICT.items():
-            aliases = [a.lower() for a in data.get("aliases", [])]
-            aliases.append(company.lower())
-            
-            # Check if any alias is in the query
-            is_relevant = False
-            for kw in raw_keywords:
-                if kw in aliases:
-                    is_relevant = True
-                    break
-            
-            # If relevant, add all aliases and topics to search
-            if is_relevant:
-                query_keywords.update(aliases)
-                # Add topics as keywords too? Maybe too broad, but let's add key terms from topics
-                # For now, just aliases is a huge win.
-                
-        query_keywords = list(query_keywords)
-        logger.info(f"Expanded Query Keywords: {query_keywords}")
-        
-        for event in events:
-            title = event.get("title", "").lower()
-            content = event.get("content", "").lower()
-            company = event.get("company", "").lower() if event.get("company") else ""
-            
-            # Check if any keyword exists in title, content, or company
-            match_count = 0
-            for keyword in query_keywords:
-                if keyword in title or keyword in content or keyword in company:
-                    match_count += 1
-            
-            if match_count > 0:
-                matched_events.append(event)
-        
-        # Deduplicate matched events
-        seen = set()
-        unique_matched = []
-        for event in matched_events:
-            key = (event.get("title"), event.get("source"))
-            if key not in seen:
-                seen.add(key)
-                unique_matched.append(event)
-        matched_events = unique_matched
-        
-        # Convert to EvidenceItem objects
-        evidence_list = []
-        for event in matched_events:
-            # Generate snippet
-            # Priority 1: Use existing snippet from event (e.g. from DemoGenerator)
-            snippet = event.get("snippet", "")
-            
-            # Priority 2: Generate from content if snippet is missing/empty
-            if not snippet or len(snippet) < 10:
-                content = event.get("content", "")
-                if content and len(content) > 20:
-                    snippet = content[:200] + "..."
-                else:
-                    # Fallback to title
-                    snippet = event.get("title", "")
-
-            evidence_list.append(EvidenceItem(
-                title=event.get("title", "Untitled"),
-                snippet=snippet,
-                source=event.get("source", "Unknown"),
-                timestamp=event.get("timestamp", ""),
-                url=event.get("url", ""),
-                company=event.get("company"),
-                event_type=event.get("event_type", "general")
-            ))
-            
-        # Sort by timestamp (newest first)
-        evidence_list.sort(key=lambda x: x.timestamp, reverse=True)
-        
-        # Limit to k
-        evidence_list = evidence_list[:request.k]
-        
-        result = {
-            "query": request.query,
-            "evidence": evidence_list,
-            "signal_strength": compute_confidence(evidence_list)["score"],
-            "confidence": compute_confidence(evidence_list),
-            "last_updated": datetime.now().isoformat(),
-            "report": None,
-            "llm_status": "pending",
-            "stream_path_used": str(data_path)
-        }
         
-        # Update cache
-        query_cache.set(request.query, request.k, result)
-        
-        logger.info(f"[{request_id}] Query END - Found {len(evidence_list)} items - {(time.time() - start_time)*1000:.1f}ms")
+        logger.info(f"[{request_id}] Query END - Found {len(result['evidence'])} items - {(time.time() - start_time)*1000:.1f}ms")
         return QueryResponse(**result)
         
     except Exception as e:
@@ -317,6 +369,73 @@ async def process_query(request: QueryRequest):
             llm_status="failed"
         )
 
+def _compute_query(request: QueryRequest, data_path: Path, generation, request_id: str) -> dict:
+    """Retrieve and rank evidence for a query, and cache the result"""
+    from app.query_cache import query_cache
+    from app.keyword_matcher import expand_query_keywords
+    
+    logger.info(f"[{request_id}] Query START - {request.query[:50]}")
+    
+    # Check if file exists
+    if not resolve_stream_log(data_path).has_data():
+        result = {
+            "query": request.query,
+            "evidence": [],
+            "signal_strength": 0,
+            "last_updated": datetime.now().isoformat()
+        }
+        query_cache.set(request.query, request.k, generation, result)
+        return result
+    
+    # STAGE 1: Synonym Expansion
+    # Companies mentioned in the query (single pass of the precompiled
+    # COMPANY_DICT matcher) contribute all of their aliases
+    query_keywords = list(expand_query_keywords(request.query))
+    logger.info(f"Expanded Query Keywords: {query_keywords}")
+    
+    # STAGE 2: Match and rank events via the cache's inverted index (FAST)
+    # BM25 over title/content blended with recency and source trust;
+    # top k by heap, keeping the best-scoring copy of each (title, source)
+    ranked = event_cache.rank(
+        data_path,
+        query_keywords,
+        request.k,
+        primary_keywords=request.query.split(),
+        freshness_hours=settings.freshness_hours,
+        key=lambda event: (event.get("title"), event.get("source"))
+    )
+    matched_events = [event for _, event in ranked]
+    
+    # Convert to EvidenceItem objects
+    evidence_list = []
+    for event in matched_events:
+        # Own snippet, else the start of the content, else the title
+        evidence_list.append(EvidenceItem(
+            title=event.get("title", "Untitled"),
+            snippet=evidence_snippet(event),
+            source=event.get("source", "Unknown"),
+            timestamp=event.get("timestamp", ""),
+            url=event.get("url", ""),
+            company=event.get("company"),
+            event_type=event.get("event_type", "general"),
+            event_id=compute_event_id(event)
+        ))
+    
+    result = {
+        "query": request.query,
+        "evidence": evidence_list,
+        "signal_strength": compute_confidence(evidence_list)["score"],
+        "confidence": compute_confidence(evidence_list),
+        "last_updated": datetime.now().isoformat(),
+        "report": None,
+        "llm_status": "pending",
+        "stream_path_used": str(data_path)
+    }
+    
+    # Update cache
+    query_cache.set(request.query, request.k, generation, result)
+    return result
+
 
 # Radar endpoint
 @router.get("/radar", response_model=list[RadarStatus])
@@ -326,11 +445,22 @@ async def get_radar():
     """
     try:
         data_path = settings.resolved_data_path
-        if not data_path.exists():
+        # Identical concurrent requests share one computation per stream generation
+        generation = await run_io(stream_generation, data_path)
+        flight_key = ("radar", generation)
+        return await request_flights.do(flight_key, lambda: run_io(_compute_radar, data_path))
+    except Exception as e:
+        print(f"Radar Error: {e}")
+        return []
+
+def _compute_radar(data_path: Path) -> list[RadarStatus]:
+    """Count fresh events per company"""
+    try:
+        if not resolve_stream_log(data_path).has_data():
             return []
         
         # Read fresh events
-        events = safe_read_jsonl(
+        events = event_cache.get_events(
             data_path, 
             limit=settings.max_events_to_scan,
             freshness_hours=settings.freshness_hours
@@ -371,91 +501,115 @@ async def get_radar():
 
 
 # Generate endpoint
-@router.post("/generate", response_model=GenerateResponse)
-async def generate_insight(request: GenerateRequest):
+SIMULATION_INSIGHT = "**Simulation Mode**\n\nGemini API Key is missing. Please configure `GEMINI_API_KEY` in `.env` for live AI insights.\n\nBased on the available signals, market activity appears elevated with significant movement in the semiconductor sector."
+
+def build_fallback_report(query: str, latest_events: list[dict], busy: bool = False) -> dict:
     """
-    Generate insight using Gemini based on query and context.
+    Structured report returned instead of calling Gemini when there is no
+    evidence, or (busy) when the generation was shed under load.
     """
-    try:
-        # Check for API key first
-        if not settings.gemini_api_key:
-             return GenerateResponse(insight="**Simulation Mode**\n\nGemini API Key is missing. Please configure `GEMINI_API_KEY` in `.env` for live AI insights.\n\nBased on the available signals, market activity appears elevated with significant movement in the semiconductor sector.")
+    # Construct suggestions based on query or general tech
+    from app.keyword_matcher import ALIAS, get_matcher
+    suggestions = []
+    
+    # Try to find matching company for better suggestions
+    matched_company = get_matcher().first(query, ALIAS)
+    
+    if matched_company:
+        suggestions = [f"Recent {matched_company} yield reports", f"{matched_company} supply chain updates", f"Competitor impact on {matched_company}"]
+    else:
+        suggestions = ["Top 3 high-impact events", "Semiconductor supply chain status", "AI infrastructure updates"]
 
-        # 1. Gating Logic: Check evidence count
-        # We estimate evidence count by looking for the separator pattern used in frontend
-        evidence_count = request.context.count("[20") # Crude but effective for ISO timestamps in context
-        
-        logger.info(f"Generating insight for query: '{request.query}' | Evidence Count: {evidence_count} | Context Len: {len(request.context)}")
+    if busy:
+        status_section = {
+            "id": "evidence",
+            "title": "Intelligence Engine at Capacity",
+            "points": [
+                f"Too many reports are being generated right now; '{query}' was not analyzed.",
+                "Retry in a few seconds. The live signals below remain current."
+            ]
+        }
+    else:
+        status_section = {
+            "id": "evidence",
+            "title": "Insufficient Live Signals",
+            "points": [
+                f"No direct evidence found for '{query}' in the current data stream.",
+                "The system is actively monitoring global nodes for relevant signals."
+            ]
+        }
 
-        # NEW RULE: If evidence_count == 0, return a structured fallback
-        if evidence_count == 0:
-            logger.info("Zero evidence found. Generating structured fallback.")
-            
-            # Fetch latest 3 signals for context
-            data_path = settings.resolved_data_path
-            latest_events = safe_read_jsonl(data_path, limit=3)
-            
-            # Construct suggestions based on query or general tech
-            from app.company_dict import COMPANY_DICT
-            suggestions = []
-            query_upper = request.query.upper()
-            
-            # Try to find matching company for better suggestions
-            matched_company = None
-            for company, data in COMPANY_DICT.items():
-                if query_upper in company.upper() or any(a.upper() in query_upper for a in data.get("aliases", [])):
-                    matched_company = company
-                    break
-            
-            if matched_company:
-                suggestions = [f"Recent {matched_company} yield reports", f"{matched_company} supply chain updates", f"Competitor impact on {matched_company}"]
-            else:
-                suggestions = ["Top 3 high-impact events", "Semiconductor supply chain status", "AI infrastructure updates"]
-
-            fallback_report = {
-                "sections": [
-                    {
-                        "id": "evidence",
-                        "title": "Insufficient Live Signals",
-                        "points": [
-                            f"No direct evidence found for '{request.query}' in the current data stream.",
-                            "The system is actively monitoring global nodes for relevant signals."
-                        ]
-                    },
-                    {
-                        "id": "change",
-                        "title": "Alternative Directives",
-                        "points": suggestions
-                    },
-                    {
-                        "id": "outlook",
-                        "title": "Latest Global Signals",
-                        "points": [f"[{e.get('source', 'Unknown')}] {e.get('title', 'Untitled')}" for e in latest_events] if latest_events else ["Monitoring for new signals..."]
-                    },
-                    {
-                        "id": "confidence",
-                        "title": "Confidence Meter",
-                        "value": "Low",
-                        "reason": "Zero matching evidence items found."
-                    },
-                    {
-                        "id": "ceo",
-                        "title": "System Status",
-                        "text": "We are currently scanning for signals matching your query. In the meantime, consider the alternative directives or review the latest global feed above."
-                    }
-                ]
+    return {
+        "sections": [
+            status_section,
+            {
+                "id": "change",
+                "title": "Alternative Directives",
+                "points": suggestions
+            },
+            {
+                "id": "outlook",
+                "title": "Latest Global Signals",
+                "points": [f"[{e.get('source', 'Unknown')}] {e.get('title', 'Untitled')}" for e in latest_events] if latest_events else ["Monitoring for new signals..."]
+            },
+            {
+                "id": "confidence",
+                "title": "Confidence Meter",
+                "value": "Low",
+                "reason": "Report not generated: engine at capacity." if busy else "Zero matching evidence items found."
+            },
+            {
+                "id": "ceo",
+                "title": "System Status",
+                "text": "We are currently scanning for signals matching your query. In the meantime, consider the alternative directives or review the latest global feed above."
             }
-            return GenerateResponse(insight=json.dumps(fallback_report))
+        ]
+    }
 
-        # NEW RULE: If evidence_count >= 1, ALWAYS generate report
-        prompt = f"""
+async def _fallback_report(query: str, busy: bool = False) -> dict:
+    if busy:
+        logger.info("Generation shed under load. Returning structured fallback.")
+    else:
+        logger.info("Zero evidence found. Generating structured fallback.")
+    # Fetch latest 3 signals for context
+    latest_events = await run_io(event_cache.get_events, settings.resolved_data_path, limit=3)
+    return build_fallback_report(query, latest_events, busy=busy)
+
+def _client_id(http_request: Request) -> str:
+    """Key for per-client admission limits"""
+    return http_request.client.host if http_request.client else "unknown"
+
+def _count_evidence(request: GenerateRequest) -> int:
+    # We estimate evidence count by looking for the separator pattern used in frontend
+    evidence_count = request.context.count("[20") # Crude but effective for ISO timestamps in context
+    logger.info(f"Generating insight for query: '{request.query}' | Evidence Count: {evidence_count} | Context Len: {len(request.context)}")
+    return evidence_count
+
+async def _resolve_evidence(request: GenerateRequest) -> tuple[int, str, list[str]]:
+    """
+    (evidence count, context, evidence IDs) for a generate request. With
+    event_ids the events are looked up in the event cache and the context is
+    built server-side within the token budget; IDs that have been evicted
+    don't count. Otherwise the client-formatted context is used as is.
+    """
+    if request.event_ids is None:
+        return _count_evidence(request), request.context, []
+
+    requested = request.event_ids[:settings.generate_max_evidence]
+    events = await run_io(event_cache.get_by_ids, settings.resolved_data_path, requested)
+    context = build_evidence_context(events, settings.generate_context_token_budget)
+    logger.info(f"Generating insight for query: '{request.query}' | Evidence: {len(events)}/{len(requested)} IDs found | Context Len: {len(context)}")
+    return len(events), context, [compute_event_id(event) for event in events]
+
+def build_insight_prompt(query: str, context: str) -> str:
+    return f"""
         You are SiliconPulse, an advanced strategic intelligence engine. 
         Generate a high-precision intelligence report based on the provided context.
         
-        QUERY: {request.query}
+        QUERY: {query}
         
         CONTEXT:
-        {request.context}
+        {context}
         
         INSTRUCTIONS:
         - Analyze the provided evidence carefully.
@@ -478,31 +632,104 @@ async def generate_insight(request: GenerateRequest):
           ]
         }}
         """
+
+async def build_generate_prompt(request: GenerateRequest) -> tuple[int, str, list[str]]:
+    """(evidence count, prompt, evidence IDs) for a generate request; also used by the prefetcher"""
+    evidence_count, context, evidence_ids = await _resolve_evidence(request)
+    return evidence_count, build_insight_prompt(request.query, context), evidence_ids
+
+def _generation_error_insight(e: Exception) -> str:
+    return f"**Insight Generation Unavailable**\n\nWe encountered an issue connecting to the intelligence engine. However, the live data above remains accurate.\n\n*System Note: {str(e)}*"
+
+@router.post("/generate", response_model=GenerateResponse)
+async def generate_insight(request: GenerateRequest, http_request: Request):
+    """
+    Generate insight using Gemini based on query and context. Send the
+    event_ids from /query to have the context built server-side.
+    """
+    return GenerateResponse(insight=await generate_insight_text(request, _client_id(http_request)))
+
+async def generate_insight_text(request: GenerateRequest, client_id: str) -> str:
+    """
+    Insight string for a generate request. Gemini calls are admitted per
+    client_id; a shed request gets the structured fallback report at once.
+    """
+    try:
+        # Check for API key first
+        if not settings.gemini_api_key:
+             return SIMULATION_INSIGHT
+
+        # 1. Gating Logic: Check evidence count
+        evidence_count, prompt, evidence_ids = await build_generate_prompt(request)
+
+        # NEW RULE: If evidence_count == 0, return a structured fallback
+        if evidence_count == 0:
+            return json.dumps(await _fallback_report(request.query))
+
+        # NEW RULE: If evidence_count >= 1, ALWAYS generate report
         
-        insight_text = await gemini_client.generate_content_with_fallback(prompt)
-        
-        # Clean up potential markdown code blocks if Gemini adds them
-        if insight_text.startswith("```json"):
-            insight_text = insight_text[7:]
-        if insight_text.endswith("```"):
-            insight_text = insight_text[:-3]
-            
-        insight_text = insight_text.strip()
+        # Validated JSON reports are cached on (model, prompt, evidence)
+        insight_text = await gemini_client.generate_report(prompt, evidence_ids, admission=generation_admission.slot(client_id))
         
-        # Validate JSON
-        try:
-            parsed_json = json.loads(insight_text)
-            # Re-serialize to ensure it's valid minified JSON string
-            insight_text = json.dumps(parsed_json)
-        except json.JSONDecodeError:
-            logger.warning("Gemini output invalid JSON, attempting repair or fallback.")
-            pass
-            
-        return GenerateResponse(insight=insight_text)
+        return insight_text
         
+    except AdmissionRejected:
+        return json.dumps(await _fallback_report(request.query, busy=True))
     except Exception as e:
         logger.error(f"Gemini Generation Failed: {e}")
-        return GenerateResponse(insight=f"**Insight Generation Unavailable**\n\nWe encountered an issue connecting to the intelligence engine. However, the live data above remains accurate.\n\n*System Note: {str(e)}*")
+        return _generation_error_insight(e)
+
+async def _insight_events(request: GenerateRequest, client_id: str):
+    """Event sequence for /generate/stream: start, tokens/sections as they arrive, done"""
+    yield {"type": "start", "query": request.query, "timestamp": now_ts()}
+    try:
+        if not settings.gemini_api_key:
+            yield {"type": "done", "insight": SIMULATION_INSIGHT, "cached": False}
+            return
+
+        evidence_count, prompt, evidence_ids = await build_generate_prompt(request)
+        if evidence_count == 0:
+            report = await _fallback_report(request.query)
+            for section in report["sections"]:
+                yield {"type": "section", "section": section}
+            yield {"type": "done", "insight": json.dumps(report), "cached": False}
+            return
+
+        async for event in gemini_client.stream_report(prompt, evidence_ids, admission=generation_admission.slot(client_id)):
+            yield event
+    except AdmissionRejected:
+        report = await _fallback_report(request.query, busy=True)
+        for section in report["sections"]:
+            yield {"type": "section", "section": section}
+        yield {"type": "done", "insight": json.dumps(report), "cached": False}
+    except Exception as e:
+        logger.error(f"Streamed Gemini Generation Failed: {e}")
+        yield {"type": "error", "message": str(e)}
+        yield {"type": "done", "insight": _generation_error_insight(e), "cached": False}
+
+@router.post("/generate/stream")
+async def generate_insight_stream(request: GenerateRequest, http_request: Request, format: Optional[str] = None):
+    """
+    Stream insight generation as NDJSON (default) or Server-Sent Events
+    (?format=sse or Accept: text/event-stream). Each report section is sent
+    as soon as it parses; the final "done" event carries the same insight
+    string /generate would return.
+    """
+    use_sse = format == "sse" or (format is None and "text/event-stream" in http_request.headers.get("accept", ""))
+
+    async def body():
+        async for event in _insight_events(request, _client_id(http_request)):
+            if use_sse:
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+            else:
+                yield json.dumps(event) + "\n"
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream" if use_sse else "application/x-ndjson",
+        # Stop proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 # LLM Health Endpoints
@@ -518,137 +745,138 @@ async def list_llm_models():
 
 
 # Source endpoints
+async def _pull_source(name: str) -> int:
+    """
+    Run a source's scheduled job now, so a manual pull shares its in-flight
+    guard, timeout and metrics. Returns the number of new events.
+    """
+    job = SOURCE_JOBS[name]
+    outcome = await run_io(job.run, force=True)
+    if outcome == SKIPPED:
+        raise HTTPException(status_code=409, detail=f"{name} pull already in progress")
+    if outcome != PULLED:
+        raise HTTPException(status_code=500, detail=job.last_error)
+    return job.last_new
+
 @router.post("/sources/perplexity/pull")
 async def pull_perplexity():
     """Trigger Perplexity signal pull"""
-    try:
-        count = pull_perplexity_signals()
-        return {"status": "ok", "source": "Perplexity", "pulled": count, "timestamp": datetime.utcnow().isoformat() + "Z"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    count = await _pull_source("Perplexity")
+    return {"status": "ok", "source": "Perplexity", "pulled": count, "timestamp": datetime.utcnow().isoformat() + "Z"}
 
 @router.post("/sources/x/pull")
 async def pull_x():
     """Trigger X signal pull"""
-    try:
-        count = pull_x_signals()
-        return {"status": "ok", "source": "X", "pulled": count, "timestamp": datetime.utcnow().isoformat() + "Z"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    count = await _pull_source("X")
+    return {"status": "ok", "source": "X", "pulled": count, "timestamp": datetime.utcnow().isoformat() + "Z"}
 
 @router.post("/sources/pull_all")
 async def pull_all_sources():
     """Trigger all signal sources"""
-    try:
-        p_count = pull_perplexity_signals()
-        x_count = pull_x_signals()
-        return {
-            "status": "ok", 
-            "pulled": {
-                "Perplexity": p_count,
-                "X": x_count
-            },
-            "timestamp": datetime.utcnow().isoformat() + "Z"
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    p_count, x_count = await asyncio.gather(
+        _pull_source("Perplexity"),
+        _pull_source("X")
+    )
+    return {
+        "status": "ok", 
+        "pulled": {
+            "Perplexity": p_count,
+            "X": x_count
+        },
+        "timestamp": datetime.utcnow().isoformat() + "Z"
+    }
 
-@router.get("/recommendations")
-async def get_recommendations():
+RECOMMENDATION_TEMPLATES = [
+    {"label": "{company} Strategy", "query": "What is the latest strategy update from {company}?", "icon": "Zap", "color": "text-amber-400"},
+    {"label": "{company} Impact", "query": "Analyze recent impact of {company} announcements.", "icon": "Activity", "color": "text-red-400"},
+    {"label": "{source} Intel", "query": "Summarize latest intelligence from {source}.", "icon": "ShieldAlert", "color": "text-emerald-400"},
+    {"label": "Sector Analysis", "query": "Compare {company} vs competitors based on recent signals.", "icon": "BarChart3", "color": "text-sky-400"},
+    {"label": "Supply Chain", "query": "Any supply chain disruptions involving {company}?", "icon": "Layers", "color": "text-indigo-400"},
+    {"label": "Executive Brief", "query": "Executive summary of {company} performance today.", "icon": "FileText", "color": "text-slate-300"}
+]
+
+NO_DATA_RECOMMENDATIONS = [
+    {"label": "Market Overview", "query": "What are the top market trends right now?", "icon": "Activity", "color": "text-sky-400"},
+    {"label": "Tech News", "query": "Latest updates in technology sector?", "icon": "Cpu", "color": "text-emerald-400"},
+    {"label": "Global Events", "query": "Summary of major global events today", "icon": "Globe", "color": "text-amber-400"},
+    {"label": "Financial Impact", "query": "High impact financial news in last 24h", "icon": "TrendingUp", "color": "text-red-400"}
+]
+
+def build_recommendations(events: list[dict]) -> list[dict]:
     """
-    Generate dynamic recommended queries based on live data.
+    Four recommended queries from the companies and sources active in events.
+    The choice is seeded from those entities, so the same data always yields
+    the same recommendations (which is what lets the prefetcher warm them).
     """
     import random
     
-    try:
-        data_path = settings.resolved_data_path
-        if not data_path.exists():
-            # Fallback if no data
-            return {
-                "recommended_queries": [
-                    {"label": "Market Overview", "query": "What are the top market trends right now?", "icon": "Activity", "color": "text-sky-400"},
-                    {"label": "Tech News", "query": "Latest updates in technology sector?", "icon": "Cpu", "color": "text-emerald-400"},
-                    {"label": "Global Events", "query": "Summary of major global events today", "icon": "Globe", "color": "text-amber-400"},
-                    {"label": "Financial Impact", "query": "High impact financial news in last 24h", "icon": "TrendingUp", "color": "text-red-400"}
-                ],
-                "generated_at": datetime.utcnow().isoformat() + "Z"
-            }
-
-        # Read recent events
-        events = safe_read_jsonl(
-            data_path, 
-            limit=50,
-            freshness_hours=24
-        )
-        
-        # Extract entities
-        companies = set()
-        sources = set()
-        
-        for event in events:
-            if event.get("company"):
-                companies.add(event.get("company"))
-            if event.get("source"):
-                sources.add(event.get("source"))
-                
-        # Convert to lists for random selection
-        company_list = list(companies)
-        source_list = list(sources)
-        
-        # Templates
-        templates = [
-            {"label": "{company} Strategy", "query": "What is the latest strategy update from {company}?", "icon": "Zap", "color": "text-amber-400"},
-            {"label": "{company} Impact", "query": "Analyze recent impact of {company} announcements.", "icon": "Activity", "color": "text-red-400"},
-            {"label": "{source} Intel", "query": "Summarize latest intelligence from {source}.", "icon": "ShieldAlert", "color": "text-emerald-400"},
-            {"label": "Sector Analysis", "query": "Compare {company} vs competitors based on recent signals.", "icon": "BarChart3", "color": "text-sky-400"},
-            {"label": "Supply Chain", "query": "Any supply chain disruptions involving {company}?", "icon": "Layers", "color": "text-indigo-400"},
-            {"label": "Executive Brief", "query": "Executive summary of {company} performance today.", "icon": "FileText", "color": "text-slate-300"}
-        ]
-        
-        recommendations = []
-        used_companies = set()
+    # Extract entities
+    company_list = sorted({event["company"] for event in events if event.get("company")})
+    source_list = sorted({event["source"] for event in events if event.get("source")})
+    rng = random.Random("|".join(company_list) + "#" + "|".join(source_list))
+    
+    # Generate candidates
+    candidates = []
+    for _ in range(20): # Generate plenty of candidates
+        template = rng.choice(RECOMMENDATION_TEMPLATES)
         
-        # Generate candidates
-        candidates = []
-        for _ in range(20): # Generate plenty of candidates
-            template = random.choice(templates)
+        if "{company}" in template["query"] and company_list:
+            company = rng.choice(company_list)
+            query = template["query"].format(company=company)
+            label = template["label"].format(company=company)
+            candidates.append({**template, "query": query, "label": label, "key_entity": company})
+        elif "{source}" in template["query"] and source_list:
+            source = rng.choice(source_list)
+            query = template["query"].format(source=source)
+            label = template["label"].format(source=source)
+            candidates.append({**template, "query": query, "label": label, "key_entity": source})
             
-            if "{company}" in template["query"] and company_list:
-                company = random.choice(company_list)
-                query = template["query"].format(company=company)
-                label = template["label"].format(company=company)
-                candidates.append({**template, "query": query, "label": label, "key_entity": company})
-            elif "{source}" in template["query"] and source_list:
-                source = random.choice(source_list)
-                query = template["query"].format(source=source)
-                label = template["label"].format(source=source)
-                candidates.append({**template, "query": query, "label": label, "key_entity": source})
-                
-        # Select 4 unique ones
-        final_selection = []
-        for cand in candidates:
-            if len(final_selection) >= 4:
-                break
-            
-            # Avoid duplicate entities if possible
-            if cand.get("key_entity") in used_companies:
-                continue
-                
-            final_selection.append(cand)
-            used_companies.add(cand.get("key_entity"))
+    # Select 4 unique ones
+    final_selection = []
+    used_companies = set()
+    for cand in candidates:
+        if len(final_selection) >= 4:
+            break
+        
+        # Avoid duplicate entities if possible
+        if cand.get("key_entity") in used_companies:
+            continue
             
-        # Fill if not enough unique
-        if len(final_selection) < 4:
-            remaining = 4 - len(final_selection)
-            # Just take any random ones to fill
-            for _ in range(remaining):
-                 # Simple fallback templates
-                 final_selection.append(
-                     {"label": "High Impact", "query": "Top 3 high-impact events in last 2 hours?", "icon": "AlertCircle", "color": "text-red-400"}
-                 )
+        final_selection.append(cand)
+        used_companies.add(cand.get("key_entity"))
+        
+    # Fill if not enough unique
+    while len(final_selection) < 4:
+        # Simple fallback template
+        final_selection.append(
+            {"label": "High Impact", "query": "Top 3 high-impact events in last 2 hours?", "icon": "AlertCircle", "color": "text-red-400"}
+        )
+    return final_selection
 
+async def recommended_queries() -> list[dict]:
+    """Current recommendations for the live stream (also used by the prefetcher)"""
+    data_path = settings.resolved_data_path
+    if not await run_io(lambda: resolve_stream_log(data_path).has_data()):
+        # Fallback if no data
+        return NO_DATA_RECOMMENDATIONS
+    
+    # Read recent events
+    events = await run_io(
+        event_cache.get_events,
+        data_path, 
+        limit=50,
+        freshness_hours=24
+    )
+    return build_recommendations(events)
+
+@router.get("/recommendations")
+async def get_recommendations():
+    """
+    Generate dynamic recommended queries based on live data.
+    """
+    try:
         return {
-            "recommended_queries": final_selection,
+            "recommended_queries": await recommended_queries(),
             "generated_at": datetime.utcnow().isoformat() + "Z"
         }
 
@@ -751,44 +979,43 @@ async def verify_sources(query: str):
     Re-runs a quick retrieval to identify sources and assign trust levels.
     """
     try:
-        # 1. Read fresh events
         data_path = settings.resolved_data_path
-        events = safe_read_jsonl(data_path, limit=settings.max_events_to_scan, freshness_hours=settings.freshness_hours)
-        
-        # 2. Filter relevant events (same logic as query)
-        from app.company_dict import COMPANY_DICT
-        
-        raw_keywords = [kw.lower() for kw in query.split() if len(kw) > 2]
-        query_keywords = set(raw_keywords)
+        # Identical concurrent requests share one computation per stream generation
+        generation = await run_io(stream_generation, data_path)
+        flight_key = ("verify", " ".join(query.lower().split()), generation)
+        return await request_flights.do(flight_key, lambda: run_io(_compute_verified_sources, query, data_path))
+    except Exception as e:
+        logger.error(f"Source verification failed: {e}")
+        return SourceVerifyResponse(query=query, sources=[])
+
+def _compute_verified_sources(query: str, data_path: Path) -> SourceVerifyResponse:
+    """Retrieve matching events and assign trust levels to their sources"""
+    try:
+        # 1. Expand keywords (same logic as query)
+        from app.keyword_matcher import expand_query_keywords
+        query_keywords = expand_query_keywords(query)
         
-        for company, data in COMPANY_DICT.items():
-            aliases = [a.lower() for a in data.get("aliases", [])]
-            aliases.append(company.lower())
-            if any(kw in aliases for kw in raw_keywords):
-                query_keywords.update(aliases)
+        # 2. Retrieve matching fresh events from the inverted index
+        events = event_cache.search(data_path, query_keywords, freshness_hours=settings.freshness_hours)
         
         verified_sources = []
         seen_titles = set()
         
         for event in events:
-            title = event.get("title", "").lower()
-            content = event.get("content", "").lower()
-            
-            if any(kw in title or kw in content for kw in query_keywords):
-                if event.get("title") not in seen_titles:
-                    seen_titles.add(event.get("title"))
-                    
-                    source_name = event.get("source", "Unknown")
-                    trust_info = get_trust_info(source_name)
-                    
-                    verified_sources.append(SourceVerifyItem(
-                        timestamp=event.get("timestamp"),
-                        source=source_name,
-                        title=event.get("title", "Untitled"),
-                        url=event.get("url"),
-                        trust_level=trust_info["trust_level"],
-                        reason=trust_info["reason"]
-                    ))
+            if event.get("title") not in seen_titles:
+                seen_titles.add(event.get("title"))
+                
+                source_name = event.get("source", "Unknown")
+                trust_info = get_trust_info(source_name)
+                
+                verified_sources.append(SourceVerifyItem(
+                    timestamp=event.get("timestamp"),
+                    source=source_name,
+                    title=event.get("title", "Untitled"),
+                    url=event.get("url"),
+                    trust_level=trust_info["trust_level"],
+                    reason=trust_info["reason"]
+                ))
             
             if len(verified_sources) >= 10:
                 break
@@ -801,3 +1028,16 @@ async def verify_sources(query: str):
     except Exception as e:
         logger.error(f"Source verification failed: {e}")
         return SourceVerifyResponse(query=query, sources=[])
+
+
+# Metrics endpoint
+@router.get("/metrics")
+async def get_metrics():
+    """
+    Snapshot of internal component stats: I/O pool queue depth, caches,
+    single-flight coalescing and SQLite pool usage.
+    """
+    return {
+        "components": metrics.collect(),
+        "timestamp": datetime.utcnow().isoformat() + "Z"
+    }
@@ -1,41 +1,179 @@
 import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.executors.pool import ThreadPoolExecutor as JobThreadPool
+from app.settings import settings
+from app.segments import get_stream_log
 from app.sources.perplexity_source import pull_perplexity_signals
 from app.sources.x_source import pull_x_signals
+from app.metrics import PullStats
+from app.utils import timestamp_to_epoch
+from app import metrics
 
 logger = logging.getLogger(__name__)
 
-scheduler = BackgroundScheduler()
+# SourceJob.run outcomes
+PULLED = "pulled"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+# One scheduler thread per source job plus one for maintenance
+scheduler = BackgroundScheduler(executors={
+    "default": JobThreadPool(settings.source_pull_workers + 1)
+})
+
+# Pulls run here so a job can stop waiting on a hung pull after its timeout
+_pull_pool = ThreadPoolExecutor(max_workers=settings.source_pull_workers, thread_name_prefix="source-pull")
+
+
+class SourceJob:
+    """A pull function with its own interval, timeout, backoff state and metrics"""
+
+    def __init__(self, name: str, pull: Callable[..., int], interval_seconds: int):
+        self.name = name
+        self.pull = pull
+        self.interval_seconds = interval_seconds
+        self._lock = threading.Lock()
+        self._in_flight = None
+        self.consecutive_failures = 0
+        self.next_attempt = 0.0
+        # Metrics
+        self.runs = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.last_duration_ms: Optional[float] = None
+        self.last_fetched = 0
+        self.last_new = 0
+        self.last_success_at: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self.newest_event_epoch: Optional[float] = None
+
+    def backoff_seconds(self) -> float:
+        """Exponential backoff with jitter (half to full step), capped at source_backoff_max_seconds"""
+        ceiling = min(
+            settings.source_backoff_max_seconds,
+            settings.source_backoff_base_seconds * 2 ** (self.consecutive_failures - 1)
+        )
+        return random.uniform(ceiling / 2, ceiling)
+
+    def run(self, force: bool = False) -> str:
+        """
+        Pull once unless backing off or still running; returns PULLED,
+        SKIPPED or FAILED. force (a manual trigger) ignores the backoff but
+        never starts a second pull while one is in flight.
+        """
+        now = time.time()
+        with self._lock:
+            if now < self.next_attempt and not force:
+                return SKIPPED
+            if self._in_flight is not None and not self._in_flight.done():
+                # A previous pull timed out but is still running; don't pile up
+                logger.warning(f"{self.name} pull still in flight, skipping this run")
+                return SKIPPED
+            stats = PullStats(source=self.name)
+            self._in_flight = _pull_pool.submit(self.pull, stats=stats)
+            future = self._in_flight
+
+        start = time.monotonic()
+        self.runs += 1
+        try:
+            future.result(timeout=settings.source_pull_timeout_seconds)
+        except FutureTimeoutError:
+            self.timeouts += 1
+            self._record_failure(f"timed out after {settings.source_pull_timeout_seconds}s")
+            return FAILED
+        except Exception as e:
+            self._record_failure(str(e))
+            return FAILED
+        finally:
+            self.last_duration_ms = round((time.monotonic() - start) * 1000, 1)
+
+        self.consecutive_failures = 0
+        self.next_attempt = 0.0
+        self.last_error = None
+        self.last_fetched = stats.fetched
+        self.last_new = stats.new
+        self.last_success_at = datetime.utcnow().isoformat() + "Z"
+        if stats.newest_event_ts:
+            epoch = timestamp_to_epoch(stats.newest_event_ts)
+            self.newest_event_epoch = max(epoch, self.newest_event_epoch or epoch)
+        logger.info(f"Pulled {stats.fetched} events from {self.name} ({stats.new} new) in {self.last_duration_ms}ms")
+        return PULLED
+
+    def _record_failure(self, error: str) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = error
+        delay = self.backoff_seconds()
+        self.next_attempt = time.time() + delay
+        logger.error(f"{self.name} pull failed ({error}); backing off {delay:.0f}s")
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval_seconds,
+            "runs": self.runs,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "consecutive_failures": self.consecutive_failures,
+            "backing_off_seconds": max(0.0, round(self.next_attempt - time.time(), 1)),
+            "last_duration_ms": self.last_duration_ms,
+            "last_fetched": self.last_fetched,
+            "last_new": self.last_new,
+            "last_success_at": self.last_success_at,
+            "last_error": self.last_error,
+            # Age of the newest event ingested from this source
+            "lag_seconds": round(time.time() - self.newest_event_epoch, 1) if self.newest_event_epoch else None,
+        }
+
+
+SOURCE_JOBS: Dict[str, SourceJob] = {
+    "Perplexity": SourceJob("Perplexity", pull_perplexity_signals, settings.perplexity_pull_interval_seconds),
+    "X": SourceJob("X", pull_x_signals, settings.x_pull_interval_seconds),
+}
+
+metrics.register("sources", lambda: {name: job.stats() for name, job in SOURCE_JOBS.items()})
 
-def pull_all_sources():
-    """Pull data from all sources"""
+def maintain_streams():
+    """
+    Apply segment retention and compaction to the raw stream.
+    The Pathway output log is maintained by the pipeline that writes it.
+    """
     try:
-        logger.info("Starting scheduled data pull...")
-        
-        perplexity_count = pull_perplexity_signals()
-        logger.info(f"Pulled {perplexity_count} events from Perplexity")
-        
-        x_count = pull_x_signals()
-        logger.info(f"Pulled {x_count} events from X")
-        
-        total = perplexity_count + x_count
-        logger.info(f"Total: {total} new events added to stream")
-        
+        result = get_stream_log(settings.resolved_data_path).maintain()
+        if result["dropped"] or result["compacted"]:
+            logger.info(f"Stream maintenance: {result}")
     except Exception as e:
-        logger.error(f"Error during scheduled pull: {e}", exc_info=True)
+        logger.error(f"Error during stream maintenance: {e}", exc_info=True)
 
 def start_scheduler():
     """Start the background scheduler"""
-    # Pull immediately on startup
-    pull_all_sources()
-    
-    # Schedule pulls every 5 minutes
-    scheduler.add_job(pull_all_sources, 'interval', minutes=5, id='pull_sources')
+    # One job per source on its own interval; the first run fires right away
+    # on the scheduler's pool, so startup doesn't wait for the initial pull
+    for name, job in SOURCE_JOBS.items():
+        scheduler.add_job(
+            job.run, 'interval',
+            seconds=job.interval_seconds,
+            id=f'pull_{name.lower()}',
+            next_run_time=datetime.now(),
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+    scheduler.add_job(maintain_streams, 'interval', minutes=settings.stream_maintenance_minutes, id='maintain_streams', replace_existing=True)
     scheduler.start()
-    logger.info("Background scheduler started - pulling data every 5 minutes")
+    intervals = ", ".join(f"{name} every {job.interval_seconds}s" for name, job in SOURCE_JOBS.items())
+    logger.info(f"Background scheduler started - pulling {intervals}")
 
 def stop_scheduler():
     """Stop the background scheduler"""
     if scheduler.running:
         scheduler.shutdown()
         logger.info("Background scheduler stopped")
+    # A hung pull keeps its thread; don't wait for it or start queued ones
+    _pull_pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,133 @@
+"""
+Incremental inverted index over cached stream events.
+Maps tokens of each event's title/content/company to posting lists of event
+ordinals, so keyword retrieval is a union/intersection of posting lists
+instead of a scan over every event. Also keeps the field-weighted term
+statistics BM25 ranking needs (see app/ranking.py), updated per event.
+"""
+import bisect
+import re
+from collections import Counter, deque
+from typing import Deque, Dict, Iterable, List, Optional, Set
+
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+# Event fields searched by /query (same fields the substring scan used)
+INDEXED_FIELDS = ("title", "content", "company")
+
+# Term frequency weight per field; a title mention counts for more
+DEFAULT_FIELD_WEIGHTS = {"title": 2.0, "content": 1.0, "company": 1.0}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens of a text"""
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+class InvertedIndex:
+    """
+    Token -> posting list of event ordinals.
+
+    Ordinals are assigned in append order and events are only ever evicted
+    oldest-first, so every posting list stays sorted and an evicted ordinal
+    is always at the head of its lists.
+
+    doc_tokens holds each event's field-weighted term frequencies; together
+    with the posting list lengths (document frequencies) and the running
+    total_length they are the corpus statistics for BM25.
+    """
+
+    def __init__(self, field_weights: Optional[Dict[str, float]] = None):
+        self.field_weights = field_weights or DEFAULT_FIELD_WEIGHTS
+        self.postings: Dict[str, Deque[int]] = {}
+        # Sorted vocabulary for prefix lookups ("chip" also matches "chips")
+        self.vocabulary: List[str] = []
+        self.doc_tokens: Dict[int, Counter] = {}
+        self.doc_lengths: Dict[int, float] = {}
+        self.total_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self.doc_tokens)
+
+    @property
+    def avg_length(self) -> float:
+        return self.total_length / len(self.doc_tokens) if self.doc_tokens else 0.0
+
+    def clear(self) -> None:
+        self.postings.clear()
+        self.vocabulary.clear()
+        self.doc_tokens.clear()
+        self.doc_lengths.clear()
+        self.total_length = 0.0
+
+    def add(self, ordinal: int, event: dict) -> None:
+        """Index an event under its ordinal"""
+        counts = Counter()
+        for field in INDEXED_FIELDS:
+            value = event.get(field)
+            if isinstance(value, str):
+                weight = self.field_weights.get(field, 1.0)
+                for token in tokenize(value):
+                    counts[token] += weight
+        self.doc_tokens[ordinal] = counts
+        length = sum(counts.values())
+        self.doc_lengths[ordinal] = length
+        self.total_length += length
+        for token in counts:
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = deque()
+                self.postings[token] = posting
+                bisect.insort(self.vocabulary, token)
+            posting.append(ordinal)
+
+    def remove(self, ordinal: int) -> None:
+        """Drop an event (expected to be the oldest one indexed)"""
+        counts = self.doc_tokens.pop(ordinal, None)
+        if counts is None:
+            return
+        self.total_length -= self.doc_lengths.pop(ordinal)
+        for token in counts:
+            posting = self.postings[token]
+            if posting and posting[0] == ordinal:
+                posting.popleft()
+            else:
+                posting.remove(ordinal)
+            if not posting:
+                del self.postings[token]
+                idx = bisect.bisect_left(self.vocabulary, token)
+                del self.vocabulary[idx]
+
+    def prefix_tokens(self, prefix: str) -> List[str]:
+        """Vocabulary tokens starting with prefix"""
+        idx = bisect.bisect_left(self.vocabulary, prefix)
+        end = bisect.bisect_left(self.vocabulary, prefix + "\U0010ffff", idx)
+        return self.vocabulary[idx:end]
+
+    def _prefix_postings(self, prefix: str) -> Set[int]:
+        """Union of postings for every token starting with prefix"""
+        result: Set[int] = set()
+        for token in self.prefix_tokens(prefix):
+            result.update(self.postings[token])
+        return result
+
+    def match(self, keyword: str) -> Set[int]:
+        """Ordinals matching every token of a (possibly multi-word) keyword"""
+        tokens = tokenize(keyword)
+        if not tokens:
+            return set()
+        # Start from the rarest token to keep intersections small
+        sets = sorted((self._prefix_postings(token) for token in tokens), key=len)
+        result = sets[0]
+        for other in sets[1:]:
+            if not result:
+                break
+            result = result & other
+        return result
+
+    def search(self, keywords: Iterable[str]) -> Set[int]:
+        """Ordinals matching any of the keywords"""
+        result: Set[int] = set()
+        for keyword in keywords:
+            result |= self.match(keyword)
+        return result
@@ -0,0 +1,540 @@
+"""
+Segmented, rotating JSONL storage for the event streams.
+
+A logical stream path such as data/stream.jsonl is stored as a directory of
+segment files (data/stream.segments/) plus a manifest recording each
+segment's size and event-time bounds. Appends go to the active segment,
+which rolls over hourly or when it reaches a size limit. Retention drops
+whole segments once every event in them is older than the retention window,
+and compaction merges runs of small closed segments.
+
+Every segment has a sidecar "<segment>.idx" of fixed-size records sampled
+every N lines, mapping (max event time so far -> byte offset). A time
+window resolves by binary search to the byte offset where reading starts.
+
+If the logical path itself exists as a plain file (the pre-segmentation
+stream, or Pathway's single-file output) it is exposed read-only as the
+oldest "legacy" segment with unknown time bounds.
+
+Each log has a single writer process (the API for the raw stream, the
+pipeline for its output); that process is also the one that runs retention
+and compaction. Readers in other processes pick up manifest changes.
+"""
+import json
+import logging
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.settings import settings
+from app.utils import iter_lines_reverse, timestamp_to_epoch
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+LEGACY_SEGMENT = "legacy"
+
+# Sidecar index record: (max event epoch of all lines before offset, byte offset)
+INDEX_RECORD = struct.Struct("<dq")
+
+
+@dataclass
+class Segment:
+    """Manifest entry for one segment file"""
+    name: str
+    seq: int
+    bucket: str
+    created: float
+    min_ts: Optional[float] = None
+    max_ts: Optional[float] = None
+    size: int = 0
+    lines: int = 0
+    closed: bool = False
+    path: Path = field(default=None, repr=False, compare=False)
+
+    @property
+    def index_path(self) -> Path:
+        return self.path.with_name(self.path.name + ".idx")
+
+    def overlaps(self, since: Optional[float] = None, until: Optional[float] = None) -> bool:
+        """Check whether the segment may hold events in [since, until]"""
+        if self.min_ts is None or self.max_ts is None:
+            # Unknown bounds (legacy file): always a candidate
+            return True
+        if since is not None and self.max_ts < since:
+            return False
+        if until is not None and self.min_ts > until:
+            return False
+        return True
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data.pop("path")
+        return data
+
+
+class SegmentedLog:
+    """Append-only segmented JSONL log with a manifest, retention and compaction"""
+
+    def __init__(self, base_path: Path):
+        self.base_path = Path(base_path)
+        self.directory = self.base_path.with_suffix(".segments")
+        self.manifest_path = self.directory / MANIFEST_NAME
+        self._segments: List[Segment] = []
+        self._next_seq = 1
+        self._manifest_stamp: Optional[Tuple[int, int]] = None
+        # Bumped whenever this process writes or observes a manifest change
+        self.generation = 0
+        self._lock = threading.RLock()
+
+    # ---- manifest -------------------------------------------------------
+
+    def _load_manifest(self) -> None:
+        """(Re)load the manifest if another process or call changed it"""
+        try:
+            st = self.manifest_path.stat()
+        except FileNotFoundError:
+            if self._manifest_stamp is not None:
+                self.generation += 1
+            self._segments = []
+            self._manifest_stamp = None
+            return
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self._manifest_stamp:
+            return
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Failed to read segment manifest {self.manifest_path}: {e}")
+            return
+        self._segments = [Segment(**entry) for entry in data.get("segments", [])]
+        for segment in self._segments:
+            segment.path = self.directory / segment.name
+        self._next_seq = data.get("next_seq", len(self._segments) + 1)
+        self._manifest_stamp = stamp
+        self.generation += 1
+
+    def _save_manifest(self) -> None:
+        """Atomically persist the manifest"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "next_seq": self._next_seq,
+                "segments": [segment.to_dict() for segment in self._segments]
+            }, f)
+        os.replace(tmp_path, self.manifest_path)
+        st = self.manifest_path.stat()
+        self._manifest_stamp = (st.st_mtime_ns, st.st_size)
+        self.generation += 1
+
+    def _legacy_segment(self) -> Optional[Segment]:
+        if not self.base_path.is_file():
+            return None
+        size = self.base_path.stat().st_size
+        if size == 0:
+            return None
+        return Segment(name=LEGACY_SEGMENT, seq=0, bucket="", created=0, size=size, closed=True, path=self.base_path)
+
+    # ---- reading --------------------------------------------------------
+
+    def segments(self, since: Optional[float] = None, until: Optional[float] = None) -> List[Segment]:
+        """Segments (oldest first) that may contain events in [since, until]"""
+        with self._lock:
+            self._load_manifest()
+            candidates = list(self._segments)
+        legacy = self._legacy_segment()
+        if legacy is not None:
+            candidates.insert(0, legacy)
+        return [segment for segment in candidates if segment.overlaps(since, until)]
+
+    def current_generation(self) -> int:
+        """Monotonic counter that changes on every append or rewrite of the log"""
+        with self._lock:
+            self._load_manifest()
+            return self.generation
+
+    def has_data(self) -> bool:
+        """Check whether any segment holds bytes"""
+        return any(segment.size > 0 for segment in self.segments())
+
+    def start_offset(self, segment: Segment, since: Optional[float]) -> int:
+        """
+        Byte offset in a segment before which every event is older than since,
+        found by binary search over the sidecar index. Only log2(records)
+        index records are read.
+        """
+        if since is None or segment.name == LEGACY_SEGMENT:
+            return 0
+        if segment.max_ts is not None and segment.closed and not segment.index_path.exists():
+            # Segments written before indexing existed get one on first use
+            build_index(segment.path)
+        try:
+            with open(segment.index_path, "rb") as f:
+                count = os.fstat(f.fileno()).st_size // INDEX_RECORD.size
+                lo, hi = 0, count
+                offset = 0
+                # Find the last record whose running max is still < since
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    f.seek(mid * INDEX_RECORD.size)
+                    max_before, record_offset = INDEX_RECORD.unpack(f.read(INDEX_RECORD.size))
+                    if max_before < since:
+                        offset = record_offset
+                        lo = mid + 1
+                    else:
+                        hi = mid
+                return offset
+        except FileNotFoundError:
+            return 0
+
+    def iter_lines_reverse(self, since: Optional[float] = None, until: Optional[float] = None):
+        """
+        Yield raw lines newest-first across the segments overlapping the
+        window, skipping the part of each segment the index rules out.
+        """
+        for segment in reversed(self.segments(since, until)):
+            if segment.path.exists():
+                start = self.start_offset(segment, since)
+                yield from iter_lines_reverse(segment.path, start=start)
+
+    # ---- writing --------------------------------------------------------
+
+    def _active_segment(self, now: float, incoming: int) -> Segment:
+        """Return the segment to append to, rolling over by hour or size"""
+        bucket = _bucket_for(now, settings.stream_segment_hours)
+        active = self._segments[-1] if self._segments else None
+        if (
+            active is None
+            or active.closed
+            or active.bucket != bucket
+            or (active.size > 0 and active.size + incoming > settings.stream_segment_max_bytes)
+        ):
+            if active is not None:
+                active.closed = True
+            seq = self._next_seq
+            self._next_seq += 1
+            active = Segment(name=f"{seq:08d}-{bucket}.jsonl", seq=seq, bucket=bucket, created=now)
+            active.path = self.directory / active.name
+            self._segments.append(active)
+        return active
+
+    def append(self, events: List[dict], fsync: bool = False) -> int:
+        """
+        Append events as JSON lines to the active segment; returns bytes written.
+        With fsync, the data is flushed to disk before the manifest records it.
+        """
+        if not events:
+            return 0
+        lines = [(json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8") for event in events]
+        payload = b"".join(lines)
+        epochs = [timestamp_to_epoch(event.get("timestamp")) for event in events]
+
+        with self._lock:
+            self._load_manifest()
+            segment = self._active_segment(time.time(), len(payload))
+            records = _index_records(lines, epochs, segment.lines, segment.size, segment.max_ts)
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(segment.path, "ab") as f:
+                f.write(payload)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            # Index after data so a record never points past the end of the segment
+            if records:
+                with open(segment.index_path, "ab") as f:
+                    f.write(records)
+            segment.size += len(payload)
+            segment.lines += len(lines)
+            segment.min_ts = min(epochs + ([segment.min_ts] if segment.min_ts is not None else []))
+            segment.max_ts = max(epochs + ([segment.max_ts] if segment.max_ts is not None else []))
+            self._save_manifest()
+        return len(payload)
+
+    def reset(self) -> None:
+        """Remove all segments (used by pipelines rebuilding their output)"""
+        with self._lock:
+            self._load_manifest()
+            for segment in self._segments:
+                _remove_segment_files(segment.path)
+            self._segments = []
+            self._save_manifest()
+
+    # ---- maintenance ----------------------------------------------------
+
+    def enforce_retention(self, retention_hours: Optional[int] = None) -> int:
+        """Drop closed segments whose newest event is older than the retention window"""
+        retention_hours = retention_hours or settings.stream_retention_hours
+        cutoff = time.time() - retention_hours * 3600
+        with self._lock:
+            self._load_manifest()
+            now = time.time()
+            # Close the active segment once its bucket has passed so it can age out
+            if self._segments and not self._segments[-1].closed:
+                if self._segments[-1].bucket != _bucket_for(now, settings.stream_segment_hours):
+                    self._segments[-1].closed = True
+            expired = [
+                segment for segment in self._segments
+                if segment.closed and segment.max_ts is not None and segment.max_ts < cutoff
+            ]
+            if not expired:
+                return 0
+            self._segments = [segment for segment in self._segments if segment not in expired]
+            self._save_manifest()
+        for segment in expired:
+            _remove_segment_files(segment.path)
+        logger.info(f"Retention dropped {len(expired)} segments from {self.directory}")
+        return len(expired)
+
+    def compact(self) -> int:
+        """Merge runs of adjacent small closed segments; returns segments removed"""
+        min_bytes = settings.stream_compact_min_bytes
+        max_bytes = settings.stream_segment_max_bytes
+        with self._lock:
+            self._load_manifest()
+            runs: List[List[Segment]] = []
+            current: List[Segment] = []
+            for segment in self._segments:
+                fits = sum(s.size for s in current) + segment.size <= max_bytes
+                if segment.closed and segment.size < min_bytes and fits:
+                    current.append(segment)
+                    continue
+                if len(current) > 1:
+                    runs.append(current)
+                current = [segment] if segment.closed and segment.size < min_bytes else []
+            if len(current) > 1:
+                runs.append(current)
+            if not runs:
+                return 0
+
+            removed = []
+            for run in runs:
+                head = run[0]
+                merged_path = self.directory / f"{head.seq:08d}-{head.bucket}-c.jsonl"
+                tmp_path = merged_path.with_suffix(".tmp")
+                with open(tmp_path, "wb") as out:
+                    for segment in run:
+                        with open(segment.path, "rb") as f:
+                            out.write(f.read())
+                os.replace(tmp_path, merged_path)
+                build_index(merged_path)
+                merged = Segment(
+                    name=merged_path.name, seq=head.seq, bucket=head.bucket, created=head.created,
+                    min_ts=min(s.min_ts for s in run if s.min_ts is not None) if any(s.min_ts is not None for s in run) else None,
+                    max_ts=max(s.max_ts for s in run if s.max_ts is not None) if any(s.max_ts is not None for s in run) else None,
+                    size=sum(s.size for s in run), lines=sum(s.lines for s in run), closed=True
+                )
+                merged.path = merged_path
+                index = self._segments.index(head)
+                self._segments[index:index + len(run)] = [merged]
+                removed.extend(s for s in run if s.path != merged_path)
+            self._save_manifest()
+        for segment in removed:
+            _remove_segment_files(segment.path)
+        logger.info(f"Compacted {len(removed)} segments in {self.directory}")
+        return len(removed)
+
+    def _sweep_orphans(self) -> None:
+        """Delete segment files no longer referenced by the manifest"""
+        if not self.directory.exists():
+            return
+        with self._lock:
+            self._load_manifest()
+            referenced = {segment.name for segment in self._segments}
+        for path in self.directory.glob("*.jsonl"):
+            if path.name not in referenced:
+                _remove_segment_files(path)
+        for path in self.directory.glob("*.jsonl.idx"):
+            if path.name[:-len(".idx")] not in referenced:
+                _remove_file(path)
+
+    def maintain(self) -> dict:
+        """Run retention then compaction, and clean up leftover files"""
+        result = {"dropped": self.enforce_retention(), "compacted": self.compact()}
+        self._sweep_orphans()
+        return result
+
+
+class LogFollower:
+    """
+    Tracks per-segment read offsets on a SegmentedLog so callers only parse
+    bytes appended since their last poll.
+    """
+
+    def __init__(self, log: SegmentedLog, window_hours: Optional[int] = None):
+        self.log = log
+        self.window_hours = window_hours
+        # segment name -> (file identity, parsed offset), oldest first
+        self.positions: "OrderedDict[str, Tuple[Tuple[int, int], int]]" = OrderedDict()
+
+    def _current(self) -> List[Segment]:
+        since = time.time() - self.window_hours * 3600 if self.window_hours else None
+        return [segment for segment in self.log.segments(since=since) if segment.path.exists()]
+
+    def seek_tail(self, max_lines: int) -> List[bytes]:
+        """Position at the end of the log and return up to max_lines newest lines, oldest first"""
+        self.positions.clear()
+        segments = self._current()
+        newest_first: List[bytes] = []
+        for segment in segments:
+            st = segment.path.stat()
+            with open(segment.path, "rb") as f:
+                end = complete_lines_end(f, st.st_size)
+            self.positions[segment.name] = ((st.st_dev, st.st_ino), end)
+        for segment in reversed(segments):
+            if len(newest_first) >= max_lines:
+                break
+            end = self.positions[segment.name][1]
+            for raw_line in iter_lines_reverse(segment.path, end=end):
+                if raw_line.strip():
+                    newest_first.append(raw_line)
+                    if len(newest_first) >= max_lines:
+                        break
+        newest_first.reverse()
+        return newest_first
+
+    def poll(self) -> Optional[List[bytes]]:
+        """
+        Return complete lines appended since the last poll (oldest first).
+        Returns None when segments were rewritten, truncated or reordered
+        in a way that isn't a pure append; the caller should seek_tail().
+        Segments that aged out of the front are simply forgotten.
+        """
+        segments = self._current()
+        names = [segment.name for segment in segments]
+        tracked = list(self.positions)
+        common = [name for name in names if name in self.positions]
+        if common != tracked[len(tracked) - len(common):] or common != names[:len(common)]:
+            return None
+        for name in tracked[:len(tracked) - len(common)]:
+            del self.positions[name]
+
+        lines: List[bytes] = []
+        for segment in segments:
+            st = segment.path.stat()
+            file_id = (st.st_dev, st.st_ino)
+            known_id, offset = self.positions.get(segment.name, (file_id, 0))
+            if known_id != file_id or st.st_size < offset:
+                return None
+            if st.st_size > offset:
+                with open(segment.path, "rb") as f:
+                    f.seek(offset)
+                    data = f.read(st.st_size - offset)
+                # Leave a trailing partial line for the next poll
+                consumed = data.rfind(b"\n") + 1
+                lines.extend(line for line in data[:consumed].split(b"\n") if line.strip())
+                offset += consumed
+            self.positions[segment.name] = (file_id, offset)
+        return lines
+
+
+def complete_lines_end(f, size: int) -> int:
+    """Return the offset just past the last newline at or before size"""
+    position = size
+    while position > 0:
+        read_size = min(4096, position)
+        f.seek(position - read_size)
+        idx = f.read(read_size).rfind(b"\n")
+        if idx != -1:
+            return position - read_size + idx + 1
+        position -= read_size
+    return 0
+
+
+def _index_records(lines: List[bytes], epochs: List[float], line_no: int, offset: int, running_max: Optional[float]) -> bytes:
+    """
+    Build sidecar index records for lines about to be appended at offset.
+    A record is sampled every stream_index_every lines and stores the running
+    max event time of everything before it, which is monotonic even when
+    event timestamps arrive out of order.
+    """
+    every = settings.stream_index_every
+    records = []
+    for line, epoch in zip(lines, epochs):
+        if line_no and line_no % every == 0 and running_max is not None:
+            records.append(INDEX_RECORD.pack(running_max, offset))
+        offset += len(line)
+        line_no += 1
+        running_max = epoch if running_max is None else max(running_max, epoch)
+    return b"".join(records)
+
+
+def build_index(path: Path) -> None:
+    """(Re)build the sidecar index of a segment file by scanning it"""
+    lines, epochs = [], []
+    with open(path, "rb") as f:
+        for raw_line in f:
+            if not raw_line.endswith(b"\n"):
+                break
+            try:
+                event = json.loads(raw_line)
+                ts = event.get("timestamp") if isinstance(event, dict) else None
+            except json.JSONDecodeError:
+                ts = None
+            lines.append(raw_line)
+            epochs.append(timestamp_to_epoch(ts))
+    tmp_path = path.with_name(path.name + ".idx.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(_index_records(lines, epochs, 0, 0, None))
+    os.replace(tmp_path, path.with_name(path.name + ".idx"))
+
+
+def _bucket_for(epoch: float, segment_hours: int) -> str:
+    """Label of the time bucket (start hour, UTC) an append at epoch falls into"""
+    start = int(epoch // (segment_hours * 3600)) * segment_hours * 3600
+    return datetime.utcfromtimestamp(start).strftime("%Y%m%d%H")
+
+
+def _remove_segment_files(path: Path) -> None:
+    """Remove a segment file and its sidecar index"""
+    _remove_file(path)
+    _remove_file(path.with_name(path.name + ".idx"))
+
+
+def _remove_file(path: Path) -> None:
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        # e.g. still open by a reader on Windows; the next maintenance run retries
+        logger.warning(f"Could not remove segment {path}: {e}")
+
+
+_logs: Dict[Path, SegmentedLog] = {}
+_logs_lock = threading.Lock()
+
+def get_stream_log(base_path: Path) -> SegmentedLog:
+    """Get the shared SegmentedLog instance for a logical stream path"""
+    key = Path(base_path).resolve()
+    with _logs_lock:
+        log = _logs.get(key)
+        if log is None:
+            log = SegmentedLog(key)
+            _logs[key] = log
+        return log
+
+
+def resolve_stream_log(path: Path) -> SegmentedLog:
+    """
+    PATHWAY INTEGRATION: Return the Pathway output log instead of the raw
+    stream when Pathway is enabled and has produced output.
+    """
+    if settings.use_pathway:
+        pathway_log = get_stream_log(settings.resolved_pathway_path)
+        if pathway_log.has_data():
+            return pathway_log
+    return get_stream_log(path)
+
+
+def stream_generation(path: Path) -> Tuple[str, int]:
+    """(log identity, generation) of the log reads of path are served from"""
+    log = resolve_stream_log(path)
+    return str(log.base_path), log.current_generation()
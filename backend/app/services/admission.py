@@ -0,0 +1,172 @@
+"""
+Admission control for Gemini report generation.
+At most max_concurrent generations run at once, and at most max_per_client
+of them for any one client. Requests beyond that wait in a bounded FIFO
+queue; a request that finds the queue full, or waits longer than
+max_wait_seconds, is rejected so the caller can answer at once with the
+fallback report instead of piling more load onto Gemini (where a burst
+turns into a cascade of 429s through the model fallback chain).
+Cache hits and the zero-evidence fallback never take a slot.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from app.settings import settings
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+QUEUE_FULL = "queue_full"
+QUEUE_TIMEOUT = "queue_timeout"
+
+
+class AdmissionRejected(Exception):
+    """Raised when a generation is shed; reason is QUEUE_FULL or QUEUE_TIMEOUT"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Generation shed ({reason})")
+        self.reason = reason
+
+
+class _Waiter:
+    __slots__ = ("client_id", "future", "queued_at")
+
+    def __init__(self, client_id: str, future: asyncio.Future):
+        self.client_id = client_id
+        self.future = future
+        self.queued_at = time.monotonic()
+
+
+class AdmissionSlot:
+    """`async with controller.slot(client)`: waits for a slot, releases it on exit"""
+
+    def __init__(self, controller: "AdmissionController", client_id: str):
+        self.controller = controller
+        self.client_id = client_id
+
+    async def __aenter__(self):
+        await self.controller.acquire(self.client_id)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.controller.release(self.client_id)
+        return False
+
+
+class AdmissionController:
+    """Global + per-client concurrency limit with a bounded FIFO queue; use from the event loop only"""
+
+    def __init__(self, max_concurrent: int, max_per_client: int, max_queue: int, max_wait_seconds: float):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_per_client = max(1, max_per_client)
+        self.max_queue = max(0, max_queue)
+        self.max_wait_seconds = max_wait_seconds
+        self._active = 0
+        self._per_client: Dict[str, int] = {}
+        self._queue: Deque[_Waiter] = deque()
+        # Queue wait of recently admitted requests (0 for those admitted at once)
+        self._waits: Deque[float] = deque(maxlen=1000)
+        # Stats
+        self.admitted = 0
+        self.queued = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self.peak_queue_depth = 0
+
+    def slot(self, client_id: str) -> AdmissionSlot:
+        return AdmissionSlot(self, client_id)
+
+    def _can_run(self, client_id: str) -> bool:
+        return self._active < self.max_concurrent and self._per_client.get(client_id, 0) < self.max_per_client
+
+    def _grant(self, client_id: str, waited: float) -> None:
+        self._active += 1
+        self._per_client[client_id] = self._per_client.get(client_id, 0) + 1
+        self.admitted += 1
+        self._waits.append(waited)
+
+    async def acquire(self, client_id: str) -> None:
+        # The queue only ever holds waiters blocked by their per-client limit
+        # while there is global capacity, so an eligible newcomer isn't
+        # jumping ahead of anyone who could run
+        if self._can_run(client_id):
+            self._grant(client_id, 0.0)
+            return
+        if len(self._queue) >= self.max_queue:
+            self.shed_queue_full += 1
+            raise AdmissionRejected(QUEUE_FULL)
+
+        waiter = _Waiter(client_id, asyncio.get_running_loop().create_future())
+        self._queue.append(waiter)
+        self.queued += 1
+        self.peak_queue_depth = max(self.peak_queue_depth, len(self._queue))
+        try:
+            await asyncio.wait({waiter.future}, timeout=self.max_wait_seconds)
+        except asyncio.CancelledError:
+            # Caller went away; hand back a slot granted in the meantime
+            if waiter.future.done():
+                self.release(client_id)
+            else:
+                self._queue.remove(waiter)
+            raise
+        if not waiter.future.done():
+            self._queue.remove(waiter)
+            self.shed_timeout += 1
+            logger.warning(f"Generation for {client_id} shed after waiting {self.max_wait_seconds}s in queue")
+            raise AdmissionRejected(QUEUE_TIMEOUT)
+
+    def release(self, client_id: str) -> None:
+        self._active -= 1
+        self._per_client[client_id] -= 1
+        if self._per_client[client_id] <= 0:
+            del self._per_client[client_id]
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Admit queued waiters in arrival order, skipping clients at their own limit"""
+        for waiter in list(self._queue):
+            if self._active >= self.max_concurrent:
+                break
+            if self._per_client.get(waiter.client_id, 0) < self.max_per_client:
+                self._queue.remove(waiter)
+                self._grant(waiter.client_id, time.monotonic() - waiter.queued_at)
+                waiter.future.set_result(None)
+
+    def _wait_percentile(self, pct: float) -> Optional[float]:
+        waits = sorted(self._waits)
+        if not waits:
+            return None
+        return round(waits[min(len(waits) - 1, int(pct * len(waits)))] * 1000, 1)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "active": self._active,
+            "queue_depth": len(self._queue),
+            "peak_queue_depth": self.peak_queue_depth,
+            "oldest_wait_ms": round((now - self._queue[0].queued_at) * 1000, 1) if self._queue else 0,
+            "max_concurrent": self.max_concurrent,
+            "max_per_client": self.max_per_client,
+            "max_queue": self.max_queue,
+            "max_wait_seconds": self.max_wait_seconds,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+            "wait_p50_ms": self._wait_percentile(0.5),
+            "wait_p95_ms": self._wait_percentile(0.95),
+            "active_clients": len(self._per_client),
+        }
+
+
+# Global admission controller for Gemini generations
+generation_admission = AdmissionController(
+    max_concurrent=settings.generate_max_concurrent,
+    max_per_client=settings.generate_max_concurrent_per_client,
+    max_queue=settings.generate_queue_size,
+    max_wait_seconds=settings.generate_queue_max_wait_seconds
+)
+metrics.register("generate_admission", generation_admission.stats)
@@ -0,0 +1,88 @@
+"""
+Server-side prompt context for /generate.
+The client sends the event IDs /query returned instead of a formatted
+context string; the events come from the event cache and are rendered in
+rank order (the order given) into a compact context that fits a token
+budget. When it doesn't fit, snippets are trimmed starting with the
+lowest-ranked evidence, and only if the headers alone are still too long
+are the lowest-ranked items dropped; the top item is always kept.
+"""
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Rough token estimate for English prose; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+# A snippet trimmed below this many characters is dropped rather than kept as a stub
+MIN_SNIPPET_CHARS = 40
+
+CONTEXT_HEADER = "LIVE UPDATES CONTEXT:\n"
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def evidence_snippet(event: Dict) -> str:
+    """Snippet shown for an event: its own snippet, else the start of its content, else its title"""
+    snippet = event.get("snippet", "")
+    if not snippet or len(snippet) < 10:
+        content = event.get("content", "")
+        if content and len(content) > 20:
+            snippet = content[:200] + "..."
+        else:
+            snippet = event.get("title", "")
+    return snippet
+
+
+def _header(event: Dict) -> str:
+    return (
+        f"[{event.get('timestamp') or 'N/A'} | {event.get('source') or 'Unknown'}] {event.get('title', 'Untitled')}\n"
+        f"Company: {event.get('company') or 'N/A'} | Event: {event.get('event_type') or 'General'}\n"
+    )
+
+
+def _entry(header: str, snippet: Optional[str]) -> str:
+    return header + (f"Snippet: {snippet}\n" if snippet else "") + "\n"
+
+
+def build_evidence_context(events: List[Dict], token_budget: int) -> str:
+    """Render events (highest priority first) as prompt context within token_budget"""
+    if not events:
+        return ""
+    headers = [_header(event) for event in events]
+    snippets: List[Optional[str]] = [evidence_snippet(event) for event in events]
+    budget = max(0, token_budget) * CHARS_PER_TOKEN
+    excess = len(CONTEXT_HEADER) + sum(len(_entry(h, s)) for h, s in zip(headers, snippets)) - budget
+
+    # Trim snippets, lowest priority first
+    trimmed = 0
+    for i in range(len(events) - 1, -1, -1):
+        if excess <= 0:
+            break
+        snippet = snippets[i]
+        if not snippet:
+            continue
+        keep = len(snippet) - excess - 1  # one char for the ellipsis
+        if keep >= MIN_SNIPPET_CHARS:
+            snippets[i] = snippet[:keep].rstrip() + "…"
+        else:
+            snippets[i] = None
+        excess -= len(_entry(headers[i], snippet)) - len(_entry(headers[i], snippets[i]))
+        trimmed += 1
+
+    # Still over: drop the lowest-ranked items, keeping at least one
+    count = len(events)
+    while excess > 0 and count > 1:
+        count -= 1
+        excess -= len(_entry(headers[count], snippets[count]))
+
+    context = CONTEXT_HEADER + "".join(_entry(h, s) for h, s in zip(headers[:count], snippets[:count]))
+    if trimmed or count < len(events):
+        logger.info(
+            f"Evidence context fitted to {token_budget} tokens: {trimmed} snippets trimmed, "
+            f"{len(events) - count} items dropped (~{estimate_tokens(context)} tokens)"
+        )
+    return context
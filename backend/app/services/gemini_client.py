@@ -1,131 +1,393 @@
 import google.generativeai as genai
 from app.settings import settings
+from app.io_pool import run_io
+from app.singleflight import request_flights
+from app.services.insight_cache import insight_cache, insight_cache_key
+from app.services.report_stream import SectionStreamParser
+from app.services.model_router import model_router, classify_failure
+from app.services.admission import AdmissionRejected
+import json
 import logging
 import asyncio
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+import os
+import threading
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from typing import AsyncContextManager, AsyncIterator, Iterable, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Priority list
+PREFERRED_MODELS = [
+    "models/gemini-1.5-flash",
+    "models/gemini-1.5-pro",
+    "models/gemini-1.0-pro",
+    "models/gemini-pro"
+]
+
+# Insight cache namespace for reports; the key leaves out the model, which routing picks per call
+REPORT_CACHE_NAMESPACE = "report"
+
 class GeminiClient:
     def __init__(self):
         self.available_models = []
+        # Background half-open probes (kept referenced until done)
+        self._probes = set()
+        # Full model listing as last discovered: [{"name", "supported_generation_methods"}]
+        self.model_listing: list[dict] = []
+        self.models_fetched_at = 0.0
+        self.models_source = "none"
+        self._discovery_lock = threading.Lock()
+        self._discovery_thread = None
         if settings.gemini_api_key:
             genai.configure(api_key=settings.gemini_api_key)
-            # Initialize model discovery
-            self._discover_models()
+            # Warm start from the disk cache (even if stale); discovery itself
+            # runs in the background after startup, see start_discovery()
+            if not self._load_model_cache():
+                self.available_models = [settings.gemini_model]
+                self.models_source = "default"
         else:
             logger.warning("Gemini API Key not configured.")
 
+    def _apply_listing(self, listing: list[dict]) -> None:
+        """
+        Take the models that support generateContent, sorted by preference.
+        """
+        all_models = [m["name"] for m in listing if "generateContent" in m.get("supported_generation_methods", [])]
+        
+        # 1. Add preferred models if they exist
+        available = [preferred for preferred in PREFERRED_MODELS if preferred in all_models]
+        
+        # 2. Add any other models not in preferred list (as backup)
+        available.extend(m for m in all_models if m not in available)
+        
+        if not available:
+            logger.error("No models found supporting generateContent.")
+            # Fallback to settings default
+            available = [settings.gemini_model]
+        self.model_listing = listing
+        self.available_models = available
+
+    def _load_model_cache(self) -> bool:
+        path = Path(settings.llm_models_cache_path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            self._apply_listing(cached["models"])
+            self.models_fetched_at = float(cached["fetched_at"])
+            self.models_source = "cache"
+            logger.info(f"Gemini models loaded from cache ({self._models_age():.0f}s old): {self.available_models}")
+            return True
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable model cache {path}: {e}")
+            return False
+
+    def _save_model_cache(self) -> None:
+        path = Path(settings.llm_models_cache_path)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(path.suffix + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"fetched_at": self.models_fetched_at, "models": self.model_listing}, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Failed to write model cache {path}: {e}")
+
+    def _models_age(self) -> float:
+        return time.time() - self.models_fetched_at if self.models_fetched_at else float("inf")
+
     def _discover_models(self):
         """
-        Dynamically find all available models that support generateContent,
-        sorted by preference.
+        Dynamically find all available models (blocking network call) and
+        persist the listing for warm starts. Keeps the current list on failure.
         """
         try:
-            all_models = []
-            for m in genai.list_models():
-                if "generateContent" in m.supported_generation_methods:
-                    all_models.append(m.name)
-            
-            logger.info(f"All available Gemini models: {all_models}")
-            
-            # Priority list
-            preferred_order = [
-                "models/gemini-1.5-flash",
-                "models/gemini-1.5-pro",
-                "models/gemini-1.0-pro",
-                "models/gemini-pro"
+            listing = [
+                {"name": m.name, "supported_generation_methods": list(m.supported_generation_methods)}
+                for m in genai.list_models()
             ]
-            
-            # 1. Add preferred models if they exist
-            self.available_models = []
-            for preferred in preferred_order:
-                if preferred in all_models:
-                    self.available_models.append(preferred)
-            
-            # 2. Add any other models not in preferred list (as backup)
-            for m in all_models:
-                if m not in self.available_models:
-                    self.available_models.append(m)
-            
-            if not self.available_models:
-                logger.error("No models found supporting generateContent.")
-            else:
-                logger.info(f"Gemini models ready for use: {self.available_models}")
-                
+            logger.info(f"All available Gemini models: {[m['name'] for m in listing]}")
+            self._apply_listing(listing)
+            self.models_fetched_at = time.time()
+            self.models_source = "live"
+            self._save_model_cache()
+            logger.info(f"Gemini models ready for use: {self.available_models}")
         except Exception as e:
             logger.error(f"Failed to discover models: {e}")
-            # Fallback to settings default
-            self.available_models = [settings.gemini_model]
 
-    @retry(
-        stop=stop_after_attempt(2), # Reduce retries to avoid wasting quota
-        wait=wait_exponential(multiplier=1, min=2, max=5),
-        retry=retry_if_exception_type(Exception),
-        reraise=True
-    )
-    async def _generate_with_timeout(self, model_name: str, prompt: str, timeout: int = 10) -> str:
+    def start_discovery(self, force: bool = False) -> None:
+        """
+        Refresh the model list on a background thread if the cached one is
+        older than llm_models_cache_ttl_seconds (or force). Never blocks.
+        """
+        if not settings.gemini_api_key:
+            return
+        if not force and self._models_age() < settings.llm_models_cache_ttl_seconds:
+            return
+        with self._discovery_lock:
+            if self._discovery_thread is not None and self._discovery_thread.is_alive():
+                return
+            self._discovery_thread = threading.Thread(target=self._discover_models, name="gemini-discovery", daemon=True)
+            self._discovery_thread.start()
+
+    async def _generate_with_timeout(self, model_name: str, prompt: str, timeout: float = None, generation_config: dict = None) -> str:
         """
-        Generate content with strict timeout and retries.
+        Generate content with a strict timeout. There is no per-model retry:
+        a failure moves on to the next routed model instead.
         """
         model = genai.GenerativeModel(model_name)
         # Use async generation
         response = await asyncio.wait_for(
-            model.generate_content_async(prompt),
-            timeout=timeout
+            model.generate_content_async(prompt, generation_config=generation_config),
+            timeout=timeout or settings.llm_request_timeout_seconds
         )
         return response.text
 
-    async def generate_content_with_fallback(self, prompt: str) -> str:
+    async def _attempt(self, model_name: str, prompt: str, generation_config: dict = None) -> str:
+        """One routed call, with its outcome recorded against the model"""
+        model_router.begin(model_name)
+        start = time.monotonic()
+        try:
+            text = await self._generate_with_timeout(model_name, prompt, generation_config=generation_config)
+        except asyncio.CancelledError:
+            model_router.record_cancelled(model_name)
+            raise
+        except Exception as e:
+            model_router.record_failure(model_name, time.monotonic() - start, classify_failure(e))
+            raise
+        model_router.record_success(model_name, time.monotonic() - start)
+        return text
+
+    def _start_probes(self) -> None:
+        """Send a tiny request to each half-open model so recovery never costs a user request"""
+        for model_name in model_router.due_probes(self.available_models):
+            probe = asyncio.ensure_future(self._probe(model_name))
+            self._probes.add(probe)
+            probe.add_done_callback(self._probes.discard)
+
+    async def _probe(self, model_name: str) -> None:
+        try:
+            await self._attempt(model_name, "Hello", generation_config={"max_output_tokens": 5})
+        except Exception as e:
+            logger.info(f"Probe of {model_name} failed: {e}")
+
+    async def _hedged(self, primary: str, backup: str, prompt: str) -> Tuple[str, str]:
+        """
+        Call primary; if it hasn't answered within its p95 latency, also call
+        backup and keep whichever succeeds first. If primary fails before the
+        hedge fires, backup is simply tried next. Returns (text, model).
+        """
+        first = asyncio.ensure_future(self._attempt(primary, prompt))
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait({first}, timeout=model_router.hedge_delay(primary))
+            if done:
+                if first.exception() is None:
+                    return first.result(), primary
+                logger.warning(f"Model {primary} failed: {first.exception()}")
+                return await self._attempt(backup, prompt), backup
+
+            logger.info(f"Model {primary} slower than its p95, hedging with {backup}")
+            model_router.hedges_fired += 1
+            second = asyncio.ensure_future(self._attempt(backup, prompt))
+            tasks.append(second)
+            pending = {first, second}
+            last_error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            model_router.hedges_won += 1
+                            return task.result(), backup
+                        return task.result(), primary
+                    last_error = task.exception()
+                    logger.warning(f"Hedged call failed: {last_error}")
+            raise last_error
+        finally:
+            # Also reached when the caller is cancelled mid-wait
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def generate_content_with_fallback(self, prompt: str) -> Tuple[str, Optional[str]]:
         """
-        Generate content using available models, falling back if one is rate limited.
+        Generate content on the healthiest available model, falling back
+        through the rest. Models whose circuit is open are skipped without a
+        call; with hedging enabled, models are raced in pairs. Returns
+        (text, model that answered); the model is None when none did.
         """
         if not self.available_models:
-            return "Insight generation unavailable: No Gemini models found."
+            return "Insight generation unavailable: No Gemini models found.", None
+
+        self._start_probes()
+        candidates = model_router.order(self.available_models)
+        if not candidates:
+            return "**Insight Generation Unavailable**\n\nAll models are temporarily unavailable (rate limited or timing out). Please try again shortly.", None
 
         errors = []
-        
-        for model_name in self.available_models:
+        step = 2 if settings.llm_hedge_enabled else 1
+        for i in range(0, len(candidates), step):
+            pair = candidates[i:i + step]
             try:
-                logger.info(f"Attempting generation with model: {model_name}")
-                return await self._generate_with_timeout(model_name, prompt)
+                logger.info(f"Attempting generation with model: {' / '.join(pair)}")
+                if len(pair) == 2:
+                    return await self._hedged(pair[0], pair[1], prompt)
+                return await self._attempt(pair[0], prompt), pair[0]
             except Exception as e:
-                error_str = str(e)
-                logger.warning(f"Model {model_name} failed: {error_str}")
-                
-                # Check for Rate Limit (429)
-                if "429" in error_str or "Quota exceeded" in error_str:
-                    logger.warning(f"Rate limit hit for {model_name}, trying next model...")
-                    errors.append(f"{model_name}: Rate Limit")
-                    continue # Try next model
-                
-                # For other errors, we might also want to try next model, 
-                # but let's be conservative and try next only if it seems like a model-specific issue
-                errors.append(f"{model_name}: {error_str}")
+                logger.warning(f"Model {' / '.join(pair)} failed: {e}")
+                errors.append(f"{' / '.join(pair)}: {'Rate Limit' if classify_failure(e) == 'rate_limit' else e}")
+
+        # If we get here, all models failed
+        return f"**Insight Generation Unavailable**\n\nAll available models failed. Errors: {'; '.join(errors)}", None
+
+    async def stream_content_with_fallback(self, prompt: str, timeout: float = None) -> AsyncIterator[Tuple[str, Optional[str]]]:
+        """
+        Stream generated text chunk by chunk as (text, model) pairs, falling
+        back to the next model only while nothing has been sent yet; once a
+        model has started streaming its failure ends the stream. Each chunk
+        must arrive within `timeout` seconds. The model is None for the
+        closing error text when no model answered.
+        """
+        if not self.available_models:
+            yield "Insight generation unavailable: No Gemini models found.", None
+            return
+        timeout = timeout or settings.llm_request_timeout_seconds
+
+        errors = []
+
+        # Routed like generate_content_with_fallback; streams aren't hedged
+        # since the first chunk already commits to a model
+        self._start_probes()
+        for model_name in model_router.order(self.available_models):
+            started = False
+            model_router.begin(model_name)
+            start = time.monotonic()
+            try:
+                logger.info(f"Attempting streamed generation with model: {model_name}")
+                model = genai.GenerativeModel(model_name)
+                response = await asyncio.wait_for(
+                    model.generate_content_async(prompt, stream=True),
+                    timeout=timeout
+                )
+                chunks = response.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=timeout)
+                    except StopAsyncIteration:
+                        model_router.record_success(model_name, time.monotonic() - start)
+                        return
+                    if chunk.text:
+                        started = True
+                        yield chunk.text, model_name
+            except (asyncio.CancelledError, GeneratorExit):
+                model_router.record_cancelled(model_name)
+                raise
+            except Exception as e:
+                model_router.record_failure(model_name, time.monotonic() - start, classify_failure(e))
+                if started:
+                    raise
+                logger.warning(f"Model {model_name} failed to stream: {e}")
+                errors.append(f"{model_name}: {e}")
                 continue
 
         # If we get here, all models failed
-        return f"**Insight Generation Unavailable**\n\nAll available models failed. Errors: {'; '.join(errors)}"
+        yield f"**Insight Generation Unavailable**\n\nAll available models failed. Errors: {'; '.join(errors)}", None
 
-    def list_available_models(self) -> list[dict]:
-        """List available models and their methods."""
+    def _report_key(self, prompt: str, evidence_ids: Iterable[str]) -> str:
+        """Cache key for a report request; independent of the model routing picks"""
+        return insight_cache_key(REPORT_CACHE_NAMESPACE, prompt, evidence_ids)
+
+    async def generate_report(self, prompt: str, evidence_ids: Iterable[str] = (), admission: Optional[AsyncContextManager] = None) -> str:
+        """
+        Generate a JSON report, serving repeats of the same prompt and
+        evidence from the persistent insight cache. Only output that validates
+        as JSON is cached; anything else is returned as-is. The model call
+        runs inside `admission` (e.g. an admission slot); cache hits and
+        requests joining an in-flight call don't enter it, but if the call
+        they joined is shed under its own caller's limits they retry under
+        their own admission.
+        """
+        key = self._report_key(prompt, evidence_ids)
+        cached = await run_io(insight_cache.get, key)
+        if cached is not None:
+            logger.info(f"Insight cache hit ({key[:12]})")
+            return cached
+        # Identical concurrent requests share one model call
+        led = False
+        def lead():
+            nonlocal led
+            led = True
+            return self._generate_and_cache(key, prompt, admission)
         try:
-            models = []
-            for m in genai.list_models():
-                models.append({
-                    "name": m.name,
-                    "supported_generation_methods": m.supported_generation_methods
-                })
-            return models
-        except Exception as e:
-            logger.error(f"Failed to list models: {e}")
-            return []
+            return await request_flights.do(("insight", key), lead)
+        except AdmissionRejected:
+            if led or admission is None:
+                raise
+            logger.info(f"Joined report call ({key[:12]}) was shed; retrying under this caller's admission")
+            return await self._generate_and_cache(key, prompt, admission)
+
+    async def _generate_and_cache(self, key: str, prompt: str, admission: Optional[AsyncContextManager] = None) -> str:
+        async with admission or nullcontext():
+            raw, model_name = await self.generate_content_with_fallback(prompt)
+        insight_text, valid = clean_report_json(raw)
+        if valid:
+            await run_io(insight_cache.set, key, model_name, insight_text)
+        else:
+            logger.warning("Gemini output invalid JSON, attempting repair or fallback.")
+        return insight_text
+
+    async def stream_report(self, prompt: str, evidence_ids: Iterable[str] = (), admission: Optional[AsyncContextManager] = None) -> AsyncIterator[dict]:
+        """
+        Streaming counterpart of generate_report. Yields "token" events as
+        text arrives, a "section" event as each report section completes and
+        a final "done" event carrying the full (validated) report. Cache hits
+        replay their sections immediately; a live stream holds `admission`
+        until it ends.
+        """
+        key = self._report_key(prompt, evidence_ids)
+        cached = await run_io(insight_cache.get, key)
+        if cached is not None:
+            logger.info(f"Insight cache hit ({key[:12]})")
+            report = json.loads(cached)
+            for section in report.get("sections", []) if isinstance(report, dict) else []:
+                yield {"type": "section", "section": section}
+            yield {"type": "done", "insight": cached, "cached": True}
+            return
+
+        parser = SectionStreamParser()
+        chunks = []
+        model_name = None
+        async with admission or nullcontext():
+            async for text, model_name in self.stream_content_with_fallback(prompt):
+                chunks.append(text)
+                yield {"type": "token", "text": text}
+                for section in parser.feed(text):
+                    yield {"type": "section", "section": section}
+
+        insight_text, valid = clean_report_json("".join(chunks))
+        if valid:
+            await run_io(insight_cache.set, key, model_name, insight_text)
+        else:
+            logger.warning("Streamed Gemini output invalid JSON, returning raw text.")
+        yield {"type": "done", "insight": insight_text, "cached": False}
+
+    def list_available_models(self) -> list[dict]:
+        """List available models and their methods (served from the discovery cache)."""
+        # Stale listings are served while a background refresh runs
+        self.start_discovery()
+        return self.model_listing
 
     async def check_health(self) -> dict:
         """Check API key validity and model availability."""
         status = {
             "api_key_configured": bool(settings.gemini_api_key),
             "available_models": self.available_models,
+            "models_source": self.models_source,
+            "models_age_seconds": round(self._models_age()) if self.models_fetched_at else None,
             "generation_test": "skipped"
         }
         
@@ -144,4 +406,19 @@ class GeminiClient:
                 
         return status
 
+def clean_report_json(insight_text: str) -> Tuple[str, bool]:
+    """Strip markdown fences and minify; returns (text, whether it is valid JSON)"""
+    # Clean up potential markdown code blocks if Gemini adds them
+    if insight_text.startswith("```json"):
+        insight_text = insight_text[7:]
+    if insight_text.endswith("```"):
+        insight_text = insight_text[:-3]
+    insight_text = insight_text.strip()
+
+    try:
+        # Re-serialize to ensure it's valid minified JSON string
+        return json.dumps(json.loads(insight_text)), True
+    except json.JSONDecodeError:
+        return insight_text, False
+
 gemini_client = GeminiClient()
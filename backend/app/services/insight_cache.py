@@ -0,0 +1,74 @@
+"""
+Content-addressed cache of validated Gemini reports.
+The key hashes a namespace, the whitespace/case-normalized prompt and the
+IDs of the evidence it was built from, so any change in evidence (which also
+changes the prompt's context) produces a new key and stale reports are
+never served. The model isn't part of the key, since routing picks it per
+call; each entry records the model that actually answered. Entries live in SQLite next to seen_events, so they survive
+restarts, and are bounded by a TTL and an LRU entry limit.
+"""
+import hashlib
+import logging
+from typing import Iterable, Optional
+
+from app.settings import settings
+from app import storage
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def insight_cache_key(namespace: str, prompt: str, evidence_ids: Iterable[str] = ()) -> str:
+    normalized = " ".join(prompt.lower().split())
+    evidence = ",".join(sorted(set(evidence_ids)))
+    return hashlib.sha256(f"{namespace}\x1f{normalized}\x1f{evidence}".encode("utf-8")).hexdigest()
+
+
+class InsightCache:
+    """Thin stats-keeping wrapper over the insight_cache table (blocking; call via run_io)"""
+
+    def __init__(self, ttl_seconds: int, max_entries: int, enabled: bool = True):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        report = storage.get_insight(key, self.ttl_seconds)
+        if report is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return report
+
+    def set(self, key: str, model: str, report: str) -> None:
+        if not self.enabled:
+            return
+        self.evictions += storage.put_insight(key, model, report, self.ttl_seconds, self.max_entries)
+        self.stores += 1
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "entries": storage.insight_cache_size() if self.enabled else 0,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
+
+
+# Global insight cache instance
+insight_cache = InsightCache(
+    ttl_seconds=settings.insight_cache_ttl_seconds,
+    max_entries=settings.insight_cache_max_entries,
+    enabled=settings.insight_cache_enabled
+)
+metrics.register("insight_cache", insight_cache.stats)
@@ -0,0 +1,242 @@
+"""
+Latency-aware routing across Gemini models.
+Each model keeps a rolling window of recent call outcomes (latency, success),
+bounded by count and age so a demoted model gets retried once its errors
+age out, and a circuit breaker: repeated rate limits or timeouts open the
+circuit so the model is skipped outright instead of costing a full timeout
+per report; after a cooldown a single half-open probe (sent in the
+background, off the request path) decides whether it closes again.
+The router orders the usable models healthiest first and supplies the p95
+delay used to hedge a slow call with a second model.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.settings import settings
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Failure kinds; only these trip the breaker
+RATE_LIMIT = "rate_limit"
+TIMEOUT = "timeout"
+ERROR = "error"
+_TRIPPING = (RATE_LIMIT, TIMEOUT)
+
+# Samples needed before a model's own p95 is trusted for hedging
+MIN_HEDGE_SAMPLES = 5
+
+
+def classify_failure(error: BaseException) -> str:
+    """Map a generation exception to RATE_LIMIT, TIMEOUT or ERROR"""
+    if isinstance(error, asyncio.TimeoutError):
+        return TIMEOUT
+    text = str(error)
+    if type(error).__name__ == "ResourceExhausted" or "429" in text or "Quota exceeded" in text:
+        return RATE_LIMIT
+    if type(error).__name__ == "DeadlineExceeded":
+        return TIMEOUT
+    return ERROR
+
+
+class ModelHealth:
+    """Rolling outcome window and circuit breaker for one model"""
+
+    def __init__(self, name: str, window: int, window_seconds: float):
+        self.name = name
+        self.window_seconds = window_seconds
+        # (recorded at, latency seconds, succeeded), newest last
+        self.outcomes: Deque[Tuple[float, float, bool]] = deque(maxlen=max(1, window))
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.calls = 0
+        self.failures = 0
+        self.rate_limits = 0
+        self.timeouts = 0
+        self.times_opened = 0
+
+    def record(self, latency: float, ok: bool) -> None:
+        self.outcomes.append((time.monotonic(), latency, ok))
+
+    def _prune(self) -> None:
+        cutoff = time.monotonic() - self.window_seconds
+        while self.outcomes and self.outcomes[0][0] < cutoff:
+            self.outcomes.popleft()
+
+    def error_rate(self) -> float:
+        self._prune()
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for _, _, ok in self.outcomes if not ok) / len(self.outcomes)
+
+    def successes(self) -> int:
+        self._prune()
+        return sum(1 for _, _, ok in self.outcomes if ok)
+
+    def latency_percentile(self, pct: float) -> Optional[float]:
+        """Percentile of successful call latencies in the window"""
+        self._prune()
+        latencies = sorted(latency for _, latency, ok in self.outcomes if ok)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(pct * len(latencies)))]
+
+    def stats(self) -> dict:
+        p50 = self.latency_percentile(0.5)
+        p95 = self.latency_percentile(0.95)
+        return {
+            "state": self.state,
+            "calls": self.calls,
+            "failures": self.failures,
+            "rate_limits": self.rate_limits,
+            "timeouts": self.timeouts,
+            "times_opened": self.times_opened,
+            "window_error_rate": round(self.error_rate(), 3),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+class ModelRouter:
+    """Orders models by health and tracks breaker state; thread-safe"""
+
+    def __init__(self, window: int, window_seconds: float, failure_threshold: int, cooldown_seconds: float):
+        self.window = window
+        self.window_seconds = window_seconds
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_seconds = cooldown_seconds
+        self._models: Dict[str, ModelHealth] = {}
+        self._lock = threading.Lock()
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+    def _health(self, model: str) -> ModelHealth:
+        health = self._models.get(model)
+        if health is None:
+            health = self._models[model] = ModelHealth(model, self.window, self.window_seconds)
+        return health
+
+    def _refresh(self, health: ModelHealth) -> None:
+        """Move an open circuit to half-open once its cooldown has passed"""
+        if health.state == OPEN and time.monotonic() - health.opened_at >= self.cooldown_seconds:
+            health.state = HALF_OPEN
+            health.probe_in_flight = False
+
+    def order(self, models: List[str]) -> List[str]:
+        """
+        Models that may be called now, healthiest first: closed circuits by
+        windowed error rate (in 10% steps, so one error doesn't reshuffle)
+        then median latency, with the configured preference order as the
+        tie-break. Only when no circuit is closed are half-open models
+        offered, so live traffic becomes their probe.
+        """
+        closed = []
+        half_open = []
+        with self._lock:
+            for index, model in enumerate(models):
+                health = self._health(model)
+                self._refresh(health)
+                if health.state == CLOSED:
+                    median = health.latency_percentile(0.5)
+                    closed.append((
+                        round(health.error_rate(), 1),
+                        median if median is not None else float("inf"),
+                        index,
+                        model
+                    ))
+                elif health.state == HALF_OPEN and not health.probe_in_flight:
+                    half_open.append(model)
+        closed.sort()
+        return [entry[-1] for entry in closed] or half_open
+
+    def due_probes(self, models: List[str]) -> List[str]:
+        """Half-open models needing a probe; each is handed out once"""
+        due = []
+        with self._lock:
+            for model in models:
+                health = self._health(model)
+                self._refresh(health)
+                if health.state == HALF_OPEN and not health.probe_in_flight:
+                    health.probe_in_flight = True
+                    due.append(model)
+        return due
+
+    def begin(self, model: str) -> None:
+        """Mark a call as started; a half-open model allows only one probe"""
+        with self._lock:
+            health = self._health(model)
+            if health.state == HALF_OPEN:
+                health.probe_in_flight = True
+
+    def record_success(self, model: str, latency: float) -> None:
+        with self._lock:
+            health = self._health(model)
+            health.calls += 1
+            health.record(latency, True)
+            health.consecutive_failures = 0
+            if health.state != CLOSED:
+                logger.info(f"Circuit for {model} closed after successful probe")
+            health.state = CLOSED
+            health.probe_in_flight = False
+
+    def record_failure(self, model: str, latency: float, kind: str) -> None:
+        with self._lock:
+            health = self._health(model)
+            health.calls += 1
+            health.failures += 1
+            health.record(latency, False)
+            if kind == RATE_LIMIT:
+                health.rate_limits += 1
+            elif kind == TIMEOUT:
+                health.timeouts += 1
+            if kind in _TRIPPING:
+                health.consecutive_failures += 1
+            health.probe_in_flight = False
+            if health.state == HALF_OPEN or (kind in _TRIPPING and health.consecutive_failures >= self.failure_threshold):
+                if health.state != OPEN:
+                    health.times_opened += 1
+                    logger.warning(f"Circuit for {model} opened ({kind}); skipping it for {self.cooldown_seconds}s")
+                health.state = OPEN
+                health.opened_at = time.monotonic()
+
+    def record_cancelled(self, model: str) -> None:
+        """A hedged call lost the race; free a half-open probe slot without judging the model"""
+        with self._lock:
+            self._health(model).probe_in_flight = False
+
+    def hedge_delay(self, model: str) -> float:
+        """Seconds to wait on a model before hedging: its p95, floored at llm_hedge_min_delay_ms"""
+        floor = settings.llm_hedge_min_delay_ms / 1000
+        with self._lock:
+            health = self._health(model)
+            p95 = health.latency_percentile(0.95) if health.successes() >= MIN_HEDGE_SAMPLES else None
+        return max(floor, p95) if p95 is not None else floor
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hedging_enabled": settings.llm_hedge_enabled,
+                "hedges_fired": self.hedges_fired,
+                "hedges_won": self.hedges_won,
+                "models": {name: health.stats() for name, health in self._models.items()},
+            }
+
+
+# Global router shared by all Gemini calls
+model_router = ModelRouter(
+    window=settings.llm_latency_window,
+    window_seconds=settings.llm_latency_window_seconds,
+    failure_threshold=settings.llm_breaker_failure_threshold,
+    cooldown_seconds=settings.llm_breaker_cooldown_seconds
+)
+metrics.register("llm_router", model_router.stats)
@@ -0,0 +1,70 @@
+"""
+Incremental parsing of a streamed JSON report.
+Gemini streams the report as arbitrary text chunks; SectionStreamParser
+scans them once, tracking nesting and string state, and hands back each
+object of the top-level "sections" array as soon as its closing brace
+arrives, so the UI can render sections while the rest is still generating.
+"""
+import json
+import logging
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Container stack at which a "{" opens a section: {"sections": [ {...}, ... ]}
+_SECTION_DEPTH = ["{", "["]
+
+
+class SectionStreamParser:
+    """Feed text chunks, get back the sections completed by each chunk"""
+
+    def __init__(self):
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._current: Optional[List[str]] = None
+        self.sections_emitted = 0
+
+    def feed(self, text: str) -> List[dict]:
+        completed = []
+        for ch in text:
+            if self._current is not None:
+                self._current.append(ch)
+            if not self._stack:
+                # Skip anything before the report object (e.g. a ```json fence)
+                if ch == "{":
+                    self._stack.append(ch)
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if ch == "{" and self._stack == _SECTION_DEPTH:
+                    self._current = ["{"]
+                self._stack.append(ch)
+            elif ch in "}]":
+                self._stack.pop()
+                if ch == "}" and self._current is not None and self._stack == _SECTION_DEPTH:
+                    section = self._parse("".join(self._current))
+                    self._current = None
+                    if section is not None:
+                        completed.append(section)
+        self.sections_emitted += len(completed)
+        return completed
+
+    @staticmethod
+    def _parse(raw: str) -> Optional[dict]:
+        try:
+            section = json.loads(raw)
+        except json.JSONDecodeError:
+            logger.warning("Skipping streamed report section that isn't valid JSON")
+            return None
+        return section if isinstance(section, dict) else None
@@ -13,6 +13,41 @@ class Settings(BaseSettings):
     gemini_api_key: str = os.getenv("GEMINI_API_KEY", "")
     gemini_model: str = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
     gemini_fallback_models: list[str] = ["gemini-1.5-pro", "gemini-1.0-pro"]
+    
+    # Model discovery runs in the background; the listing is cached on disk for warm starts
+    llm_models_cache_path: str = os.getenv("LLM_MODELS_CACHE_PATH", "data/llm_models.json")
+    llm_models_cache_ttl_seconds: int = int(os.getenv("LLM_MODELS_CACHE_TTL_SECONDS", "86400"))
+    
+    # Model routing: per-call timeout, circuit breakers, rolling latency window, hedging
+    llm_request_timeout_seconds: float = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "10"))
+    llm_breaker_failure_threshold: int = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "3"))
+    llm_breaker_cooldown_seconds: float = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "60"))
+    llm_latency_window: int = int(os.getenv("LLM_LATENCY_WINDOW", "50"))
+    llm_latency_window_seconds: float = float(os.getenv("LLM_LATENCY_WINDOW_SECONDS", "300"))
+    llm_hedge_enabled: bool = os.getenv("LLM_HEDGE_ENABLED", "False").lower() == "true"
+    llm_hedge_min_delay_ms: float = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "1500"))
+    
+    # Persistent cache of validated Gemini reports (SQLite, keyed on model + prompt + evidence)
+    insight_cache_enabled: bool = os.getenv("INSIGHT_CACHE_ENABLED", "True").lower() == "true"
+    insight_cache_ttl_seconds: int = int(os.getenv("INSIGHT_CACHE_TTL_SECONDS", "21600"))
+    insight_cache_max_entries: int = int(os.getenv("INSIGHT_CACHE_MAX_ENTRIES", "1000"))
+    
+    # /generate with event_ids: the server assembles the context from the event cache within a token budget
+    generate_context_token_budget: int = int(os.getenv("GENERATE_CONTEXT_TOKEN_BUDGET", "1500"))
+    generate_max_evidence: int = int(os.getenv("GENERATE_MAX_EVIDENCE", "20"))
+    
+    # Admission control for Gemini generations: global/per-client limits, bounded FIFO queue, max wait
+    generate_max_concurrent: int = int(os.getenv("GENERATE_MAX_CONCURRENT", "4"))
+    generate_max_concurrent_per_client: int = int(os.getenv("GENERATE_MAX_CONCURRENT_PER_CLIENT", "2"))
+    generate_queue_size: int = int(os.getenv("GENERATE_QUEUE_SIZE", "16"))
+    generate_queue_max_wait_seconds: float = float(os.getenv("GENERATE_QUEUE_MAX_WAIT_SECONDS", "10"))
+    
+    # Background pre-generation of reports for the recommended queries when the stream changes
+    prefetch_enabled: bool = os.getenv("PREFETCH_ENABLED", "True").lower() == "true"
+    prefetch_interval_seconds: float = float(os.getenv("PREFETCH_INTERVAL_SECONDS", "30"))
+    prefetch_top_n: int = int(os.getenv("PREFETCH_TOP_N", "4"))
+    prefetch_concurrency: int = int(os.getenv("PREFETCH_CONCURRENCY", "2"))
+    prefetch_max_generations_per_hour: int = int(os.getenv("PREFETCH_MAX_GENERATIONS_PER_HOUR", "40"))
     data_stream_path: str = os.getenv("DATA_STREAM_PATH", "data/stream.jsonl")
     host: str = os.getenv("HOST", "0.0.0.0")
     port: int = int(os.getenv("PORT", "8000"))
@@ -23,14 +58,81 @@ class Settings(BaseSettings):
     dedup_enabled: bool = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
     checkpoint_enabled: bool = os.getenv("CHECKPOINT_ENABLED", "true").lower() == "true"
     db_path: str = os.getenv("DB_PATH", "data/siliconpulse.db")
+    dedup_retention_days: int = int(os.getenv("DEDUP_RETENTION_DAYS", "30"))
+    
+    # SQLite tuning & connection pool
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "8"))
+    db_pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+    db_busy_timeout_ms: int = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+    db_mmap_size: int = int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024)))
+    db_cache_size_kb: int = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))
+    db_statement_cache_size: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+    
+    # In-memory membership filter in front of seen_events
+    dedup_filter_enabled: bool = os.getenv("DEDUP_FILTER_ENABLED", "true").lower() == "true"
+    dedup_filter_fp_rate: float = float(os.getenv("DEDUP_FILTER_FP_RATE", "0.01"))
+    dedup_filter_max_bytes: int = int(os.getenv("DEDUP_FILTER_MAX_BYTES", str(8 * 1024 * 1024)))
+    dedup_filter_partition_hours: int = int(os.getenv("DEDUP_FILTER_PARTITION_HOURS", "24"))
+    
+    # Segmented stream storage
+    stream_segment_hours: int = int(os.getenv("STREAM_SEGMENT_HOURS", "1"))
+    stream_segment_max_bytes: int = int(os.getenv("STREAM_SEGMENT_MAX_BYTES", str(16 * 1024 * 1024)))
+    stream_retention_hours: int = int(os.getenv("STREAM_RETENTION_HOURS", "72"))
+    stream_compact_min_bytes: int = int(os.getenv("STREAM_COMPACT_MIN_BYTES", str(1024 * 1024)))
+    stream_maintenance_minutes: int = int(os.getenv("STREAM_MAINTENANCE_MINUTES", "10"))
+    stream_index_every: int = int(os.getenv("STREAM_INDEX_EVERY", "64"))
+    
+    # Query evidence ranking (BM25 + recency + source trust)
+    rank_title_weight: float = float(os.getenv("RANK_TITLE_WEIGHT", "2.0"))
+    rank_bm25_k1: float = float(os.getenv("RANK_BM25_K1", "1.2"))
+    rank_bm25_b: float = float(os.getenv("RANK_BM25_B", "0.75"))
+    rank_alias_weight: float = float(os.getenv("RANK_ALIAS_WEIGHT", "0.5"))
+    rank_recency_weight: float = float(os.getenv("RANK_RECENCY_WEIGHT", "2.0"))
+    rank_trust_weight: float = float(os.getenv("RANK_TRUST_WEIGHT", "1.0"))
+    
+    # Query result cache (invalidated by stream generation, not by time)
+    query_cache_max_entries: int = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "100"))
+    query_cache_max_bytes: int = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+    
+    # Thread pool for blocking file / SQLite I/O (keeps the event loop free)
+    io_pool_workers: int = int(os.getenv("IO_POOL_WORKERS", "8"))
+    
+    # Single-writer append queue (group commit)
+    stream_writer_batch_max_events: int = int(os.getenv("STREAM_WRITER_BATCH_MAX_EVENTS", "1000"))
+    stream_writer_linger_ms: float = float(os.getenv("STREAM_WRITER_LINGER_MS", "0"))
+    stream_writer_fsync: bool = os.getenv("STREAM_WRITER_FSYNC", "false").lower() == "true"
+    
+    # Batch ingestion (/api/inject/batch)
+    ingest_batch_max_items: int = int(os.getenv("INGEST_BATCH_MAX_ITEMS", "5000"))
+    ingest_queue_high_water: int = int(os.getenv("INGEST_QUEUE_HIGH_WATER", "10000"))
+    ingest_retry_after_seconds: int = int(os.getenv("INGEST_RETRY_AFTER_SECONDS", "1"))
     
     # Pathway Settings
     use_pathway: bool = os.getenv("USE_PATHWAY", "True").lower() == "true"
     pathway_output_path: str = os.getenv("PATHWAY_OUTPUT_PATH", "data/pathway_out.jsonl")
     
+    # Source pull scheduling
+    source_pull_workers: int = int(os.getenv("SOURCE_PULL_WORKERS", "4"))
+    source_pull_timeout_seconds: int = int(os.getenv("SOURCE_PULL_TIMEOUT_SECONDS", "60"))
+    source_backoff_base_seconds: int = int(os.getenv("SOURCE_BACKOFF_BASE_SECONDS", "30"))
+    source_backoff_max_seconds: int = int(os.getenv("SOURCE_BACKOFF_MAX_SECONDS", "900"))
+    
+    # Source connectors (live API fetches)
+    source_http_max_connections: int = int(os.getenv("SOURCE_HTTP_MAX_CONNECTIONS", "20"))
+    source_http_timeout_seconds: float = float(os.getenv("SOURCE_HTTP_TIMEOUT_SECONDS", "15"))
+    source_max_queries: int = int(os.getenv("SOURCE_MAX_QUERIES", "50"))
+    source_fanout_concurrency: int = int(os.getenv("SOURCE_FANOUT_CONCURRENCY", "10"))
+    source_max_pages: int = int(os.getenv("SOURCE_MAX_PAGES", "3"))
+    # Stop fetching and keep what arrived; must stay below SOURCE_PULL_TIMEOUT_SECONDS
+    source_fetch_deadline_seconds: float = float(os.getenv("SOURCE_FETCH_DEADLINE_SECONDS", "45"))
+    
     # Perplexity Settings
     perplexity_api_key: str = os.getenv("PERPLEXITY_API_KEY", "")
     perplexity_enabled: bool = os.getenv("PERPLEXITY_ENABLED", "False").lower() == "true"
+    perplexity_pull_interval_seconds: int = int(os.getenv("PERPLEXITY_PULL_INTERVAL_SECONDS", "300"))
+    perplexity_base_url: str = os.getenv("PERPLEXITY_BASE_URL", "https://api.perplexity.ai")
+    perplexity_model: str = os.getenv("PERPLEXITY_MODEL", "sonar")
+    perplexity_rate_limit_per_second: float = float(os.getenv("PERPLEXITY_RATE_LIMIT_PER_SECOND", "2"))
     perplexity_queries: list[str] = [
         "NVIDIA TSMC contract", 
         "Apple semiconductor supply", 
@@ -42,6 +144,9 @@ class Settings(BaseSettings):
     # X (Twitter) Settings
     x_bearer_token: str = os.getenv("X_BEARER_TOKEN", "")
     x_enabled: bool = os.getenv("X_ENABLED", "False").lower() == "true"
+    x_pull_interval_seconds: int = int(os.getenv("X_PULL_INTERVAL_SECONDS", "300"))
+    x_base_url: str = os.getenv("X_BASE_URL", "https://api.twitter.com/2")
+    x_rate_limit_per_second: float = float(os.getenv("X_RATE_LIMIT_PER_SECOND", "2"))
     x_keywords: list[str] = [
         "TSMC", "NVIDIA", "CoWoS", "N2", "EUV", "HBM", "foundry", "chip deal", "acquisition"
     ]
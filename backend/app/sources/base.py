@@ -0,0 +1,302 @@
+"""
+Connector framework for source APIs.
+A connector turns a list of generated queries into events: live fetches fan
+out concurrently over one pooled httpx.AsyncClient (running on a dedicated
+event-loop thread shared by all connectors), each request paced by the
+source's rate limiter and paged up to source_max_pages. Without live
+credentials the connector falls back to its seed file, read incrementally
+from the stored checkpoint. Either way deduplicate_and_append writes the new
+events and only then advances the checkpoint.
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.settings import settings
+from app.utils import deduplicate_and_append
+from app import storage
+from app.storage import SourceCheckpoint
+from app.metrics import PullStats
+from app.keyword_matcher import COMPANY, EVENT, get_matcher
+from app.sources.seed_reader import read_seed_events
+from app import metrics
+
+logger = logging.getLogger(__name__)
+# httpx logs every request at INFO; fan-out makes that noise
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+class RateLimiter:
+    """Token bucket used from the client loop; a rate of 0 or less disables it"""
+
+    def __init__(self, rate_per_second: float, burst: Optional[int] = None):
+        self.rate = rate_per_second
+        self.burst = burst or max(1, int(rate_per_second))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.waits = 0
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # Reserve a token; going negative queues this caller behind earlier ones
+        self.tokens -= 1
+        if self.tokens < 0:
+            self.waits += 1
+            await asyncio.sleep(-self.tokens / self.rate)
+
+
+class ClientLoop:
+    """
+    Background event loop thread owning the shared AsyncClient.
+    Source pulls run on scheduler threads; they hand their fetch coroutine to
+    this loop so every connector shares one connection pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _start(self) -> Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]:
+        with self._lock:
+            if self._loop is not None and self._thread is not None and self._thread.is_alive():
+                return self._loop, self._client
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="source-http", daemon=True)
+            thread.start()
+            self._client = httpx.AsyncClient(
+                timeout=settings.source_http_timeout_seconds,
+                limits=httpx.Limits(
+                    max_connections=settings.source_http_max_connections,
+                    max_keepalive_connections=settings.source_http_max_connections
+                ),
+                headers={"User-Agent": "SiliconPulse/1.0"}
+            )
+            self._loop = loop
+            self._thread = thread
+            return loop, self._client
+
+    def run(self, fn: Callable[[httpx.AsyncClient], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """Run fn(client) on the loop and block until it finishes or times out"""
+        loop, client = self._start()
+        future = asyncio.run_coroutine_threadsafe(fn(client), loop)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def stop(self) -> None:
+        """Close the client and stop the loop thread (called on application shutdown)"""
+        with self._lock:
+            loop, thread, client = self._loop, self._thread, self._client
+            self._loop = self._thread = self._client = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(5)
+        except Exception as e:
+            logger.warning(f"Error closing source HTTP client: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+        loop.close()
+
+
+client_loop = ClientLoop()
+
+
+def stop_source_clients() -> None:
+    client_loop.stop()
+    logger.info("Source HTTP client stopped")
+
+
+class SourceConnector:
+    """
+    Base class for a source. Subclasses set name/seed_path, build their query
+    list and implement fetch_page for one page of one query.
+    """
+
+    name: str = ""
+    seed_path: Path = Path()
+    # Whether fetch_page returns cursors worth following (up to source_max_pages)
+    paged: bool = False
+
+    def __init__(self, rate_limit_per_second: float):
+        self.rate_limiter = RateLimiter(rate_limit_per_second)
+        # Stats
+        self.requests = 0
+        self.pages = 0
+        self.errors = 0
+        self.deadline_hits = 0
+        self.last_fetch_ms: Optional[float] = None
+        self.last_mode: Optional[str] = None
+
+    def live_enabled(self) -> bool:
+        """Whether live credentials are configured"""
+        return False
+
+    def build_queries(self, queries: Optional[List[str]] = None) -> List[str]:
+        """Queries to fan out; must return a new list, never a settings list"""
+        return list(queries or [])
+
+    async def fetch_page(self, client: httpx.AsyncClient, query: str, cursor: Optional[str], page_size: int) -> Tuple[List[dict], Optional[str]]:
+        """Fetch one page; returns (events, next cursor or None)"""
+        raise NotImplementedError
+
+    def tag_event(self, event: dict) -> dict:
+        """Fill in source, company and event type the same way the pipelines do"""
+        event.setdefault("source", self.name)
+        text = f"{event.get('title', '')} {event.get('content', '')}"
+        if not event.get("company") or event["company"].lower() == "unknown":
+            event["company"] = get_matcher().first(text, COMPANY) or "Unknown"
+        if not event.get("event_type") or event["event_type"].lower() == "unknown":
+            event["event_type"] = get_matcher().first(text, EVENT) or "general"
+        return event
+
+    async def _fetch_query(self, client: httpx.AsyncClient, query: str, page_size: int, semaphore: asyncio.Semaphore, sink: List[dict]) -> bool:
+        """Page through one query, appending events to sink; returns False on error"""
+        max_pages = settings.source_max_pages if self.paged else 1
+        cursor = None
+        async with semaphore:
+            for _ in range(max_pages):
+                await self.rate_limiter.acquire()
+                self.requests += 1
+                try:
+                    events, cursor = await self.fetch_page(client, query, cursor, page_size)
+                except (httpx.HTTPError, ValueError, KeyError) as e:
+                    self.errors += 1
+                    logger.warning(f"{self.name} fetch failed for '{query}': {e}")
+                    return False
+                self.pages += 1
+                sink.extend(self.tag_event(event) for event in events)
+                if not cursor:
+                    break
+        return True
+
+    async def fetch_all(self, client: httpx.AsyncClient, queries: List[str], page_size: int) -> List[dict]:
+        """
+        Fan the queries out concurrently (bounded by source_fanout_concurrency).
+        Stops at source_fetch_deadline_seconds and keeps what already arrived,
+        so a slow API yields a partial pull instead of a timed-out one. A query
+        that raises counts as failed without affecting the others; the pull
+        only fails when every query finished, none succeeded and nothing
+        arrived.
+        """
+        semaphore = asyncio.Semaphore(max(1, settings.source_fanout_concurrency))
+        events: List[dict] = []
+        tasks = [
+            asyncio.ensure_future(self._fetch_query(client, query, page_size, semaphore, events))
+            for query in queries
+        ]
+        done, pending = await asyncio.wait(tasks, timeout=settings.source_fetch_deadline_seconds)
+        if pending:
+            self.deadline_hits += 1
+            logger.warning(f"{self.name} fetch deadline reached with {len(pending)} of {len(tasks)} queries unfinished")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        succeeded = 0
+        for task in done:
+            if task.cancelled():
+                continue
+            error = task.exception()
+            if error is not None:
+                # Not an HTTP/payload error _fetch_query expects (e.g. a malformed response)
+                self.errors += 1
+                logger.warning(f"{self.name} query failed unexpectedly: {error!r}")
+            elif task.result():
+                succeeded += 1
+        if tasks and not pending and not succeeded and not events:
+            raise RuntimeError(f"All {len(tasks)} {self.name} queries failed")
+        return events
+
+    def pull(self, queries: Optional[List[str]] = None, max_results: int = 10, stats: Optional[PullStats] = None) -> int:
+        """
+        Fetch new events (live, or from the seed file as a fallback) and append
+        the unseen ones to the raw stream. Returns the number of new events.
+        """
+        # Resume position (file identity, byte offset) and timestamp watermark
+        checkpoint = storage.load_checkpoint(self.name)
+        start = time.monotonic()
+
+        if self.live_enabled():
+            self.last_mode = "live"
+            # Preserve order so the cap is deterministic
+            fanout = list(dict.fromkeys(self.build_queries(queries)))[:settings.source_max_queries]
+            events = client_loop.run(
+                lambda client: self.fetch_all(client, fanout, max_results),
+                timeout=settings.source_fetch_deadline_seconds + settings.source_http_timeout_seconds
+            )
+            # Live results only advance the watermark; the seed position is kept
+            timestamps = [event["timestamp"] for event in events if event.get("timestamp")]
+            if checkpoint and checkpoint.last_checkpoint:
+                timestamps.append(checkpoint.last_checkpoint)
+            position = SourceCheckpoint(
+                source=self.name,
+                last_checkpoint=max(timestamps) if timestamps else None,
+                file_id=checkpoint.file_id if checkpoint else None,
+                byte_offset=checkpoint.byte_offset if checkpoint else None
+            )
+        else:
+            self.last_mode = "seed"
+            # Fallback Logic: only the lines appended since the last pull
+            events, position = read_seed_events(self.seed_path, checkpoint, self.name)
+        self.last_fetch_ms = round((time.monotonic() - start) * 1000, 1)
+
+        # Write to stream; the new position commits with the dedup inserts
+        added_count = deduplicate_and_append(events, settings.resolved_data_path, checkpoint=position)
+
+        if stats is not None:
+            stats.fetched = len(events)
+            stats.new = added_count
+            if events:
+                stats.newest_event_ts = max((event.get("timestamp") or "") for event in events) or None
+
+        return added_count
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.last_mode,
+            "requests": self.requests,
+            "pages": self.pages,
+            "errors": self.errors,
+            "rate_limit_waits": self.rate_limiter.waits,
+            "deadline_hits": self.deadline_hits,
+            "last_fetch_ms": self.last_fetch_ms,
+        }
+
+
+_connectors: Dict[str, SourceConnector] = {}
+
+
+def register_connector(connector: SourceConnector) -> SourceConnector:
+    _connectors[connector.name] = connector
+    return connector
+
+
+def normalize_timestamp(value: Optional[str]) -> str:
+    """Coerce API dates ('2026-01-12', ISO with offset) to the stream's ISO-Z format"""
+    if value:
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            if parsed.tzinfo is not None:
+                parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+            return parsed.isoformat() + "Z"
+        except ValueError:
+            pass
+    return datetime.utcnow().isoformat() + "Z"
+
+
+metrics.register("source_connectors", lambda: {name: connector.stats() for name, connector in _connectors.items()})
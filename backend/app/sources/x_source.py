@@ -1,75 +1,82 @@
-import json
 from pathlib import Path
-from datetime import datetime
+from typing import List, Optional, Tuple
+
+import httpx
+
 from app.settings import settings
-from app.utils import deduplicate_and_append, parse_timestamp
-from app import storage
 from app.company_dict import COMPANY_DICT
+from app.metrics import PullStats
+from app.sources.base import SourceConnector, normalize_timestamp, register_connector
 
-def pull_x_signals(keywords: list[str] = None, max_results: int = 20) -> int:
-    """
-    Fetch signals from X API or fallback to seed data.
-    Returns number of new events added.
-    """
-    if keywords is None:
-        keywords = settings.x_keywords
-        
-    # Auto-generate keywords from COMPANY_DICT
-    for company, data in COMPANY_DICT.items():
-        # Add aliases
-        for alias in data.get("aliases", []):
-            if alias not in keywords:
-                keywords.append(alias)
-                
-    # Add general tech keywords
-    general_keywords = ["semiconductor", "AI infrastructure", "chip shortage", "foundry capacity"]
-    for kw in general_keywords:
-        if kw not in keywords:
-            keywords.append(kw)
-            
-    # Deduplicate
-    keywords = list(set(keywords))
 
-    events = []
-    
-    # Get last checkpoint
-    last_checkpoint = storage.get_checkpoint("X")
-    
-    # Live API Logic (Stub)
-    if settings.x_enabled and settings.x_bearer_token:
-        print("X API enabled but implementation is stubbed. Using fallback.")
-        pass
+class XConnector(SourceConnector):
+    """X recent search (API v2), following next_token pagination"""
 
-    # Fallback Logic
+    name = "X"
     seed_path = Path("data/x_seed.jsonl")
-    if seed_path.exists():
-        with open(seed_path, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.strip():
-                    try:
-                        event = json.loads(line)
-                        
-                        # Checkpoint filtering
-                        event_ts = event.get("timestamp")
-                        if last_checkpoint and event_ts and event_ts <= last_checkpoint:
-                            continue
-                            
-                        # NOTE: We do NOT update timestamp to now anymore.
-                        # We preserve original timestamp.
-                        # event["timestamp"] = datetime.utcnow().isoformat() + "Z"
-                        
-                        events.append(event)
-                    except json.JSONDecodeError:
-                        continue
-    
-    # Write to stream
-    stream_path = Path(settings.data_stream_path)
-    added_count = deduplicate_and_append(events, stream_path)
-    
-    # Update checkpoint if we added new events
-    if events:
-        # Find newest timestamp
-        newest_ts = max(events, key=lambda x: x.get("timestamp", ""))["timestamp"]
-        storage.update_checkpoint("X", newest_ts)
-        
-    return added_count
+    paged = True
+
+    def live_enabled(self) -> bool:
+        return settings.x_enabled and bool(settings.x_bearer_token)
+
+    def build_queries(self, queries: Optional[List[str]] = None) -> List[str]:
+        # Copy so the configured list isn't extended on every pull
+        keywords = list(queries if queries is not None else settings.x_keywords)
+
+        # Auto-generate keywords from COMPANY_DICT
+        for company, data in COMPANY_DICT.items():
+            # Add aliases
+            for alias in data.get("aliases", []):
+                if alias not in keywords:
+                    keywords.append(alias)
+
+        # Add general tech keywords
+        general_keywords = ["semiconductor", "AI infrastructure", "chip shortage", "foundry capacity"]
+        for kw in general_keywords:
+            if kw not in keywords:
+                keywords.append(kw)
+        return keywords
+
+    async def fetch_page(self, client: httpx.AsyncClient, query: str, cursor: Optional[str], page_size: int) -> Tuple[List[dict], Optional[str]]:
+        params = {
+            "query": f'"{query}" -is:retweet' if " " in query else f"{query} -is:retweet",
+            # The API accepts 10-100 results per page
+            "max_results": min(100, max(10, page_size)),
+            "tweet.fields": "created_at,author_id",
+            "expansions": "author_id",
+            "user.fields": "username",
+        }
+        if cursor:
+            params["pagination_token"] = cursor
+        response = await client.get(
+            f"{settings.x_base_url.rstrip('/')}/tweets/search/recent",
+            headers={"Authorization": f"Bearer {settings.x_bearer_token}"},
+            params=params
+        )
+        response.raise_for_status()
+        payload = response.json()
+
+        usernames = {user["id"]: user.get("username", "i") for user in payload.get("includes", {}).get("users", [])}
+        events = []
+        for tweet in payload.get("data", []):
+            text = tweet.get("text", "")
+            username = usernames.get(tweet.get("author_id"), "i")
+            events.append({
+                "title": text.split("\n", 1)[0][:120],
+                "content": text,
+                "timestamp": normalize_timestamp(tweet.get("created_at")),
+                "source": self.name,
+                "url": f"https://x.com/{username}/status/{tweet['id']}",
+            })
+        return events, payload.get("meta", {}).get("next_token")
+
+
+x_connector = register_connector(XConnector(settings.x_rate_limit_per_second))
+
+
+def pull_x_signals(keywords: list[str] = None, max_results: int = 20, stats: Optional[PullStats] = None) -> int:
+    """
+    Fetch signals from X API or fallback to seed data.
+    Returns number of new events added; fetch counts go into `stats` if given.
+    """
+    return x_connector.pull(keywords, max_results, stats)
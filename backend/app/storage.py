@@ -4,57 +4,265 @@ Handles SQLite database connections, deduplication persistence, and source check
 """
 import sqlite3
 import logging
+import queue
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Iterable, Iterator, Optional
 import threading
+import time
+from dataclasses import dataclass
 
 from app.settings import settings
+from app.bloom import RotatingBloomFilter
+from app import metrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Thread-local storage for SQLite connections
-local_storage = threading.local()
+# IDs per IN (...) lookup; stays below SQLite's default 999 host parameter limit
+DEDUP_CHUNK_SIZE = 500
 
-def get_db_connection():
-    """Get thread-local database connection"""
-    if not hasattr(local_storage, "connection"):
-        db_path = Path(settings.db_path)
+@dataclass
+class SourceCheckpoint:
+    """
+    Resume position of a source feed: the (file_id, byte_offset) it has
+    consumed up to, plus the newest event timestamp seen as a secondary
+    watermark for when the file is replaced or truncated.
+    """
+    source: str
+    last_checkpoint: Optional[str] = None
+    file_id: Optional[str] = None
+    byte_offset: Optional[int] = None
+
+# Membership filter in front of seen_events; None until rebuilt by init_db
+seen_filter: Optional[RotatingBloomFilter] = None
+
+def _epoch(iso_ts: str) -> float:
+    """Parse a stored first_seen_ts (naive UTC ISO, optional Z) to epoch seconds"""
+    try:
+        parsed = datetime.fromisoformat(iso_ts.rstrip("Z"))
+    except (ValueError, AttributeError):
+        parsed = datetime.utcnow()
+    return (parsed - datetime(1970, 1, 1)).total_seconds()
+
+def rebuild_seen_filter() -> None:
+    """Rebuild the dedup membership filter from the seen_events table"""
+    global seen_filter
+    if not (settings.dedup_enabled and settings.dedup_filter_enabled):
+        seen_filter = None
+        return
+
+    new_filter = RotatingBloomFilter(
+        fp_rate=settings.dedup_filter_fp_rate,
+        max_bytes=settings.dedup_filter_max_bytes,
+        partition_hours=settings.dedup_filter_partition_hours,
+        retention_hours=settings.dedup_retention_days * 24
+    )
+    try:
+        with db_connection() as conn:
+            cursor = conn.execute("SELECT event_id, first_seen_ts FROM seen_events")
+            for row in cursor:
+                new_filter.add(row["event_id"], _epoch(row["first_seen_ts"]))
+        seen_filter = new_filter
+        logger.info(f"Dedup filter rebuilt: {new_filter.stats()}")
+    except Exception as e:
+        # Without a complete filter every lookup has to go to the DB
+        seen_filter = None
+        logger.error(f"Failed to rebuild dedup filter: {e}")
+
+class ConnectionPool:
+    """
+    Bounded pool of tuned SQLite connections shared by request handlers and
+    the scheduler thread. Connections run in WAL mode so readers never block
+    behind a writer, and keep a per-connection prepared statement cache.
+    """
+
+    def __init__(self, db_path: str, max_size: int, acquire_timeout: float):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self) -> sqlite3.Connection:
+        db_path = Path(self.db_path)
         db_path.parent.mkdir(parents=True, exist_ok=True)
-        local_storage.connection = sqlite3.connect(str(db_path), check_same_thread=False)
-        local_storage.connection.row_factory = sqlite3.Row
-    return local_storage.connection
+        conn = sqlite3.connect(
+            str(db_path),
+            check_same_thread=False,
+            timeout=settings.db_busy_timeout_ms / 1000,
+            cached_statements=settings.db_statement_cache_size
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA mmap_size={settings.db_mmap_size}")
+        # Negative cache_size is in KiB
+        conn.execute(f"PRAGMA cache_size=-{settings.db_cache_size_kb}")
+        conn.execute(f"PRAGMA busy_timeout={settings.db_busy_timeout_ms}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """Take an idle connection, opening a new one while under max_size"""
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.max_size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No SQLite connection available within {self.acquire_timeout}s")
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """Return a connection to the pool, discarding any open transaction"""
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put(conn)
+
+    def close(self) -> None:
+        """Close all idle connections; busy ones are closed when released"""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    def stats(self) -> dict:
+        return {
+            "size": self._created,
+            "idle": self._idle.qsize(),
+            "max_size": self.max_size,
+        }
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """Get (or lazily create) the process-wide connection pool"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool._closed:
+            _pool = ConnectionPool(
+                settings.db_path,
+                max_size=settings.db_pool_size,
+                acquire_timeout=settings.db_pool_timeout
+            )
+        return _pool
+
+@contextmanager
+def db_connection() -> Iterator[sqlite3.Connection]:
+    """Borrow a pooled database connection for the duration of a block"""
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+def close_pool() -> None:
+    """Close pooled connections (called on application shutdown)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+    logger.info("SQLite connection pool closed")
+
+def storage_stats() -> dict:
+    """Connection pool and dedup filter stats for /api/metrics"""
+    return {
+        "pool": _pool.stats() if _pool is not None else None,
+        "seen_filter": seen_filter.stats() if seen_filter is not None else None,
+    }
+
+metrics.register("storage", storage_stats)
 
 def init_db():
     """Initialize the SQLite database with required tables"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Table for seen events (deduplication)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS seen_events (
-                event_id TEXT PRIMARY KEY,
-                first_seen_ts TEXT,
-                source TEXT,
-                title TEXT
-            )
-        """)
-        
-        # Table for source checkpoints
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS source_checkpoints (
-                source TEXT PRIMARY KEY,
-                last_checkpoint TEXT,
-                last_pull_ts TEXT
-            )
-        """)
-        
-        conn.commit()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Table for seen events (deduplication)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS seen_events (
+                    event_id TEXT PRIMARY KEY,
+                    first_seen_ts TEXT,
+                    source TEXT,
+                    title TEXT
+                )
+            """)
+            
+            # Lets cleanup_old_events range-scan instead of scanning the table
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_seen_events_first_seen_ts
+                ON seen_events(first_seen_ts)
+            """)
+            
+            # Table for source checkpoints
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS source_checkpoints (
+                    source TEXT PRIMARY KEY,
+                    last_checkpoint TEXT,
+                    last_pull_ts TEXT,
+                    file_id TEXT,
+                    byte_offset INTEGER
+                )
+            """)
+            
+            # Content-addressed cache of validated Gemini reports
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS insight_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    model TEXT,
+                    report TEXT,
+                    created_ts REAL,
+                    last_access_ts REAL
+                )
+            """)
+            
+            # LRU eviction scans oldest-accessed first
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_insight_cache_last_access_ts
+                ON insight_cache(last_access_ts)
+            """)
+            
+            # Databases created before byte-offset checkpoints lack these columns
+            columns = {row["name"] for row in cursor.execute("PRAGMA table_info(source_checkpoints)")}
+            if "file_id" not in columns:
+                cursor.execute("ALTER TABLE source_checkpoints ADD COLUMN file_id TEXT")
+            if "byte_offset" not in columns:
+                cursor.execute("ALTER TABLE source_checkpoints ADD COLUMN byte_offset INTEGER")
+            
+            conn.commit()
         logger.info(f"Database initialized at {settings.db_path}")
         
+        rebuild_seen_filter()
+        
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
         # Don't raise, just log - we'll handle connection errors gracefully in other functions
@@ -64,11 +272,14 @@ def is_duplicate(event_id: str) -> bool:
     if not settings.dedup_enabled:
         return False
         
+    # Definite miss: no need to touch SQLite
+    if seen_filter is not None and not seen_filter.might_contain(event_id):
+        return False
+        
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1 FROM seen_events WHERE event_id = ?", (event_id,))
-        return cursor.fetchone() is not None
+        with db_connection() as conn:
+            cursor = conn.execute("SELECT 1 FROM seen_events WHERE event_id = ?", (event_id,))
+            return cursor.fetchone() is not None
     except Exception as e:
         logger.error(f"Error checking duplicate: {e}")
         return False
@@ -79,27 +290,167 @@ def mark_seen(event_id: str, source: str, title: str) -> None:
         return
         
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
         now = datetime.utcnow().isoformat() + "Z"
-        cursor.execute(
-            "INSERT OR IGNORE INTO seen_events (event_id, first_seen_ts, source, title) VALUES (?, ?, ?, ?)",
-            (event_id, now, source, title)
-        )
-        conn.commit()
+        with db_connection() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO seen_events (event_id, first_seen_ts, source, title) VALUES (?, ?, ?, ?)",
+                (event_id, now, source, title)
+            )
+            # Before commit, so a reader checking the filter after the row
+            # becomes visible can't get a false "definitely new"
+            if seen_filter is not None:
+                seen_filter.add(event_id, _epoch(now))
+            conn.commit()
     except Exception as e:
         logger.error(f"Error marking event as seen: {e}")
 
+def mark_seen_batch(events: list[tuple[str, str, str]], checkpoint: Optional[SourceCheckpoint] = None) -> set[str]:
+    """
+    Bulk dedup: mark a batch of (event_id, source, title) rows as seen and
+    return the event_ids that were not seen before.
+
+    Existing IDs are looked up with one IN (...) query per chunk, new rows are
+    written with a single executemany, and the whole batch runs in one
+    IMMEDIATE transaction so it costs one commit and concurrent writers can't
+    both claim the same event: an ID is reported new only if its row was
+    actually inserted, and the Bloom filter learns it before the commit
+    releases the lock. A source checkpoint passed along is written in
+    the same transaction, so the feed position never gets ahead of (or behind)
+    the events it covers.
+    """
+    # Collapse repeats inside the batch, keeping the first occurrence
+    rows = {}
+    for event_id, source, title in events:
+        rows.setdefault(event_id, (event_id, source, title))
+
+    if not settings.dedup_enabled or not rows:
+        if checkpoint is not None:
+            save_checkpoint(checkpoint)
+        return set(rows)
+
+    try:
+        with db_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Only IDs the filter can't rule out need a DB lookup
+            event_ids = list(rows)
+            if seen_filter is not None:
+                event_ids = [event_id for event_id in event_ids if seen_filter.might_contain(event_id)]
+            seen = set()
+            for i in range(0, len(event_ids), DEDUP_CHUNK_SIZE):
+                chunk = event_ids[i:i + DEDUP_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                cursor = conn.execute(
+                    f"SELECT event_id FROM seen_events WHERE event_id IN ({placeholders})",
+                    chunk
+                )
+                seen.update(row["event_id"] for row in cursor)
+
+            now = datetime.utcnow().isoformat() + "Z"
+            new_ids = set()
+            for event_id, source, title in rows.values():
+                if event_id in seen:
+                    continue
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO seen_events (event_id, first_seen_ts, source, title) VALUES (?, ?, ?, ?)",
+                    (event_id, now, source, title)
+                )
+                # rowcount 0: the row exists after all, so the event isn't new
+                if cursor.rowcount:
+                    new_ids.add(event_id)
+            if checkpoint is not None and settings.checkpoint_enabled:
+                _upsert_checkpoint(conn, checkpoint, now)
+            # Filter first: once the commit releases the lock, other writers
+            # must not be able to rule these IDs out without a DB lookup
+            if seen_filter is not None:
+                seen_filter.add_many(new_ids, _epoch(now))
+            conn.commit()
+        return new_ids
+    except Exception as e:
+        # db_connection rolls back the open transaction on release
+        logger.error(f"Error marking event batch as seen: {e}")
+        # Same fail-open behaviour as is_duplicate: never drop events on DB errors
+        return set(rows)
+
+def unmark_seen(event_ids: Iterable[str]) -> None:
+    """
+    Forget events marked seen whose write then failed, so a retry can
+    deliver them. Their Bloom filter bits stay set; that only costs the
+    retry a DB lookup.
+    """
+    event_ids = list(event_ids)
+    if not settings.dedup_enabled or not event_ids:
+        return
+        
+    try:
+        with db_connection() as conn:
+            for i in range(0, len(event_ids), DEDUP_CHUNK_SIZE):
+                chunk = event_ids[i:i + DEDUP_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                conn.execute(f"DELETE FROM seen_events WHERE event_id IN ({placeholders})", chunk)
+            conn.commit()
+    except Exception as e:
+        logger.error(f"Error unmarking {len(event_ids)} events: {e}")
+
+def _upsert_checkpoint(conn: sqlite3.Connection, checkpoint: SourceCheckpoint, now: str) -> None:
+    conn.execute(
+        """
+        INSERT INTO source_checkpoints (source, last_checkpoint, last_pull_ts, file_id, byte_offset)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(source) DO UPDATE SET 
+            last_checkpoint = excluded.last_checkpoint,
+            last_pull_ts = excluded.last_pull_ts,
+            file_id = excluded.file_id,
+            byte_offset = excluded.byte_offset
+        """,
+        (checkpoint.source, checkpoint.last_checkpoint, now, checkpoint.file_id, checkpoint.byte_offset)
+    )
+
+def load_checkpoint(source: str) -> Optional[SourceCheckpoint]:
+    """Get the full checkpoint (watermark and feed position) for a source"""
+    if not settings.checkpoint_enabled:
+        return None
+        
+    try:
+        with db_connection() as conn:
+            cursor = conn.execute(
+                "SELECT last_checkpoint, file_id, byte_offset FROM source_checkpoints WHERE source = ?",
+                (source,)
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        return SourceCheckpoint(
+            source=source,
+            last_checkpoint=row["last_checkpoint"],
+            file_id=row["file_id"],
+            byte_offset=row["byte_offset"]
+        )
+    except Exception as e:
+        logger.error(f"Error loading checkpoint for {source}: {e}")
+        return None
+
+def save_checkpoint(checkpoint: SourceCheckpoint) -> None:
+    """Persist a full checkpoint on its own (no dedup rows to go with it)"""
+    if not settings.checkpoint_enabled:
+        return
+        
+    try:
+        now = datetime.utcnow().isoformat() + "Z"
+        with db_connection() as conn:
+            _upsert_checkpoint(conn, checkpoint, now)
+            conn.commit()
+    except Exception as e:
+        logger.error(f"Error saving checkpoint for {checkpoint.source}: {e}")
+
 def get_checkpoint(source: str) -> Optional[str]:
     """Get the last checkpoint (timestamp or ID) for a source"""
     if not settings.checkpoint_enabled:
         return None
         
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT last_checkpoint FROM source_checkpoints WHERE source = ?", (source,))
-        row = cursor.fetchone()
+        with db_connection() as conn:
+            cursor = conn.execute("SELECT last_checkpoint FROM source_checkpoints WHERE source = ?", (source,))
+            row = cursor.fetchone()
         return row["last_checkpoint"] if row else None
     except Exception as e:
         logger.error(f"Error getting checkpoint for {source}: {e}")
@@ -111,33 +462,99 @@ def update_checkpoint(source: str, checkpoint: str) -> None:
         return
         
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
         now = datetime.utcnow().isoformat() + "Z"
-        cursor.execute(
-            """
-            INSERT INTO source_checkpoints (source, last_checkpoint, last_pull_ts) 
-            VALUES (?, ?, ?)
-            ON CONFLICT(source) DO UPDATE SET 
-                last_checkpoint = excluded.last_checkpoint,
-                last_pull_ts = excluded.last_pull_ts
-            """,
-            (source, checkpoint, now)
-        )
-        conn.commit()
+        with db_connection() as conn:
+            conn.execute(
+                """
+                INSERT INTO source_checkpoints (source, last_checkpoint, last_pull_ts) 
+                VALUES (?, ?, ?)
+                ON CONFLICT(source) DO UPDATE SET 
+                    last_checkpoint = excluded.last_checkpoint,
+                    last_pull_ts = excluded.last_pull_ts
+                """,
+                (source, checkpoint, now)
+            )
+            conn.commit()
     except Exception as e:
         logger.error(f"Error updating checkpoint for {source}: {e}")
 
-def cleanup_old_events(days: int = 30) -> int:
+def get_insight(cache_key: str, ttl_seconds: float) -> Optional[str]:
+    """Return a cached report younger than ttl_seconds and mark it recently used"""
+    try:
+        now = time.time()
+        with db_connection() as conn:
+            row = conn.execute(
+                "SELECT report FROM insight_cache WHERE cache_key = ? AND created_ts >= ?",
+                (cache_key, now - ttl_seconds)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE insight_cache SET last_access_ts = ? WHERE cache_key = ?", (now, cache_key))
+            conn.commit()
+        return row["report"]
+    except Exception as e:
+        logger.error(f"Error reading insight cache: {e}")
+        return None
+
+def put_insight(cache_key: str, model: str, report: str, ttl_seconds: float, max_entries: int) -> int:
+    """
+    Store a report, then drop expired entries and the least recently used ones
+    beyond max_entries in the same transaction. Returns the number evicted.
+    """
+    try:
+        now = time.time()
+        with db_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                """
+                INSERT INTO insight_cache (cache_key, model, report, created_ts, last_access_ts)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(cache_key) DO UPDATE SET
+                    model = excluded.model,
+                    report = excluded.report,
+                    created_ts = excluded.created_ts,
+                    last_access_ts = excluded.last_access_ts
+                """,
+                (cache_key, model, report, now, now)
+            )
+            evicted = conn.execute("DELETE FROM insight_cache WHERE created_ts < ?", (now - ttl_seconds,)).rowcount
+            evicted += conn.execute(
+                """
+                DELETE FROM insight_cache WHERE cache_key IN (
+                    SELECT cache_key FROM insight_cache
+                    ORDER BY last_access_ts DESC
+                    LIMIT -1 OFFSET ?
+                )
+                """,
+                (max(1, max_entries),)
+            ).rowcount
+            conn.commit()
+        return evicted
+    except Exception as e:
+        logger.error(f"Error writing insight cache: {e}")
+        return 0
+
+def insight_cache_size() -> int:
+    """Number of cached reports (including expired ones not yet evicted)"""
+    try:
+        with db_connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM insight_cache").fetchone()[0]
+    except Exception as e:
+        logger.error(f"Error counting insight cache: {e}")
+        return 0
+
+def cleanup_old_events(days: int = settings.dedup_retention_days) -> int:
     """Remove events older than N days from seen_events table"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        with db_connection() as conn:
+            cursor = conn.execute("DELETE FROM seen_events WHERE first_seen_ts < ?", (cutoff.isoformat(),))
+            deleted_count = cursor.rowcount
+            conn.commit()
         
-        cutoff_date = (datetime.utcnow() - timedelta(days=days)).isoformat()
-        cursor.execute("DELETE FROM seen_events WHERE first_seen_ts < ?", (cutoff_date,))
-        deleted_count = cursor.rowcount
-        conn.commit()
+        # Rotate out filter partitions whose rows are now all gone
+        if seen_filter is not None:
+            seen_filter.drop_before(_epoch(cutoff.isoformat()))
         
         if deleted_count > 0:
             logger.info(f"Cleaned up {deleted_count} old events from dedup store")
@@ -0,0 +1,207 @@
+"""
+Single-writer append queue for stream logs.
+Every producer (/inject, /bootstrap, source pulls) hands events to one writer
+thread per log, which coalesces whatever is queued into a single buffered
+append (group commit): one segment write, one optional fsync and one
+manifest update per batch, so the stream generation bumps once per batch and
+lines from concurrent producers can never interleave.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from app.settings import settings
+from app.segments import get_stream_log
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+# Called as listener(base_path, events_written) after each committed batch
+WriteListener = Callable[[Path, int], None]
+_listeners: List[WriteListener] = []
+
+
+def add_write_listener(listener: WriteListener) -> None:
+    """Register a callback notified once per committed batch (e.g. cache refresh)"""
+    _listeners.append(listener)
+
+
+class StreamWriter:
+    """Queue plus dedicated thread that group-commits appends to one SegmentedLog"""
+
+    def __init__(self, base_path: Path, batch_max_events: int, linger_ms: float, fsync: bool):
+        self.log = get_stream_log(base_path)
+        self.batch_max_events = max(1, batch_max_events)
+        self.linger_seconds = max(0.0, linger_ms) / 1000
+        self.fsync = fsync
+        self._pending: Deque[Tuple[List[dict], Future]] = deque()
+        self._pending_events = 0
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        # Stats
+        self.batches = 0
+        self.events_written = 0
+        self.bytes_written = 0
+        self.failed_batches = 0
+        self.max_batch_events = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Events submitted but not yet written"""
+        return self._pending_events
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(
+                target=self._run,
+                name=f"stream-writer-{self.log.base_path.stem}",
+                daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 10) -> None:
+        """Stop accepting events, drain the queue and join the writer thread"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, events: List[dict]) -> Future:
+        """Queue events for the next batch; the future resolves to the number written"""
+        future: Future = Future()
+        if not events:
+            future.set_result(0)
+            return future
+        with self._cond:
+            if self._stopping:
+                raise RuntimeError("Stream writer is stopped")
+            self._pending.append((list(events), future))
+            self._pending_events += len(events)
+            self._cond.notify()
+        if self._thread is None:
+            self.start()
+        return future
+
+    def write(self, events: List[dict], timeout: Optional[float] = None) -> int:
+        """Queue events and block until their batch is committed"""
+        return self.submit(events).result(timeout)
+
+    async def write_async(self, events: List[dict]) -> int:
+        """Queue events and await their batch without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(events))
+
+    def _take_batch(self) -> List[Tuple[List[dict], Future]]:
+        """Wait for work, optionally linger for more, then take up to batch_max_events"""
+        with self._cond:
+            while not self._pending and not self._stopping:
+                self._cond.wait()
+            if self.linger_seconds and not self._stopping:
+                deadline = time.monotonic() + self.linger_seconds
+                while self._pending_events < self.batch_max_events and not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            batch = []
+            taken = 0
+            # Always take at least one request, even if it alone exceeds the cap
+            while self._pending and (not batch or taken + len(self._pending[0][0]) <= self.batch_max_events):
+                events, future = self._pending.popleft()
+                batch.append((events, future))
+                taken += len(events)
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                # Stopping and fully drained
+                return
+            events = [event for chunk, _ in batch for event in chunk]
+            try:
+                written_bytes = self.log.append(events, fsync=self.fsync)
+            except Exception as e:
+                logger.error(f"Stream writer failed to append {len(events)} events to {self.log.base_path}: {e}")
+                self.failed_batches += 1
+                for _, future in batch:
+                    future.set_exception(e)
+                written_bytes = None
+            finally:
+                with self._cond:
+                    self._pending_events -= len(events)
+
+            if written_bytes is None:
+                continue
+            self.batches += 1
+            self.events_written += len(events)
+            self.bytes_written += written_bytes
+            self.max_batch_events = max(self.max_batch_events, len(events))
+            for chunk, future in batch:
+                future.set_result(len(chunk))
+            for listener in list(_listeners):
+                try:
+                    listener(self.log.base_path, len(events))
+                except Exception as e:
+                    logger.error(f"Stream write listener failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._pending_events,
+            "batches": self.batches,
+            "events_written": self.events_written,
+            "bytes_written": self.bytes_written,
+            "failed_batches": self.failed_batches,
+            "avg_batch_events": round(self.events_written / self.batches, 2) if self.batches else 0,
+            "max_batch_events": self.max_batch_events,
+            "fsync": self.fsync,
+        }
+
+
+_writers: Dict[Path, StreamWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_stream_writer(base_path: Path) -> StreamWriter:
+    """Get (and start) the single writer for a logical stream path"""
+    key = Path(base_path).resolve()
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = StreamWriter(
+                key,
+                batch_max_events=settings.stream_writer_batch_max_events,
+                linger_ms=settings.stream_writer_linger_ms,
+                fsync=settings.stream_writer_fsync
+            )
+            writer.start()
+            _writers[key] = writer
+        return writer
+
+
+def stop_stream_writers() -> None:
+    """Drain and stop all writers (called on application shutdown)"""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.stop()
+    logger.info("Stream writers stopped")
+
+
+def stream_writer_stats() -> dict:
+    with _writers_lock:
+        return {str(path): writer.stats() for path, writer in _writers.items()}
+
+
+metrics.register("stream_writers", stream_writer_stats)
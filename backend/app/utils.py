@@ -1,11 +1,13 @@
 """
 Utility functions for SiliconPulse backend
 """
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Any, Optional
 import json
 import hashlib
+import os
 import re
+import time
 from pathlib import Path
 import logging
 
@@ -80,6 +82,15 @@ def parse_timestamp(ts: str) -> datetime:
         # Fallback to now if invalid
         return datetime.utcnow()
 
+def timestamp_to_epoch(ts: Optional[str]) -> float:
+    """Convert an ISO timestamp to UTC epoch seconds (now if missing or invalid)"""
+    if not ts:
+        return time.time()
+    event_time = parse_timestamp(ts)
+    if event_time.tzinfo is not None:
+        event_time = event_time.astimezone(timezone.utc).replace(tzinfo=None)
+    return (event_time - datetime(1970, 1, 1)).total_seconds()
+
 def is_fresh(timestamp: str, hours: int = 12) -> bool:
     """Check if event is within freshness window"""
     if not timestamp:
@@ -99,8 +110,8 @@ def compute_recency_boost(timestamp: str, max_boost: int = 50) -> int:
     if not timestamp:
         return 0
         
-    event_time = parse_timestamp(timestamp)
-    age_hours = (datetime.utcnow() - event_time).total_seconds() / 3600
+    # Epoch arithmetic so offset-aware timestamps work too
+    age_hours = (time.time() - timestamp_to_epoch(timestamp)) / 3600
     
     if age_hours < 0: # Future timestamp
         return max_boost
@@ -112,88 +123,129 @@ def compute_recency_boost(timestamp: str, max_boost: int = 50) -> int:
     boost = max_boost * (1 - (age_hours / 24))
     return int(max(0, boost))
 
-def deduplicate_and_append(new_events: list[dict], file_path: Path) -> int:
+def deduplicate_events(new_events: list[dict], checkpoint: Optional["storage.SourceCheckpoint"] = None) -> list[tuple[str, dict, bool]]:
+    """
+    Mark a batch of events as seen in the SQLite store with one bulk lookup
+    and one commit. Returns (event_id, event, is_new) for every input event,
+    in order; only the first copy of an ID repeated within the batch is new.
+    A source checkpoint, if given, is committed in the same transaction.
+    """
+    keyed_events = [(compute_event_id(event), event) for event in new_events]
+
+    # Check and mark the whole batch as seen in a single transaction
+    new_ids = storage.mark_seen_batch([
+        (event_id, event.get('source', 'unknown'), event.get('title', ''))
+        for event_id, event in keyed_events
+    ], checkpoint=checkpoint)
+
+    results = []
+    for event_id, event in keyed_events:
+        is_new = event_id in new_ids
+        new_ids.discard(event_id)
+        results.append((event_id, event, is_new))
+    return results
+
+def deduplicate_and_append(new_events: list[dict], file_path: Path, checkpoint: Optional["storage.SourceCheckpoint"] = None) -> int:
     """
     Append new events to the file only if they don't already exist in SQLite store.
+    The whole batch is deduplicated with one bulk lookup and one commit.
+    A source checkpoint, if given, is saved only once the events are written;
+    if the write fails the new IDs are un-marked so the next pull retries them.
     Returns the number of new events added.
     """
-    if not new_events:
-        return 0
-        
-    added_count = 0
-    events_to_write = []
-    
-    for event in new_events:
-        event_id = compute_event_id(event)
-        
-        # Check if seen in DB
-        if not storage.is_duplicate(event_id):
-            # Mark as seen
-            storage.mark_seen(event_id, event.get('source', 'unknown'), event.get('title', ''))
-            events_to_write.append(event)
-            added_count += 1
-    
+    keyed = deduplicate_events(new_events)
+    events_to_write = [event for _, event, is_new in keyed if is_new]
+
     if events_to_write:
-        # Ensure parent dir exists
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(file_path, "a", encoding="utf-8") as f:
-            for event in events_to_write:
-                json.dump(event, f, ensure_ascii=False)
-                f.write("\n")
-                
+        # Group-committed by the stream's single writer thread
+        from app.stream_writer import get_stream_writer
+        try:
+            get_stream_writer(file_path).write(events_to_write)
+        except BaseException:
+            storage.unmark_seen([event_id for event_id, _, is_new in keyed if is_new])
+            raise
 
+    if checkpoint is not None:
+        storage.save_checkpoint(checkpoint)
 
-def safe_read_jsonl(path: Path, limit: int = 200, freshness_hours: Optional[int] = None) -> list[dict]:
+    return len(events_to_write)
+
+
+# Block size used when scanning JSONL files backwards from EOF
+TAIL_BLOCK_SIZE = 64 * 1024
+
+def iter_lines_reverse(path: Path, block_size: int = TAIL_BLOCK_SIZE, end: Optional[int] = None, start: int = 0):
     """
-    Safely read JSONL file, ignoring errors and returning valid events.
-    Optionally filters by freshness.
+    Yield raw lines of a file newest-first by seeking backwards from EOF
+    (or from `end`) in fixed-size blocks, stopping at `start` (which must be
+    a line boundary). Only the blocks actually consumed are read, so the
+    cost depends on how far back the caller iterates, not on the file size.
     """
+    with open(path, "rb") as f:
+        if end is None:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+        position = end
+        remainder = b""
+        while position > start:
+            read_size = min(block_size, position - start)
+            position -= read_size
+            f.seek(position)
+            lines = (f.read(read_size) + remainder).split(b"\n")
+            # First piece may be the tail of a line that started in an earlier block
+            remainder = lines[0]
+            for line in reversed(lines[1:]):
+                yield line
+        if remainder:
+            yield remainder
+
+def safe_read_jsonl(
+    path: Path,
+    limit: int = 200,
+    freshness_hours: Optional[int] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None
+) -> list[dict]:
+    """
+    Safely read the newest events from a stream, ignoring invalid lines.
+    Optionally restricted to the last `freshness_hours` or an explicit
+    ISO `since`/`until` range. Segments outside the window are never opened
+    and each segment's sidecar index skips straight to the window start.
+    Returns events newest-first.
+    """
+    from app.segments import resolve_stream_log
+
     events = []
     try:
-        if not path.exists():
-            return []
-            
-        # If filtering by freshness, we might need to read more lines to find enough fresh ones
-        # So we read more if freshness filter is active
-        read_limit = limit * 5 if freshness_hours else limit
+        log = resolve_stream_log(path)
+        since_epoch = timestamp_to_epoch(since) if since else None
+        if freshness_hours:
+            fresh_cutoff = time.time() - freshness_hours * 3600
+            since_epoch = max(since_epoch or fresh_cutoff, fresh_cutoff)
+        until_epoch = timestamp_to_epoch(until) if until else None
+
+        for raw_line in log.iter_lines_reverse(since=since_epoch, until=until_epoch):
+            line = raw_line.decode("utf-8", errors="ignore").strip()
+            if not line:
+                continue
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                # Partially written or corrupt line
+                continue
+            if isinstance(event, dict):
+                # The index only bounds where reading starts; check each event
+                if since_epoch is not None or until_epoch is not None:
+                    event_epoch = timestamp_to_epoch(event.get("timestamp"))
+                    if since_epoch is not None and event_epoch < since_epoch:
+                        continue
+                    if until_epoch is not None and event_epoch > until_epoch:
+                        continue
+
+                events.append(event)
+                if len(events) >= limit:
+                    break
 
-        # PATHWAY INTEGRATION: Check if we should read from pathway output instead
-        from app.settings import settings
-        if settings.use_pathway:
-            pathway_path = settings.resolved_pathway_path
-            if pathway_path.exists() and pathway_path.stat().st_size > 0:
-                path = pathway_path
-                # logger.info(f"Reading from Pathway output: {path}")
-            
-        with open(path, "r", encoding="utf-8", errors="ignore") as f:
-            all_lines = f.readlines()
-            # Take last 'read_limit' lines
-            recent_lines = all_lines[-read_limit:] if len(all_lines) > read_limit else all_lines
-            
-            # Process in reverse to get newest first, then reverse back
-            for line in reversed(recent_lines):
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    event = json.loads(line)
-                    if isinstance(event, dict):
-                        # Check freshness if required
-                        # if freshness_hours is not None:
-                        #    if not is_fresh(event.get('timestamp'), freshness_hours):
-                        #        continue
-                                
-                        events.append(event)
-                        if len(events) >= limit:
-                            break
-                except:
-                    continue
-        
-        # Reverse back to chronological order (oldest to newest) if that's what caller expects
-        # But usually for display we want newest first. 
-        # The original function returned chronological (append order).
-        # Let's keep original behavior: return chronological order.
         return events
     except Exception as e:
         logger.error(f"Error reading JSONL: {e}")
@@ -5,48 +5,20 @@ import os
 from pathlib import Path
 from datetime import datetime
 
+from app.settings import settings
+from app.keyword_matcher import COMPANY, EVENT, get_matcher
+from app.segments import LogFollower, get_stream_log
+
 # Project Root Discovery
 PROJECT_ROOT = Path(__file__).resolve().parent
 DATA_DIR = PROJECT_ROOT / "data"
-INPUT_FILE = DATA_DIR / "stream.jsonl"
-OUTPUT_FILE = DATA_DIR / "pathway_out.jsonl"
+# Logical stream paths; data lives in <name>.segments/ (see app/segments.py)
+INPUT_FILE = settings.resolved_data_path
+OUTPUT_FILE = settings.resolved_pathway_path
 
 # Ensure data directory exists
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-# Keyword dictionary for company tagging
-COMPANY_KEYWORDS = {
-    "nvidia": "NVIDIA",
-    "tsmc": "TSMC",
-    "intel": "Intel",
-    "apple": "Apple",
-    "amd": "AMD",
-    "asml": "ASML",
-    "samsung": "Samsung",
-    "google": "Google",
-    "meta": "Meta",
-    "microsoft": "Microsoft",
-    "arm": "ARM"
-}
-
-# Event type keywords
-EVENT_KEYWORDS = {
-    "launch": "product_launch",
-    "release": "product_launch",
-    "contract": "contract",
-    "deal": "contract",
-    "partnership": "contract",
-    "supply": "supply_chain",
-    "yield": "supply_chain",
-    "foundry": "supply_chain",
-    "fab": "supply_chain",
-    "acquisition": "m_and_a",
-    "merger": "m_and_a",
-    "earnings": "financial",
-    "revenue": "financial",
-    "profit": "financial"
-}
-
 def compute_event_id(title, content, url):
     """Compute a stable event ID for deduplication."""
     snippet = content[:200] if content else ""
@@ -58,22 +30,14 @@ def tag_company(title, content, existing_company):
     if existing_company and existing_company.lower() != "unknown":
         return existing_company
     
-    text = (title + " " + content).lower()
-    for kw, name in COMPANY_KEYWORDS.items():
-        if kw in text:
-            return name
-    return "Unknown"
+    return get_matcher().first(title + " " + content, COMPANY) or "Unknown"
 
 def tag_event_type(title, content, existing_type):
     """Tag event type based on keywords if missing."""
     if existing_type and existing_type.lower() != "unknown":
         return existing_type
     
-    text = (title + " " + content).lower()
-    for kw, etype in EVENT_KEYWORDS.items():
-        if kw in text:
-            return etype
-    return "general"
+    return get_matcher().first(title + " " + content, EVENT) or "general"
 
 def process_line(line):
     try:
@@ -97,40 +61,46 @@ def run_mock_pipeline():
     print(f"📂 Input: {INPUT_FILE}")
     print(f"📂 Output: {OUTPUT_FILE}")
     
+    input_log = get_stream_log(INPUT_FILE)
+    output_log = get_stream_log(OUTPUT_FILE)
     processed_ids = set()
     
-    # Initial pass to populate output and seen IDs
-    if INPUT_FILE.exists():
-        with open(INPUT_FILE, "r", encoding="utf-8") as f_in, \
-             open(OUTPUT_FILE, "w", encoding="utf-8") as f_out:
-            for line in f_in:
-                processed = process_line(line)
-                if processed and processed["event_id"] not in processed_ids:
-                    processed_ids.add(processed["event_id"])
-                    f_out.write(json.dumps(processed) + "\n")
+    # Rebuild the output from scratch, like the previous "w" mode rewrite
+    output_log.reset()
+    if OUTPUT_FILE.exists():
+        OUTPUT_FILE.unlink()
+    
+    # Only segments inside the retention window are opened
+    follower = LogFollower(input_log, window_hours=settings.stream_retention_hours)
+    last_maintenance = time.time()
     
     print("👀 Watching for new events...")
     
-    # Continuous watch
+    # Continuous watch: each poll parses only bytes appended since the last one
     try:
         while True:
-            if INPUT_FILE.exists():
-                with open(INPUT_FILE, "r", encoding="utf-8") as f:
-                    # We read the whole file to handle deduplication properly in this simple mock
-                    lines = f.readlines()
-                    
-                new_events = []
-                for line in lines:
-                    processed = process_line(line)
-                    if processed and processed["event_id"] not in processed_ids:
-                        processed_ids.add(processed["event_id"])
-                        new_events.append(processed)
-                
-                if new_events:
-                    print(f"✨ Processed {len(new_events)} new events")
-                    with open(OUTPUT_FILE, "a", encoding="utf-8") as f_out:
-                        for event in new_events:
-                            f_out.write(json.dumps(event) + "\n")
+            lines = follower.poll()
+            if lines is None:
+                # Input segments were rewritten (compaction); re-read them,
+                # processed_ids keeps the output free of duplicates
+                follower = LogFollower(input_log, window_hours=settings.stream_retention_hours)
+                lines = follower.poll() or []
+            
+            new_events = []
+            for line in lines:
+                processed = process_line(line)
+                if processed and processed["event_id"] not in processed_ids:
+                    processed_ids.add(processed["event_id"])
+                    new_events.append(processed)
+            
+            if new_events:
+                print(f"✨ Processed {len(new_events)} new events")
+                output_log.append(new_events)
+            
+            # This process is the only writer of the output log, so it maintains it
+            if time.time() - last_maintenance >= settings.stream_maintenance_minutes * 60:
+                output_log.maintain()
+                last_maintenance = time.time()
             
             time.sleep(2)
     except KeyboardInterrupt:
@@ -0,0 +1,158 @@
+"""
+Local stand-in for the Perplexity and X APIs.
+Serves the recorded payloads in data/*_seed.jsonl in the shape of the real
+endpoints (POST /chat/completions, GET /tweets/search/recent with
+next_token paging), so live ingestion can be exercised and load-tested
+without network access:
+
+    python mock_source_server.py --port 8787 --fresh
+
+    PERPLEXITY_ENABLED=True PERPLEXITY_API_KEY=test PERPLEXITY_BASE_URL=http://127.0.0.1:8787
+    X_ENABLED=True X_BEARER_TOKEN=test X_BASE_URL=http://127.0.0.1:8787
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+
+
+def load_records(path: Path) -> list:
+    records = []
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+    return records
+
+
+class MockSourceHandler(BaseHTTPRequestHandler):
+    perplexity_records: list = []
+    x_records: list = []
+    latency_ms: float = 0
+    fresh: bool = False
+    requests_served = 0
+    _count_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        # Keep load tests quiet; the summary thread reports throughput
+        pass
+
+    def _variant(self, record: dict) -> dict:
+        """With --fresh, make every served record a new event stamped now"""
+        record = dict(record)
+        if self.fresh:
+            suffix = uuid.uuid4().hex[:8]
+            record["title"] = f"{record.get('title', '')} [{suffix}]"
+            record["url"] = f"{record.get('url', '')}?v={suffix}"
+            record["timestamp"] = datetime.utcnow().isoformat() + "Z"
+        return record
+
+    def _send(self, payload: dict, status: int = 200):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with MockSourceHandler._count_lock:
+            MockSourceHandler.requests_served += 1
+
+    def do_POST(self):
+        if urlparse(self.path).path.rstrip("/") != "/chat/completions":
+            return self._send({"error": "not found"}, 404)
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        query = request.get("messages", [{}])[-1].get("content", "")
+
+        records = [self._variant(record) for record in self.perplexity_records]
+        self._send({
+            "id": uuid.uuid4().hex,
+            "model": request.get("model", "sonar"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": f"Recorded results for: {query}"}}],
+            "search_results": [
+                {
+                    "title": record.get("title", ""),
+                    "url": record.get("url", ""),
+                    "date": record.get("timestamp"),
+                    "snippet": record.get("content", ""),
+                }
+                for record in records
+            ],
+        })
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.rstrip("/") != "/tweets/search/recent":
+            return self._send({"error": "not found"}, 404)
+        params = parse_qs(url.query)
+        page_size = int(params.get("max_results", ["10"])[0])
+        start = int(params.get("pagination_token", ["0"])[0])
+
+        page = [self._variant(record) for record in self.x_records[start:start + page_size]]
+        tweets = []
+        users = {}
+        for i, record in enumerate(page):
+            # Recorded URLs look like https://x.com/<user>/status/<id>
+            parts = record.get("url", "").split("/")
+            username = parts[3] if len(parts) > 3 else "mock_user"
+            users[username] = {"id": f"u-{username}", "username": username}
+            tweets.append({
+                "id": uuid.uuid4().hex if self.fresh else str(start + i),
+                "text": f"{record.get('title', '')}\n{record.get('content', '')}",
+                "created_at": record.get("timestamp"),
+                "author_id": f"u-{username}",
+            })
+        meta = {"result_count": len(tweets)}
+        if start + page_size < len(self.x_records):
+            meta["next_token"] = str(start + page_size)
+        self._send({"data": tweets, "includes": {"users": list(users.values())}, "meta": meta})
+
+
+def report_throughput(interval: float = 5.0):
+    last = 0
+    while True:
+        time.sleep(interval)
+        total = MockSourceHandler.requests_served
+        print(f"📊 {total} requests served ({(total - last) / interval:.1f}/s)")
+        last = total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recorded Perplexity/X payloads locally")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Artificial delay added to every response")
+    parser.add_argument("--fresh", action="store_true", help="Serve every record as a new, current event")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR, help="Directory holding *_seed.jsonl recordings")
+    args = parser.parse_args()
+
+    MockSourceHandler.perplexity_records = load_records(args.data_dir / "perplexity_seed.jsonl")
+    MockSourceHandler.x_records = load_records(args.data_dir / "x_seed.jsonl")
+    MockSourceHandler.latency_ms = args.latency_ms
+    MockSourceHandler.fresh = args.fresh
+
+    server = ThreadingHTTPServer((args.host, args.port), MockSourceHandler)
+    print(f"🚀 Mock source server on http://{args.host}:{args.port}")
+    print(f"📂 {len(MockSourceHandler.perplexity_records)} Perplexity / {len(MockSourceHandler.x_records)} X recorded payloads")
+    threading.Thread(target=report_throughput, daemon=True).start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Mock source server stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,51 +2,25 @@ import pathway as pw
 import os
 import json
 import hashlib
+import time
 from pathlib import Path
 from datetime import datetime, timedelta
 
+from app.settings import settings
+from app.keyword_matcher import COMPANY, EVENT, get_matcher
+from app.segments import get_stream_log
+
 # Project Root Discovery
 PROJECT_ROOT = Path(__file__).resolve().parent
 DATA_DIR = PROJECT_ROOT / "data"
-INPUT_FILE = DATA_DIR / "stream.jsonl"
-OUTPUT_FILE = DATA_DIR / "pathway_out.jsonl"
+INPUT_FILE = settings.resolved_data_path
+# Segment directory of the raw stream (see app/segments.py)
+INPUT_DIR = get_stream_log(INPUT_FILE).directory
+OUTPUT_FILE = settings.resolved_pathway_path
 
 # Ensure data directory exists
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-# Keyword dictionary for company tagging
-COMPANY_KEYWORDS = {
-    "nvidia": "NVIDIA",
-    "tsmc": "TSMC",
-    "intel": "Intel",
-    "apple": "Apple",
-    "amd": "AMD",
-    "asml": "ASML",
-    "samsung": "Samsung",
-    "google": "Google",
-    "meta": "Meta",
-    "microsoft": "Microsoft",
-    "arm": "ARM"
-}
-
-# Event type keywords
-EVENT_KEYWORDS = {
-    "launch": "product_launch",
-    "release": "product_launch",
-    "contract": "contract",
-    "deal": "contract",
-    "partnership": "contract",
-    "supply": "supply_chain",
-    "yield": "supply_chain",
-    "foundry": "supply_chain",
-    "fab": "supply_chain",
-    "acquisition": "m_and_a",
-    "merger": "m_and_a",
-    "earnings": "financial",
-    "revenue": "financial",
-    "profit": "financial"
-}
-
 def compute_event_id(title: str, snippet: str, url: str) -> str:
     """Compute a stable event ID for deduplication."""
     content = snippet[:200] if snippet else ""
@@ -58,22 +32,14 @@ def tag_company(title: str, content: str, existing_company: str) -> str:
     if existing_company and existing_company.lower() != "unknown":
         return existing_company
     
-    text = (title + " " + content).lower()
-    for kw, name in COMPANY_KEYWORDS.items():
-        if kw in text:
-            return name
-    return "Unknown"
+    return get_matcher().first(title + " " + content, COMPANY) or "Unknown"
 
 def tag_event_type(title: str, content: str, existing_type: str) -> str:
     """Tag event type based on keywords if missing."""
     if existing_type and existing_type.lower() != "unknown":
         return existing_type
     
-    text = (title + " " + content).lower()
-    for kw, etype in EVENT_KEYWORDS.items():
-        if kw in text:
-            return etype
-    return "general"
+    return get_matcher().first(title + " " + content, EVENT) or "general"
 
 # Define Schema
 class SignalSchema(pw.Schema):
@@ -81,23 +47,75 @@ class SignalSchema(pw.Schema):
     source: str
     title: str
     content: str
-    url: str = ""
-    company: str = "Unknown"
-    event_type: str = "general"
+    url: str = pw.column_definition(default_value="")
+    company: str = pw.column_definition(default_value="Unknown")
+    event_type: str = pw.column_definition(default_value="general")
+
+class SegmentWriter:
+    """
+    Appends the deduplicated table to a SegmentedLog once per Pathway time
+    step. The log is append-only, so only the first addition per event_id
+    is written; later updates of a group (retraction + addition) are
+    skipped. This process is the log's only writer, so it also runs its
+    retention and compaction.
+    """
+
+    def __init__(self, log):
+        self.log = log
+        self.written_ids = set()
+        self.pending = []
+        self.last_maintenance = time.time()
+
+    def on_change(self, key, row: dict, time: int, is_addition: bool):
+        if not is_addition or row["event_id"] in self.written_ids:
+            return
+        self.written_ids.add(row["event_id"])
+        self.pending.append(dict(row))
+
+    def on_time_end(self, time: int):
+        if self.pending:
+            self.log.append(self.pending)
+            print(f"✨ Processed {len(self.pending)} new events")
+            self.pending = []
+        if _now() - self.last_maintenance >= settings.stream_maintenance_minutes * 60:
+            self.log.maintain()
+            self.last_maintenance = _now()
+
+    def subscribe(self, table):
+        pw.io.subscribe(table, on_change=self.on_change, on_time_end=self.on_time_end)
+
+def _now() -> float:
+    # on_change/on_time_end take a `time` argument that shadows the module
+    return time.time()
 
 def run_pipeline():
     print(f"🚀 Starting Pathway Pipeline...")
-    print(f"📂 Input: {INPUT_FILE}")
+    print(f"📂 Input: {INPUT_DIR}")
     print(f"📂 Output: {OUTPUT_FILE}")
 
     # 1. Read JSONL Stream
-    # mode="streaming" ensures it picks up new appends
-    signals = pw.io.jsonl.read(
-        str(INPUT_FILE),
+    # mode="streaming" picks up appends and new segment files; segments
+    # dropped by retention are never opened again. Compaction merges
+    # ("<seq>-<bucket>-c.jsonl") only re-copy closed segments that were
+    # already read, so they are excluded: only names ending in the hour
+    # bucket digits match
+    INPUT_DIR.mkdir(parents=True, exist_ok=True)
+    signals = pw.io.jsonlines.read(
+        str(INPUT_DIR),
         schema=SignalSchema,
         mode="streaming",
+        object_pattern="*[0-9].jsonl",
         autocommit_duration_ms=1000
     )
+    
+    # Pre-segmentation stream file, if one is still around
+    if INPUT_FILE.is_file():
+        legacy = pw.io.jsonlines.read(
+            str(INPUT_FILE),
+            schema=SignalSchema,
+            mode="static"
+        )
+        signals = signals.concat_reindex(legacy)
 
     # 2. Normalize and Clean
     signals = signals.select(
@@ -115,6 +133,7 @@ def run_pipeline():
     # 3. Deduplicate by event_id
     # We keep the latest record for each event_id
     signals = signals.groupby(pw.this.event_id).reduce(
+        event_id=pw.this.event_id,
         timestamp=pw.reducers.max(pw.this.timestamp),
         source=pw.reducers.max(pw.this.source),
         title=pw.reducers.max(pw.this.title),
@@ -124,8 +143,15 @@ def run_pipeline():
         event_type=pw.reducers.max(pw.this.event_type)
     )
 
-    # 4. Output to JSONL
-    pw.io.jsonl.write(signals, str(OUTPUT_FILE))
+    # 4. Output to the segmented log (see app/segments.py), so retention and
+    # compaction bound its size and readers only open recent segments.
+    # Pathway recomputes from the input on start, so the output is rebuilt
+    # (like the previous single-file rewrite)
+    output_log = get_stream_log(OUTPUT_FILE)
+    output_log.reset()
+    if OUTPUT_FILE.exists():
+        OUTPUT_FILE.unlink()
+    SegmentWriter(output_log).subscribe(signals)
 
     # 5. Run
     pw.run()
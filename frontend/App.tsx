@@ -11,7 +11,7 @@ import { CompanyRadar } from './components/CompanyRadar';
 import { MarkdownRenderer } from './components/MarkdownRenderer';
 import { StrategicInsightReport } from './components/StrategicInsightReport';
 import { BackgroundLayer } from './components/BackgroundLayer';
-import { querySiliconPulse, injectSignal, fetchSignals, QueryResponse, formatEvidenceToContext, generateInsight, bootstrapSystem, fetchRecommendations, exportAnalysis, verifySources } from './api/siliconpulseApi';
+import { querySiliconPulse, injectSignal, fetchSignals, QueryResponse, evidenceIds, generateInsightStream, bootstrapSystem, fetchRecommendations, exportAnalysis, verifySources } from './api/siliconpulseApi';
 import { INITIAL_LIVE_FEED } from './constants';
 import { LiveEvent } from './types';
 
@@ -119,8 +119,9 @@ const App: React.FC = () => {
 
       // 2. Generate Insight ASYNCHRONOUSLY in background
       // NEW RULE: Always request insight, backend handles zero-evidence fallbacks
-      const context = formatEvidenceToContext(result.evidence);
-      generateInsight(finalQuery, context)
+      // The backend builds the prompt context from the evidence IDs
+      // Sections render as soon as they stream in
+      generateInsightStream(finalQuery, evidenceIds(result.evidence), sections => setInsight(JSON.stringify({ sections })))
         .then(generatedInsight => {
           setInsight(generatedInsight);
         })
@@ -143,7 +143,14 @@ export const formatEvidenceToContext = (evidence: any[]): string => {
     return context;
 };
 
-export const generateInsight = async (query: string, context: string): Promise<string> => {
+/**
+ * IDs of the /query evidence, best first. /generate looks the events up and
+ * builds the prompt context server-side, so the context isn't sent back.
+ */
+export const evidenceIds = (evidence: any[]): string[] =>
+    (evidence || []).map(item => item.event_id).filter(Boolean);
+
+export const generateInsight = async (query: string, eventIds: string[]): Promise<string> => {
     try {
         console.log("Generating insight...");
         const response = await fetch(`${BASE_URL}/generate`, {
@@ -151,7 +158,7 @@ export const generateInsight = async (query: string, context: string): Promise<s
             headers: {
                 "Content-Type": "application/json",
             },
-            body: JSON.stringify({ query, context }),
+            body: JSON.stringify({ query, event_ids: eventIds }),
         });
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
@@ -164,6 +171,60 @@ export const generateInsight = async (query: string, context: string): Promise<s
     }
 };
 
+/**
+ * Stream insight generation from /generate/stream (NDJSON). `onSections` is
+ * called with the sections parsed so far as each one arrives; resolves with
+ * the final insight string. Falls back to /generate if streaming fails
+ * before anything arrived.
+ */
+export const generateInsightStream = async (
+    query: string,
+    eventIds: string[],
+    onSections: (sections: any[]) => void
+): Promise<string> => {
+    const sections: any[] = [];
+    try {
+        const response = await fetch(`${BASE_URL}/generate/stream`, {
+            method: "POST",
+            headers: {
+                "Content-Type": "application/json",
+            },
+            body: JSON.stringify({ query, event_ids: eventIds }),
+        });
+        if (!response.ok || !response.body) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split("\n");
+            buffer = lines.pop() || "";
+            for (const line of lines) {
+                if (!line.trim()) continue;
+                const event = JSON.parse(line);
+                if (event.type === "section") {
+                    sections.push(event.section);
+                    onSections([...sections]);
+                } else if (event.type === "done") {
+                    return event.insight;
+                }
+            }
+        }
+        throw new Error("Stream ended without a result");
+    } catch (error) {
+        console.error("Error streaming insight:", error);
+        if (sections.length > 0) {
+            return JSON.stringify({ sections });
+        }
+        return generateInsight(query, eventIds);
+    }
+};
+
 export const fetchRecommendations = async (): Promise<any[]> => {
     try {
         const response = await fetch(`${BASE_URL}/recommendations`);